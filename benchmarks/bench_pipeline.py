@@ -0,0 +1,158 @@
+"""
+End-to-end benchmark of process_args: serves a recorded (or synthetic)
+tileset from a local replay server and runs the full pipeline in headless
+Blender workers with the native fetch engine.
+
+    python -m benchmarks.bench_pipeline blender=<path> [recording=<dir>] [runs=3] [baseline=...]
+
+Without a recording a synthetic tileset is generated. A recording made from
+Google's tiles needs its box: min_lat=... min_lon=... max_lat=... max_lon=...
+and tiles_path=<path of root.json inside the recording>.
+"""
+
+import json
+from pathlib import Path
+import shutil
+import statistics
+import tempfile
+from benchmarks.bench_utils import finish_suite, parse_bench_args
+from benchmarks.replay_server import generate_synthetic_tileset, start_replay_server
+from scripts.worker_utils import run_worker_job
+
+
+def read_run_reports(output_dir, filename):
+    output_dir = Path(output_dir)
+    with (output_dir / f"{filename}_profile.json").open(encoding="utf-8") as file:
+        profile = json.load(file)
+    with (output_dir / f"{filename}_stats.json").open(encoding="utf-8") as file:
+        stats = json.load(file)
+    return profile, stats
+
+
+def summarize_run(profile, stats):
+    stages = {record["name"]: record for record in profile["stages"]}
+    fetch = stages.get("fetch", {})
+    gltf_import = stages.get("gltf_import", {})
+    tiles = fetch.get("args", {}).get("tiles", 0)
+    triangles = stats["totals"]["triangles"]
+
+    return {
+        "total": profile["total_seconds"],
+        "tiles": tiles,
+        "triangles": triangles,
+        "tiles_per_s": tiles / fetch["duration"] if fetch.get("duration") else None,
+        "triangles_per_s": (
+            triangles / gltf_import["duration"] if gltf_import.get("duration") else None
+        ),
+        "peak_rss_mb": profile["peak_rss_mb"],
+        # Top-level stages, and the fetch and glTF import inside the import
+        "stages": {
+            record["name"]: record["duration"]
+            for record in profile["stages"]
+            if record["depth"] == 0 or record["name"] in ("fetch", "gltf_import")
+        },
+    }
+
+
+def run_pipeline_benchmark(arguments, work_dir):
+    recording = arguments.get("recording")
+    if recording:
+        bbox = [
+            float(arguments[key])
+            for key in ("min_lat", "min_lon", "max_lat", "max_lon")
+        ]
+        tiles_path = arguments.get("tiles_path") or "root.json"
+    else:
+        recording = work_dir / "synthetic_tiles"
+        bbox = generate_synthetic_tileset(
+            recording,
+            grid=int(arguments.get("grid") or 4),
+            vertices=int(arguments.get("vertices") or 10_000),
+        )
+        tiles_path = "root.json"
+
+    server = start_replay_server(recording)
+    tiles_url = f"http://127.0.0.1:{server.server_port}/{tiles_path.lstrip('/')}"
+    lod = arguments.get("lod") or "lod4"
+    runs = []
+
+    try:
+        for run in range(int(arguments.get("runs") or 3)):
+            # Drop the tiles of the previous run, so every run fetches from the server
+            shutil.rmtree(work_dir / "data" / "native_tiles", ignore_errors=True)
+            job = {
+                "name": f"bench_{lod}_run{run}",
+                "arguments": {
+                    "google_api_key": "replay",
+                    "base_name": "bench",
+                    "lod": lod,
+                    "min_lat": bbox[0],
+                    "min_lon": bbox[1],
+                    "max_lat": bbox[2],
+                    "max_lon": bbox[3],
+                    "fetch_engine": "native",
+                    "tiles_url": tiles_url,
+                    "data_dir": str(work_dir / "data"),
+                    "output_dir": str(work_dir / f"output_{run}"),
+                    "save_blend": "false",
+                    "profiling": "true",
+                },
+            }
+            result = run_worker_job(job, arguments["blender"], work_dir / "logs")
+            if result["returncode"] != 0 or not result["output_dir"]:
+                raise RuntimeError(
+                    f"Benchmark run failed, see the log at {result['log_path']}"
+                )
+
+            summary = summarize_run(
+                *read_run_reports(result["output_dir"], result["filename"])
+            )
+            runs.append(summary)
+            print(
+                f"Run {run}: {summary['total']:.1f}s, {summary['tiles']} tiles, "
+                f"{summary['triangles']:,} triangles"
+            )
+    finally:
+        server.shutdown()
+
+    return runs
+
+
+def aggregate_runs(runs):
+    """
+    Best and median of every stage and of the whole run, in the same shape as
+    the microbenchmark results so they compare against a baseline the same way.
+    """
+    results = {}
+    names = ["total"] + sorted({name for run in runs for name in run["stages"]})
+    for name in names:
+        timings = [
+            run["total"] if name == "total" else run["stages"][name]
+            for run in runs
+            if name == "total" or name in run["stages"]
+        ]
+        results[name] = {"best": min(timings), "median": statistics.median(timings)}
+
+    for rate in ("tiles_per_s", "triangles_per_s"):
+        values = [run[rate] for run in runs if run[rate]]
+        if values:
+            results[rate] = {"max": max(values), "median": statistics.median(values)}
+    results["peak_rss_mb"] = {"max": max(run["peak_rss_mb"] or 0 for run in runs)}
+    return results
+
+
+if __name__ == "__main__":
+    arguments = parse_bench_args()
+    if not arguments.get("blender"):
+        raise SystemExit("Pass the Blender executable: blender=<path>")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        runs = run_pipeline_benchmark(arguments, Path(work_dir))
+
+    results = aggregate_runs(runs)
+    print("\nPipeline:")
+    for name, values in results.items():
+        print(
+            f"  {name}: {', '.join(f'{key} {value:,.2f}' for key, value in values.items())}"
+        )
+    finish_suite("pipeline", results, arguments)
@@ -0,0 +1,113 @@
+"""
+Microbenchmarks of the projection and spatial index code, runnable with plain
+Python: python -m benchmarks.bench_projection [sizes=1000,1000000] [baseline=...]
+"""
+
+import tempfile
+from pathlib import Path
+import numpy as np
+from benchmarks.bench_utils import finish_suite, measure, parse_bench_args, print_result
+from scripts.index_utils import MeshIndex, build_str_index, save_metadata_npz
+from scripts.projection_utils import (
+    TransverseMercator,
+    ecef_to_geodetic,
+    geodetic_to_ecef,
+)
+
+ORIGIN = (35.6812, 139.7671)
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# The scalar projection loop is only timed up to this many points
+SCALAR_MAX_POINTS = 10_000
+
+
+def random_points(count, spread_m=5000.0, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-spread_m, spread_m, size=(count, 2))
+
+
+def random_bounds(count, spread_deg=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    min_lat = ORIGIN[0] + rng.uniform(-spread_deg, spread_deg, count)
+    min_lon = ORIGIN[1] + rng.uniform(-spread_deg, spread_deg, count)
+    size = rng.uniform(1e-5, 5e-4, size=(count, 2))
+    return np.column_stack(
+        [min_lat, min_lon, min_lat + size[:, 0], min_lon + size[:, 1]]
+    )
+
+
+def bench_projection(sizes, results, repeat):
+    projection = TransverseMercator(lat=ORIGIN[0], lon=ORIGIN[1])
+    print("\nProjection:")
+    for size in sizes:
+        points = random_points(size)
+        geographic = projection.toGeographicArray(points)
+
+        name = f"to_geographic_array_{size}"
+        results[name] = measure(lambda: projection.toGeographicArray(points), repeat)
+        print_result(name, results[name], size, "points")
+
+        name = f"from_geographic_array_{size}"
+        results[name] = measure(
+            lambda: projection.fromGeographicArray(geographic), repeat
+        )
+        print_result(name, results[name], size, "points")
+
+        if size <= SCALAR_MAX_POINTS:
+            name = f"to_geographic_scalar_{size}"
+            results[name] = measure(
+                lambda: [projection.toGeographic(x, y) for x, y in points], repeat
+            )
+            print_result(name, results[name], size, "points")
+
+        heights = np.zeros(size)
+        ecef = geodetic_to_ecef(geographic[:, 0], geographic[:, 1], heights)
+        name = f"ecef_to_geodetic_{size}"
+        results[name] = measure(lambda: ecef_to_geodetic(ecef), repeat)
+        print_result(name, results[name], size, "points")
+
+
+def bench_index(sizes, results, repeat):
+    print("\nSpatial index:")
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            bounds = random_bounds(size)
+            mesh_ids = [f"mesh_{index}" for index in range(size)]
+
+            name = f"build_str_index_{size}"
+            results[name] = measure(lambda: build_str_index(bounds), repeat)
+            print_result(name, results[name], size, "meshes")
+
+            npz_path = Path(tmp_dir) / f"bench_{size}.npz"
+            name = f"save_metadata_npz_{size}"
+            results[name] = measure(
+                lambda: save_metadata_npz(
+                    npz_path, mesh_ids, bounds, ORIGIN[0], ORIGIN[1], 0.1, "lod4"
+                ),
+                repeat,
+            )
+            print_result(name, results[name], size, "meshes")
+
+            index = MeshIndex.load(npz_path)
+            queries = random_bounds(1000, seed=2)
+            queries[:, 2:] += rng.uniform(0, 0.005, size=(1000, 2))
+            name = f"index_query_1000_of_{size}"
+            results[name] = measure(
+                lambda: [index.query(*query) for query in queries], repeat
+            )
+            print_result(name, results[name], 1000, "queries")
+
+
+if __name__ == "__main__":
+    arguments = parse_bench_args()
+    sizes = [int(size) for size in str(arguments.get("sizes", "")).split(",") if size]
+    repeat = int(arguments.get("repeat") or 5)
+
+    results = {}
+    bench_projection(sizes or DEFAULT_SIZES, results, repeat)
+    # Index sizes are object counts, a million meshes is beyond any real scene
+    bench_index(
+        [size for size in sizes or DEFAULT_SIZES if size <= 100_000], results, repeat
+    )
+    finish_suite("projection", results, arguments)
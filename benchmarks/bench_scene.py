@@ -0,0 +1,112 @@
+"""
+Benchmarks of the metadata and statistics passes on synthetic Blender scenes.
+Runs inside Blender:
+
+    blender --background --python-exit-code 1 --python benchmarks/bench_scene.py -- [scenes=1000x1000,1x1000000] [baseline=...]
+
+Each scene is given as <objects>x<vertices per object>.
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+import bpy
+import numpy as np
+from benchmarks.bench_utils import finish_suite, measure, parse_bench_args, print_result
+from scripts.blender_utils import (
+    clear_scene,
+    rescale_scene,
+    validate_collection_and_save_metadata,
+)
+from scripts.projection_utils import TransverseMercator, calculate_real_bounds_batch
+from scripts.stats_utils import get_scene_statistics
+
+DEFAULT_SCENES = [(1000, 1_000), (5000, 100), (10, 100_000), (1, 1_000_000)]
+
+
+def build_grid_mesh(name, vertices):
+    n = max(2, int(np.sqrt(vertices)))
+    x, y = np.meshgrid(np.linspace(0, 100, n), np.linspace(0, 100, n))
+    coords = np.column_stack([x.ravel(), y.ravel(), np.zeros(n * n)])
+    cells = np.arange(n * n).reshape(n, n)[:-1, :-1].ravel()
+    faces = np.column_stack([cells, cells + 1, cells + n + 1, cells + n])
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(coords.tolist(), [], faces.tolist())
+    mesh.update()
+    return mesh
+
+
+def build_scene(objects, vertices):
+    """
+    Fills the Google 3D Tiles collection with `objects` objects laid out on a
+    grid, each with its own copy of a grid mesh of about `vertices` vertices.
+    """
+    clear_scene()
+    collection = bpy.data.collections.new("Google 3D Tiles")
+    bpy.context.scene.collection.children.link(collection)
+
+    template = build_grid_mesh("bench_mesh", vertices)
+    side = int(np.ceil(np.sqrt(objects)))
+    for index in range(objects):
+        mesh = template if index == 0 else template.copy()
+        obj = bpy.data.objects.new(f"bench_{index}", mesh)
+        obj.location = ((index % side) * 120.0, (index // side) * 120.0, 0.0)
+        collection.objects.link(obj)
+    bpy.context.view_layer.update()
+    return collection
+
+
+def bench_scene(objects, vertices, results, repeat, output_dir):
+    label = f"{objects}x{vertices}"
+    print(f"\nScene {label}:")
+    collection = build_scene(objects, vertices)
+    mesh_objects = [obj for obj in collection.objects if obj.type == "MESH"]
+    projection = TransverseMercator(lat=35.6812, lon=139.7671)
+    total_vertices = sum(len(obj.data.vertices) for obj in mesh_objects)
+
+    name = f"real_bounds_batch_{label}"
+    results[name] = measure(
+        lambda: calculate_real_bounds_batch(mesh_objects, projection), repeat
+    )
+    print_result(name, results[name], objects, "objects")
+
+    name = f"scene_statistics_{label}"
+    results[name] = measure(get_scene_statistics, repeat)
+    print_result(name, results[name], total_vertices, "vertices")
+
+    name = f"save_metadata_{label}"
+    results[name] = measure(
+        lambda: validate_collection_and_save_metadata(
+            output_dir, "bench", "lod4", projection, 0.1
+        ),
+        repeat,
+    )
+    print_result(name, results[name], objects, "objects")
+
+    # Rescaling twice by reciprocal factors leaves the scene as it was
+    name = f"rescale_{label}"
+    results[name] = measure(lambda: (rescale_scene(0.5), rescale_scene(2.0)), repeat)
+    print_result(name, results[name], objects * 2, "objects")
+
+
+if __name__ == "__main__":
+    arguments = parse_bench_args()
+    scenes = [
+        tuple(int(value) for value in scene.split("x"))
+        for scene in str(arguments.get("scenes", "")).split(",")
+        if scene
+    ]
+    repeat = int(arguments.get("repeat") or 3)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for objects, vertices in scenes or DEFAULT_SCENES:
+            bench_scene(objects, vertices, results, repeat, Path(output_dir))
+    clear_scene()
+    finish_suite("scene", results, arguments)
@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+import platform
+import statistics
+import sys
+import time
+
+project_root = Path(__file__).resolve().parent.parent
+default_results_dir = project_root / "output" / "benchmarks"
+
+# A benchmark slower than its baseline by more than this fraction is a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def parse_bench_args(argv=None):
+    """
+    key=value arguments like main.py, after "--" when run inside Blender.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1 :]
+
+    arguments = {}
+    for arg in argv:
+        if "=" in arg:
+            key, value = arg.split("=", 1)
+            arguments[key] = value
+        else:
+            arguments[arg] = True
+    return arguments
+
+
+def measure(function, repeat=5, setup=None):
+    """
+    Runs function repeat times and returns the best and median wall time in
+    seconds. setup, if given, runs untimed before every call.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"best": min(timings), "median": statistics.median(timings)}
+
+
+def print_result(name, timing, count=None, unit="items"):
+    rate = ""
+    if count:
+        rate = f", {count / timing['best']:,.0f} {unit}/s"
+    print(
+        f"  {name}: best {timing['best'] * 1000:.2f} ms, "
+        f"median {timing['median'] * 1000:.2f} ms{rate}"
+    )
+
+
+def save_results(suite, results, results_dir=None):
+    results_dir = Path(results_dir or default_results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{suite}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with path.open("w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "suite": suite,
+                "created": time.time(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nResults saved to {path}")
+    return path
+
+
+def compare_to_baseline(results, baseline_path, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares the best times of results against a saved results file. Returns
+    the benchmarks that got slower than the tolerance allows.
+    """
+    with Path(baseline_path).open("r", encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+
+    regressions = []
+    for name, timing in results.items():
+        if name not in baseline or "best" not in timing:
+            continue
+        before, after = baseline[name]["best"], timing["best"]
+        if before > 0 and after > before * (1 + tolerance):
+            regressions.append(f"{name}: {before:.4f}s -> {after:.4f}s")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {baseline_path}:")
+        for regression in regressions:
+            print(f"  {regression}")
+    else:
+        print(f"\nNo regressions against {baseline_path}.")
+    return regressions
+
+
+def finish_suite(suite, results, arguments):
+    """
+    Saves the results and, given baseline=<results file>, exits with 1 when
+    something regressed.
+    """
+    save_results(suite, results, arguments.get("results_dir"))
+    if arguments.get("baseline"):
+        tolerance = float(arguments.get("tolerance") or DEFAULT_TOLERANCE)
+        if compare_to_baseline(results, arguments["baseline"], tolerance):
+            sys.exit(1)
@@ -0,0 +1,241 @@
+"""
+Local HTTP server replaying a recorded 3D Tiles tileset, so the pipeline can
+be benchmarked without an API key or network access.
+
+    python -m benchmarks.replay_server dir=<recording> synthetic
+    python -m benchmarks.replay_server dir=<recording> upstream=https://tile.googleapis.com
+
+In record mode every request is forwarded to upstream and its response saved
+under dir by URL path. Replay serves those files by path, query ignored, so
+keys and sessions of the recorded run do not matter.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+from pathlib import Path
+import threading
+from urllib.parse import unquote, urlsplit
+from urllib.request import urlopen
+import numpy as np
+from benchmarks.bench_utils import parse_bench_args
+from scripts.chunk_utils import METERS_PER_DEGREE
+from scripts.fetch_utils import write_glb
+from scripts.projection_utils import enu_to_ecef_matrix
+
+CONTENT_TYPES = {".json": "application/json", ".glb": "model/gltf-binary"}
+
+# Synthetic tileset defaults: a grid of tiles around Tokyo station
+SYNTHETIC_CENTER = (35.6812, 139.7671)
+SYNTHETIC_SIZE_M = 1000.0
+SYNTHETIC_GRID = 4
+SYNTHETIC_VERTICES = 10_000
+
+
+def build_grid_glb(size_m, vertices, seed=0):
+    """
+    A binary glTF holding one square height field of about `vertices` vertices,
+    size_m wide and centered on its origin, y-up like 3D Tiles content.
+    """
+    n = max(2, int(math.sqrt(vertices)))
+    rng = np.random.default_rng(seed)
+    east, north = np.meshgrid(
+        np.linspace(-size_m / 2, size_m / 2, n), np.linspace(-size_m / 2, size_m / 2, n)
+    )
+    height = rng.uniform(0.0, 30.0, size=(n, n))
+    positions = np.column_stack([east.ravel(), height.ravel(), -north.ravel()]).astype(
+        np.float32
+    )
+
+    cells = np.arange(n * n, dtype=np.uint32).reshape(n, n)[:-1, :-1].ravel()
+    indices = np.column_stack(
+        [cells, cells + n, cells + 1, cells + 1, cells + n, cells + n + 1]
+    ).astype(np.uint32)
+
+    position_bytes = positions.tobytes()
+    index_bytes = indices.tobytes()
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+        "buffers": [{"byteLength": len(position_bytes) + len(index_bytes)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(position_bytes)},
+            {
+                "buffer": 0,
+                "byteOffset": len(position_bytes),
+                "byteLength": len(index_bytes),
+            },
+        ],
+        "accessors": [
+            {
+                "bufferView": 0,
+                "componentType": 5126,
+                "count": len(positions),
+                "type": "VEC3",
+                "min": positions.min(axis=0).tolist(),
+                "max": positions.max(axis=0).tolist(),
+            },
+            {
+                "bufferView": 1,
+                "componentType": 5125,
+                "count": indices.size,
+                "type": "SCALAR",
+            },
+        ],
+    }
+    return write_glb(gltf, position_bytes + index_bytes)
+
+
+def generate_synthetic_tileset(
+    directory,
+    center=SYNTHETIC_CENTER,
+    size_m=SYNTHETIC_SIZE_M,
+    grid=SYNTHETIC_GRID,
+    vertices=SYNTHETIC_VERTICES,
+):
+    """
+    Writes root.json and a grid x grid set of height field tiles covering a
+    size_m square around center. Returns the (min_lat, min_lon, max_lat,
+    max_lon) box the tiles cover.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    lat_step = size_m / grid / METERS_PER_DEGREE
+    lon_step = lat_step / math.cos(math.radians(center[0]))
+    min_lat = center[0] - lat_step * grid / 2
+    min_lon = center[1] - lon_step * grid / 2
+    tile_size_m = size_m / grid
+
+    children = []
+    for row in range(grid):
+        for col in range(grid):
+            lat = min_lat + (row + 0.5) * lat_step
+            lon = min_lon + (col + 0.5) * lon_step
+            name = f"tile_{row}_{col}.glb"
+            (directory / name).write_bytes(
+                build_grid_glb(tile_size_m, vertices, seed=row * grid + col)
+            )
+            half = tile_size_m / 2
+            children.append(
+                {
+                    "transform": enu_to_ecef_matrix(lat, lon).T.ravel().tolist(),
+                    "boundingVolume": {
+                        "box": [0, 0, 15, half, 0, 0, 0, half, 0, 0, 0, 15]
+                    },
+                    "geometricError": 0.0,
+                    "content": {"uri": name},
+                }
+            )
+
+    max_lat, max_lon = min_lat + lat_step * grid, min_lon + lon_step * grid
+    tileset = {
+        "asset": {"version": "1.0"},
+        "geometricError": 1000.0,
+        "root": {
+            "boundingVolume": {
+                "region": [
+                    math.radians(min_lon),
+                    math.radians(min_lat),
+                    math.radians(max_lon),
+                    math.radians(max_lat),
+                    0.0,
+                    30.0,
+                ]
+            },
+            "geometricError": 1000.0,
+            "refine": "REPLACE",
+            "children": children,
+        },
+    }
+    with (directory / "root.json").open("w", encoding="utf-8") as file:
+        json.dump(tileset, file)
+    return min_lat, min_lon, max_lat, max_lon
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    directory = None
+    upstream = None
+
+    def get_recorded_path(self):
+        path = unquote(urlsplit(self.path).path).lstrip("/")
+        recorded = (self.directory / path).resolve()
+        # Never serve anything outside the recording
+        if self.directory.resolve() not in recorded.parents:
+            return None
+        return recorded
+
+    def do_GET(self):
+        recorded = self.get_recorded_path()
+        if recorded is None:
+            self.send_error(403)
+            return
+
+        if self.upstream and not recorded.exists():
+            with urlopen(self.upstream.rstrip("/") + self.path) as response:
+                body = response.read()
+            recorded.parent.mkdir(parents=True, exist_ok=True)
+            recorded.write_bytes(body)
+
+        if not recorded.is_file():
+            self.send_error(404)
+            return
+
+        body = recorded.read_bytes()
+        self.send_response(200)
+        self.send_header(
+            "Content-Type",
+            CONTENT_TYPES.get(recorded.suffix, "application/octet-stream"),
+        )
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_replay_server(directory, upstream=None, port=0):
+    """
+    Serves the recording in a background thread. Returns the server, its URL
+    is http://127.0.0.1:{server.server_port}/.
+    """
+    handler = type(
+        "RecordingReplayHandler",
+        (ReplayHandler,),
+        {"directory": Path(directory), "upstream": upstream},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", int(port)), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    arguments = parse_bench_args()
+    directory = Path(arguments.get("dir") or "blosm_data/recorded_tiles")
+
+    if "synthetic" in arguments:
+        bbox = generate_synthetic_tileset(directory)
+        print(f"Synthetic tileset written to {directory}, covering {bbox}")
+
+    server = start_replay_server(
+        directory, arguments.get("upstream"), arguments.get("port") or 8765
+    )
+    mode = (
+        f"recording from {arguments['upstream']}"
+        if arguments.get("upstream")
+        else "replaying"
+    )
+    print(
+        f"Tiles server {mode} {directory} at http://127.0.0.1:{server.server_port}/. "
+        "Press Ctrl+C to stop."
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
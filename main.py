@@ -22,11 +22,53 @@ from scripts.blender_utils import (
     install_and_enable_blosm,
     set_blosm_preferences,
     import_google_3d_tiles,
+    save_metadata,
+    save_terrain_index,
     save_blender_file,
-    get_scene_triangles,
+    reset_scene,
     export_gltf,
 )
-from scripts.flask_utils import run_map_selection_ui
+from scripts.export_utils import (
+    export_scene_format,
+    get_export_formats,
+    get_format_texture_dir,
+    run_export_fanout,
+)
+from scripts.flask_utils import (
+    DEFAULT_HOST,
+    DEFAULT_MAX_FINISHED_JOBS,
+    run_map_selection_ui,
+    run_job_service,
+)
+from scripts.lod_utils import derive_lod, sort_lods_fine_to_coarse
+from scripts.merge_utils import merge_tiles_into_cells
+from scripts.profile_utils import finish_run, stage, start_run
+from scripts.refresh_utils import (
+    find_previous_output,
+    get_output_name,
+    refresh_tiles,
+    save_tile_manifest,
+)
+from scripts.stats_utils import get_scene_statistics, save_scene_statistics
+from scripts.texture_utils import optimize_textures
+from scripts.tileset_utils import export_tileset
+from scripts.batch_utils import run_batch
+from scripts.cache_utils import TileCache
+from scripts.chunk_utils import build_chunk_regions, merge_chunk_metadata
+from scripts.estimate_utils import estimate_region, print_estimates
+from scripts.daemon_utils import (
+    get_daemon_address,
+    get_daemon_authkey,
+    run_worker_daemon,
+)
+from scripts.worker_utils import (
+    API_KEY_ENV,
+    build_jobs,
+    get_blender_path,
+    get_max_workers,
+    report_worker_result,
+    run_parallel_jobs,
+)
 
 
 def open_output_folder(output_dir):
@@ -48,27 +90,302 @@ def open_output_folder(output_dir):
 
 
 def process_args(arguments, config_path):
-    config = update_config(load_config(config_path), arguments, config_path)
+    # Workers must not rewrite config.yaml, other workers are reading it
+    persist = "worker" not in arguments
+    config = update_config(load_config(config_path), arguments, config_path, persist)
     validate_config(config)
 
-    if install_and_enable_blosm(config):
-        set_blosm_preferences(config)
-        import_google_3d_tiles(config)
-        output_dir, filename = save_blender_file(config)
-        get_scene_triangles()  # placeholder, update here the json, also add the origin latlon
-        export_gltf(output_dir, filename)
-        print(f"\nProcessing for {config['blosm']['lod']} completed successfully.")
-        return output_dir, filename
-    else:
+    start_run(config)
+    try:
+        return run_stages(config, persist)
+    finally:
+        finish_run(config["output"]["output_dir"])
+
+
+def run_stages(config, persist=True):
+    # Workers keep their preferences in memory, see set_blosm_preferences
+    with stage("install_blosm"):
+        installed = install_and_enable_blosm(config, persist)
+    if not installed:
         print(f"\nBlosm addon installation failed for {config['blosm']['lod']}.")
         return None, None
 
+    with stage("preferences"):
+        set_blosm_preferences(config, persist)
+    tile_cache = TileCache.from_config(config)
+    if tile_cache:
+        try:
+            with stage("cache_begin"):
+                tile_cache.begin_run(config["blosm"]["lod"])
+        except RuntimeError as e:
+            print(f"\n{e} Run for {config['blosm']['lod']} stopped.")
+            return None, None
+
+    try:
+        return run_import_and_outputs(config, tile_cache)
+    finally:
+        if tile_cache:
+            # A failed run releases the cache without updating the manifest
+            tile_cache.release()
+
+
+def run_import_and_outputs(config, tile_cache):
+    previous, up_to_date = None, False
+    if config.get("refresh", {}).get("enabled"):
+        previous = find_previous_output(config)
+        if previous is None:
+            print("\nNo previous output with a tile manifest, fetching everything.")
+
+    if previous:
+        with stage("refresh") as details:
+            changes = refresh_tiles(config, previous)
+            details.update(changes or {})
+        if changes is None:
+            print(f"\nRefresh failed for {config['blosm']['lod']}, no outputs written.")
+            return None, None
+        up_to_date = not (changes["added"] or changes["updated"] or changes["removed"])
+    else:
+        with stage("import"):
+            imported = import_google_3d_tiles(config)
+        if not imported:
+            print(f"\nImport failed for {config['blosm']['lod']}, no outputs written.")
+            return None, None
+
+    if up_to_date:
+        output_dir = Path(config["output"]["output_dir"])
+        filename = get_output_name(config)
+        # Only the box may have changed, the outputs still hold the same tiles
+        save_tile_manifest(config, output_dir, filename)
+        print(f"\n{filename} is up to date, outputs left untouched.")
+    else:
+        if (
+            config.get("merge", {}).get("enabled")
+            and not config["blosm"]["join_tiles_objects"]
+        ):
+            with stage("merge"):
+                merge_tiles_into_cells(config)
+        output_dir, filename = save_outputs(config)
+
+    if tile_cache:
+        with stage("cache_end"):
+            tile_cache.end_run()
+            tile_cache.print_stats()
+    print(f"\nProcessing for {config['blosm']['lod']} completed successfully.")
+    return output_dir, filename
+
+
+def save_outputs(config):
+    """
+    Writes the metadata, statistics, GLB, 3D Tiles and .blend of the scene in
+    memory, optimizing its textures first when enabled.
+    """
+    if config.get("textures", {}).get("enabled"):
+        with stage("textures") as details:
+            details.update(
+                optimize_textures(
+                    config,
+                    Path(config["output"]["output_dir"])
+                    / f"{config['output']['base_name']}_{config['blosm']['lod']}_textures",
+                )
+            )
+    with stage("metadata"):
+        output_dir, filename = save_metadata(config)
+    if config.get("terrain", {}).get("enabled"):
+        with stage("terrain_index") as details:
+            details.update(save_terrain_index(config, output_dir, filename))
+    with stage("statistics"):
+        save_scene_statistics(output_dir, filename, get_scene_statistics(), config)
+    formats = get_export_formats(config)
+    # Other formats are exported from the saved .blend by background workers
+    fan_out = bool(formats) and config["output"].get("save_blend", True)
+    if config["output"].get("export_glb", True) and not (fan_out and "glb" in formats):
+        with stage("export_gltf") as details:
+            compression = config["output"].get("compression") or {}
+            details["draco"] = bool(compression.get("draco"))
+            details["size_mb"] = round(
+                export_gltf(output_dir, filename, compression) / 1e6, 3
+            )
+    if config.get("tileset", {}).get("enabled"):
+        with stage("export_tileset") as details:
+            details.update(export_tileset(config, output_dir, filename))
+    # The .blend is not needed for the export, so keep it off the critical path
+    if config["output"].get("save_blend", True):
+        with stage("save_blend"):
+            save_blender_file(output_dir, filename)
+        # Refreshing patches the saved .blend, so only keep a manifest with one
+        save_tile_manifest(config, output_dir, filename)
+
+    if fan_out:
+        with stage("export_fanout") as details:
+            details.update(run_export_fanout(config, output_dir, filename))
+    else:
+        for export_format in formats:
+            if export_format == "glb" and config["output"].get("export_glb", True):
+                continue
+            with stage(f"export_{export_format}"):
+                export_scene_format(export_format, output_dir, filename, config)
+    return output_dir, filename
+
+
+def process_derived_lods(arguments, lods, config_path):
+    """
+    Fetches only the finest of the LODs and derives each coarser one from the
+    previous by decimation and texture downscaling, writing the same outputs
+    as a separate fetch would.
+    """
+    lods = sort_lods_fine_to_coarse(lods)
+    print(f"\nFetching {lods[0]}, deriving {', '.join(lods[1:]) or 'nothing'} locally.")
+
+    output_dir, _ = process_args({**arguments, "lod": lods[0]}, config_path)
+    if not output_dir:
+        return None
+
+    for source_lod, lod in zip(lods, lods[1:]):
+        config = update_config(
+            load_config(config_path), {**arguments, "lod": lod}, config_path, False
+        )
+        start_run(config)
+        try:
+            with stage("derive"):
+                derive_lod(
+                    config,
+                    source_lod,
+                    lod,
+                    Path(config["output"]["output_dir"])
+                    / f"{config['output']['base_name']}_{lod}_textures",
+                )
+            output_dir, _ = save_outputs(config)
+        finally:
+            finish_run(config["output"]["output_dir"])
+        print(f"\nProcessing for {lod} completed successfully.")
+    return output_dir
+
+
+def is_derived(config_path):
+    return load_config(config_path).get("derive", {}).get("enabled")
+
+
+def process_lods_in_parallel(arguments, lods, config_path, regions=None):
+    config = load_config(config_path)
+    jobs = build_jobs(arguments, lods, regions)
+    results = run_parallel_jobs(
+        jobs,
+        get_blender_path(config),
+        get_max_workers(config),
+        log_dir=config.get("workers", {}).get("log_dir"),
+    )
+
+    output_dirs = [result["output_dir"] for result in results if result["output_dir"]]
+    return output_dirs[-1] if output_dirs else None
+
+
+def process_chunked(arguments, lods, config_path):
+    config = update_config(load_config(config_path), arguments, config_path, False)
+    validate_config(config)
+
+    output_dir = None
+    for lod in lods:
+        regions = build_chunk_regions(config, lod)
+        chunk_output_dir = process_lods_in_parallel(
+            arguments, [lod], config_path, regions
+        )
+        if chunk_output_dir:
+            output_dir = chunk_output_dir
+            merge_chunk_metadata(
+                output_dir,
+                config["output"]["base_name"],
+                lod,
+                regions,
+                config["blosm"]["scale_factor"],
+            )
+    return output_dir
+
+
+def is_chunked(arguments, config_path):
+    return "chunked" in arguments or load_config(config_path).get("chunking", {}).get(
+        "enabled"
+    )
+
 
 if __name__ == "__main__":
     arguments = parse_blender_args()
     config_path = ensure_config_exists()
 
-    if "map_select_ui" in arguments:
+    if "worker" in arguments:
+        if API_KEY_ENV in os.environ:
+            arguments.setdefault("google_api_key", os.environ[API_KEY_ENV])
+
+        output_dir, filename = process_args(arguments, config_path)
+        report_worker_result(output_dir, filename)
+        if not output_dir:
+            sys.exit(1)
+
+    elif "export_worker" in arguments:
+        # Runs with the saved .blend already open, see run_export_fanout
+        config = update_config(load_config(config_path), arguments, config_path, False)
+        export_format = arguments["export_format"]
+        output_dir, filename = arguments["output_dir"], arguments["filename"]
+        export_path = export_scene_format(
+            export_format,
+            output_dir,
+            filename,
+            config,
+            get_format_texture_dir(output_dir, filename, export_format),
+        )
+        if not export_path.exists():
+            print(f"\n{export_format} export produced no file at {export_path}.")
+            report_worker_result(
+                output_dir,
+                filename,
+                format=export_format,
+                error=f"{export_path.name} was not written",
+            )
+            sys.exit(1)
+        report_worker_result(
+            output_dir,
+            filename,
+            format=export_format,
+            size=export_path.stat().st_size,
+        )
+
+    elif "worker_daemon" in arguments:
+        config = load_config(config_path)
+        # Blosm is enabled once, every job then reuses the warm session
+        if install_and_enable_blosm(config, save_preferences=False):
+            run_worker_daemon(
+                lambda job: process_args({**job, "worker": True}, config_path),
+                reset_scene,
+                get_daemon_address(config),
+                get_daemon_authkey(config),
+            )
+        else:
+            sys.exit(1)
+
+    elif "serve" in arguments:
+        print("Launching Map Selection job service...")
+        config = load_config(config_path)
+        service = config.get("service", {})
+        run_job_service(
+            get_blender_path(config),
+            get_max_workers(config),
+            log_dir=config.get("workers", {}).get("log_dir"),
+            port=int(service.get("port") or 5000),
+            host=service.get("host") or DEFAULT_HOST,
+            max_finished_jobs=(
+                DEFAULT_MAX_FINISHED_JOBS
+                if service.get("max_finished_jobs") is None
+                else service["max_finished_jobs"]
+            ),
+        )
+
+    elif "estimate" in arguments:
+        # Dry run: only tileset metadata is read, nothing is imported
+        config = update_config(load_config(config_path), arguments, config_path, False)
+        validate_config(config)
+        lods = str(arguments.get("lods") or config["blosm"]["lod"]).split(",")
+        print_estimates(config["output"]["base_name"], estimate_region(config, lods))
+
+    elif "map_select_ui" in arguments:
         print("Launching Map Selection UI...")
         map_selection = run_map_selection_ui()
 
@@ -85,11 +402,44 @@ if __name__ == "__main__":
         )
 
         output_dir = None
+        lods = list(dict.fromkeys(map_selection["lods"]))
+        parallel = load_config(config_path).get("workers", {}).get("parallel_lods")
+
+        if is_chunked(arguments, config_path):
+            output_dir = process_chunked(arguments, lods, config_path)
+        elif is_derived(config_path) and len(lods) > 1:
+            output_dir = process_derived_lods(arguments, lods, config_path)
+        elif parallel and len(lods) > 1:
+            output_dir = process_lods_in_parallel(arguments, lods, config_path)
+        else:
+            for lod in lods:
+                print(f"\nProcessing: {lod}")
+                arguments["lod"] = lod
+                output_dir, _ = process_args(arguments, config_path)
+
+        if output_dir:
+            open_output_folder(output_dir)
+
+    elif "batch" in arguments:
+        manifest_path = arguments.pop("batch")
+        output_dir = run_batch(manifest_path, arguments, load_config(config_path))
+
+        if output_dir:
+            open_output_folder(output_dir)
+
+    elif is_chunked(arguments, config_path):
+        config = load_config(config_path)
+        lods = [arguments.get("lod") or config["blosm"]["lod"]]
+        output_dir = process_chunked(arguments, lods, config_path)
+
+        if output_dir:
+            open_output_folder(output_dir)
 
-        for lod in map_selection["lods"]:
-            print(f"\nProcessing: {lod}")
-            arguments["lod"] = lod
-            output_dir, _ = process_args(arguments, config_path)
+    elif "derive_lods" in arguments:
+        config = load_config(config_path)
+        lods = [arguments.get("lod") or config["blosm"]["lod"]]
+        lods += arguments.pop("derive_lods").split(",")
+        output_dir = process_derived_lods(arguments, lods, config_path)
 
         if output_dir:
             open_output_folder(output_dir)
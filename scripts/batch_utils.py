@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+import yaml
+from scripts.chunk_utils import build_chunk_regions, merge_chunk_metadata
+from scripts.config_utils import (
+    EXPORT_EXTENSIONS,
+    apply_arguments,
+    get_export_formats,
+    validate_config,
+)
+from scripts.estimate_utils import (
+    check_limits,
+    estimate_region,
+    get_chunk_cell_size,
+    get_limits,
+)
+from scripts.worker_utils import (
+    build_jobs,
+    get_blender_path,
+    get_max_workers,
+    run_parallel_jobs,
+)
+
+
+def load_batch_manifest(manifest_path):
+    """
+    Reads the job entries of a batch manifest.
+
+    A .jsonl manifest has one entry per line. A YAML manifest is either a list
+    of entries or a mapping with optional `defaults` merged into every entry of
+    `jobs`. Entries use the command-line argument names (min_lat, base_name,
+    scale_factor, ...) plus `lods` for a list of LODs.
+    """
+    manifest_path = Path(manifest_path)
+    with manifest_path.open("r", encoding="utf-8") as file:
+        if manifest_path.suffix == ".jsonl":
+            defaults = {}
+            entries = [json.loads(line) for line in file if line.strip()]
+        else:
+            data = yaml.safe_load(file) or []
+            if isinstance(data, list):
+                defaults, entries = {}, data
+            else:
+                defaults, entries = data.get("defaults", {}), data.get("jobs", [])
+
+    return [{**defaults, **entry} for entry in entries]
+
+
+# Config sections that shape a job's outputs, and the fetch settings that
+# change which tiles are imported. Workers, profiling, caching and the like
+# only change how a job runs.
+OUTPUT_SECTIONS = (
+    "blosm",
+    "derive",
+    "export",
+    "input",
+    "merge",
+    "metadata",
+    "output",
+    "terrain",
+    "textures",
+    "tileset",
+)
+OUTPUT_FETCH_SETTINGS = ("engine", "geometric_error", "tiles_url")
+
+
+def get_job_key(config):
+    """
+    Hash of the settings that shape a job's outputs, so a job already done
+    with the same outputs is skipped even if other settings changed.
+    """
+    inputs = {section: config.get(section) for section in OUTPUT_SECTIONS}
+    fetch = config.get("fetch") or {}
+    inputs["fetch"] = {key: fetch.get(key) for key in OUTPUT_FETCH_SETTINGS}
+    canonical = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def format_argument(value):
+    """
+    A manifest value as a command-line argument value, lists become the comma
+    separated form the arguments use (export_formats=fbx,obj).
+    """
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return value
+
+
+def get_job_outputs(config):
+    """
+    The files a job writes, following the same output switches as
+    save_outputs, so a job only counts as done once all of them exist.
+    """
+    output_dir = Path(config["output"]["output_dir"])
+    custom_name = f"{config['output']['base_name']}_{config['blosm']['lod']}"
+    formats = get_export_formats(config)
+    if config["output"].get("export_glb", True) and "glb" not in formats:
+        formats.insert(0, "glb")
+
+    outputs = [output_dir / f"{custom_name}_metadata.csv"]
+    outputs.extend(
+        output_dir / f"{custom_name}{EXPORT_EXTENSIONS[export_format]}"
+        for export_format in formats
+    )
+    if config.get("terrain", {}).get("enabled"):
+        outputs.append(output_dir / f"{custom_name}_terrain.npz")
+    if config.get("tileset", {}).get("enabled"):
+        outputs.append(output_dir / f"{custom_name}_tiles" / "tileset.json")
+    if config["output"].get("save_blend", True):
+        outputs.append(output_dir / f"{custom_name}.blend")
+    return outputs
+
+
+def build_job(arguments, base_config):
+    [job] = build_jobs(arguments, [arguments["lod"]])
+    job["config"] = apply_arguments(base_config, job["arguments"])
+    validate_config(job["config"])
+    job["key"] = get_job_key(job["config"])
+    return job
+
+
+def build_batch_jobs(entries, arguments, base_config):
+    """
+    Expands the manifest entries into one job per LOD, each with its own
+    config built in memory from the base config.
+    """
+    jobs = []
+    for entry in entries:
+        entry = {key: value for key, value in entry.items() if value is not None}
+        lods = entry.pop("lods", None) or [
+            entry.pop("lod", None) or base_config["blosm"]["lod"]
+        ]
+        if isinstance(lods, str):
+            lods = lods.split(",")
+        entry = {key: format_argument(value) for key, value in entry.items()}
+
+        for job in build_jobs({**arguments, **entry}, lods):
+            jobs.append(build_job(job["arguments"], base_config))
+    return jobs
+
+
+def apply_job_limits(jobs, base_config, state):
+    """
+    Estimates every job before it runs. Jobs over the configured limits are
+    refused, or split into chunk jobs that each fit when estimate.on_exceed is
+    `chunk`. Returns the jobs to run and the chunk groups to merge afterwards.
+    """
+    limits = get_limits(base_config)
+    if not limits:
+        return jobs, []
+
+    on_exceed = base_config.get("estimate", {}).get("on_exceed") or "refuse"
+    tileset_cache = {}
+    accepted, chunk_groups = [], []
+
+    for job in jobs:
+        config = job["config"]
+        try:
+            [estimate] = estimate_region(
+                config, [config["blosm"]["lod"]], tileset_cache
+            )
+        except OSError as e:
+            print(f"Could not estimate {job['name']}, running it unchecked: {e}")
+            accepted.append(job)
+            continue
+
+        exceeded = check_limits(estimate, limits)
+        if not exceeded:
+            accepted.append(job)
+            continue
+
+        if on_exceed != "chunk":
+            print(f"Refusing {job['name']}: {', '.join(exceeded)}.")
+            state.record_refused(job, exceeded)
+            continue
+
+        print(f"Chunking {job['name']}: {', '.join(exceeded)}.")
+        cell_size_m = get_chunk_cell_size(config, estimate, limits)
+        regions = build_chunk_regions(
+            {**config, "chunking": {"cell_size_m": cell_size_m}},
+            config["blosm"]["lod"],
+        )
+        chunk_jobs = [
+            build_job({**job["arguments"], **region}, base_config) for region in regions
+        ]
+        accepted.extend(
+            chunk_job for chunk_job in chunk_jobs if not state.is_done(chunk_job)
+        )
+        chunk_groups.append({"job": job, "regions": regions, "jobs": chunk_jobs})
+
+    return accepted, chunk_groups
+
+
+def merge_chunk_groups(chunk_groups, state):
+    for group in chunk_groups:
+        if not all(state.is_done(chunk_job) for chunk_job in group["jobs"]):
+            print(f"Chunks of {group['job']['name']} incomplete, metadata not merged.")
+            continue
+
+        config = group["job"]["config"]
+        merge_chunk_metadata(
+            config["output"]["output_dir"],
+            config["output"]["base_name"],
+            config["blosm"]["lod"],
+            group["regions"],
+            config["blosm"]["scale_factor"],
+        )
+
+
+class BatchState:
+    """
+    Per-job completion state of a batch, saved next to the manifest after every
+    finished job so an interrupted batch can resume where it stopped.
+    """
+
+    def __init__(self, manifest_path):
+        manifest_path = Path(manifest_path)
+        self.path = manifest_path.with_name(f"{manifest_path.stem}.state.json")
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as file:
+                self.jobs = json.load(file).get("jobs", {})
+
+    def is_done(self, job):
+        state = self.jobs.get(job["key"])
+        if not state or state["status"] != "done":
+            return False
+        # Outputs removed since the last run have to be produced again
+        return all(path.exists() for path in get_job_outputs(job["config"]))
+
+    def record(self, job, result):
+        with self.lock:
+            self.jobs[job["key"]] = {
+                "name": job["name"],
+                "status": "done" if result["returncode"] == 0 else "failed",
+                "returncode": result["returncode"],
+                "output_dir": result["output_dir"],
+                "filename": result["filename"],
+                "duration": round(result["duration"], 1),
+                "finished": time.time(),
+            }
+            self.save()
+
+    def record_refused(self, job, reasons):
+        with self.lock:
+            self.jobs[job["key"]] = {
+                "name": job["name"],
+                "status": "refused",
+                "reasons": reasons,
+                "finished": time.time(),
+            }
+            self.save()
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as file:
+            json.dump({"jobs": self.jobs}, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def run_batch(manifest_path, arguments, base_config):
+    """
+    Runs every job of the manifest in headless Blender workers, skipping jobs
+    that already completed with the same inputs. Returns the last output folder.
+    """
+    entries = load_batch_manifest(manifest_path)
+    jobs = build_batch_jobs(entries, arguments, base_config)
+    state = BatchState(manifest_path)
+
+    pending = [job for job in jobs if not state.is_done(job)]
+    print(
+        f"\nBatch {manifest_path}: {len(jobs)} job(s), "
+        f"{len(jobs) - len(pending)} already done, {len(pending)} to run."
+    )
+    pending, chunk_groups = apply_job_limits(pending, base_config, state)
+    if not pending and not chunk_groups:
+        return None
+
+    results = run_parallel_jobs(
+        pending,
+        get_blender_path(base_config),
+        get_max_workers(base_config),
+        log_dir=base_config.get("workers", {}).get("log_dir"),
+        on_result=state.record,
+    )
+
+    merge_chunk_groups(chunk_groups, state)
+
+    output_dirs = [result["output_dir"] for result in results if result["output_dir"]]
+    return output_dirs[-1] if output_dirs else None
@@ -1,8 +1,22 @@
 import csv
+import hashlib
 from pathlib import Path
 import sys
+import tempfile
+import time
 import bpy
-from scripts.projection_utils import TransverseMercator, calculate_real_bounds
+import numpy as np
+from scripts.chunk_utils import owns_centers
+from scripts.fetch_utils import TilesFetcher, Y_UP_TO_Z_UP, localize_glb
+from scripts.index_utils import save_metadata_npz
+from scripts.terrain_utils import save_terrain_npz
+from scripts.profile_utils import stage
+from scripts.projection_utils import (
+    TransverseMercator,
+    calculate_exact_footprints,
+    calculate_real_bounds_batch,
+    enu_to_ecef_matrix,
+)
 
 
 def parse_blender_args():
@@ -29,7 +43,7 @@ def ensure_output_directory(output_dir):
     print(f"\nOutput directory ensured: {output_dir}")
 
 
-def install_and_enable_blosm(config):
+def install_and_enable_blosm(config, save_preferences=True):
     addon_name = "blosm"
     addon_zip_path = Path(config["blosm"]["addon_zip_path"])
 
@@ -47,7 +61,8 @@ def install_and_enable_blosm(config):
     if "FINISHED" in result:
         print(f"Enabling addon {addon_name}...")
         bpy.ops.preferences.addon_enable(module=addon_name)
-        bpy.ops.wm.save_userpref()
+        if save_preferences:
+            bpy.ops.wm.save_userpref()
 
         if addon_name in bpy.context.preferences.addons:
             print(f"Addon {addon_name} installed and enabled successfully.")
@@ -56,24 +71,72 @@ def install_and_enable_blosm(config):
     return False
 
 
-def set_blosm_preferences(config):
+def set_blosm_preferences(config, save_preferences=True):
+    """
+    Points Blosm at the data folder and API key. Parallel workers pass
+    save_preferences=False: the settings then only last for their session, so
+    they never write userpref.blend at the same time.
+    """
     addon_name = "blosm"
     blosm_prefs = bpy.context.preferences.addons[addon_name].preferences
 
     data_dir = Path(config["blosm"]["data_dir"])
     data_dir.mkdir(parents=True, exist_ok=True)
-    blosm_prefs.dataDir = str(data_dir)
+    google_api_key = config["secret"]["google_api_key"]
+
+    # Only write the user preferences to disk when something actually changed
+    if (
+        blosm_prefs.dataDir == str(data_dir)
+        and blosm_prefs.googleMapsApiKey == google_api_key
+    ):
+        print(f"\nPreferences already up to date: dataDir={data_dir}.")
+        return
 
-    blosm_prefs.googleMapsApiKey = config["secret"]["google_api_key"]
+    blosm_prefs.dataDir = str(data_dir)
+    blosm_prefs.googleMapsApiKey = google_api_key
 
+    if not save_preferences:
+        print(f"\nPreferences set for this session: dataDir={data_dir}.")
+        return
     bpy.ops.wm.save_userpref()
     print(f"\nPreferences updated: dataDir={data_dir}, Google API key set.")
 
 
+def purge_orphans():
+    """
+    Removes the data blocks no longer used by anything, such as the meshes,
+    materials and images of deleted tiles, so their memory is released.
+    """
+    if hasattr(bpy.data, "orphans_purge"):
+        return bpy.data.orphans_purge(do_local_ids=True, do_recursive=True)
+
+    # Older Blender: removing a mesh can orphan its materials, and those their
+    # images, so repeat until nothing is left
+    removed = 0
+    while True:
+        orphans = [
+            block
+            for blocks in (
+                bpy.data.meshes,
+                bpy.data.materials,
+                bpy.data.textures,
+                bpy.data.images,
+                bpy.data.node_groups,
+                bpy.data.collections,
+            )
+            for block in blocks
+            if block.users == 0 and not block.use_fake_user
+        ]
+        if not orphans:
+            return removed
+        bpy.data.batch_remove(orphans)
+        removed += len(orphans)
+
+
 def clear_scene():
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
-    print("\nScene cleared: All objects removed.")
+    scene_objects = list(bpy.context.scene.objects)
+    bpy.data.batch_remove(scene_objects)
+    print(f"\nScene cleared: All objects removed ({len(scene_objects)}).")
 
     default_collection = bpy.data.collections.get("Collection")
     if default_collection:
@@ -85,26 +148,179 @@ def clear_scene():
         bpy.data.collections.remove(prev_tile_collection)
         print("Previous Google 3D Tiles Collection removed.\n")
 
+    purged = purge_orphans()
+    if purged:
+        print(f"Released {purged} unused data block(s).")
+
+
+def reset_scene():
+    """
+    Brings a long-lived Blender session back to an empty scene between jobs.
+    """
+    clear_scene()
+
+    # Each job gets its own projection origin
+    scene = bpy.context.scene
+    for key in ("lat", "lon"):
+        if key in scene:
+            del scene[key]
+    print("Scene reset for the next job.")
+
+
+def rescale_scene(scale_factor, only=None):
+    """
+    Scales the location and scale of every mesh object, or only of those
+    among `only`, with one bulk array transfer per property instead of a
+    mathutils round trip per object.
+    """
+    objects = bpy.context.scene.objects
+    count = len(objects)
+    only = None if only is None else set(only)
+    is_mesh = np.fromiter(
+        (obj.type == "MESH" and (only is None or obj in only) for obj in objects),
+        dtype=bool,
+        count=count,
+    )
+
+    # float32 like Blender's own vectors, so the results match obj.scale *= factor
+    factor = np.float32(scale_factor)
+    for prop in ("scale", "location"):
+        values = np.empty(count * 3, dtype=np.float32)
+        objects.foreach_get(prop, values)
+        values = values.reshape(count, 3)
+        values[is_mesh] *= factor
+        objects.foreach_set(prop, values.ravel())
+
+    # foreach_set bypasses the property updates, tag the objects for the depsgraph
+    for obj, mesh in zip(objects, is_mesh):
+        if mesh:
+            obj.update_tag(refresh={"OBJECT"})
+    print(f"{int(is_mesh.sum())} object(s) rescaled by a factor of {scale_factor}.")
+
+
+def join_objects(meshes):
+    """
+    Joins the mesh objects into the first one, which is returned.
+    """
+    if len(meshes) > 1:
+        with bpy.context.temp_override(
+            active_object=meshes[0],
+            selected_editable_objects=meshes,
+            selected_objects=meshes,
+        ):
+            bpy.ops.object.join()
+    return meshes[0]
+
+
+def join_collection_meshes(collection):
+    meshes = [obj for obj in collection.objects if obj.type == "MESH"]
+    if len(meshes) < 2:
+        return
+    join_objects(meshes)
+
+
+def import_tiles(tiles, collection, origin_lat, origin_lon):
+    """
+    Imports fetched tiles into the collection, placed in local East-North-Up
+    coordinates around the origin. Each object records the URI and content
+    hash of its tile. Returns the imported objects.
+    """
+    # ECEF to local coordinates, expressed in the y-up frame of the glTF files
+    ecef_to_local = np.linalg.inv(enu_to_ecef_matrix(origin_lat, origin_lon))
+    z_up_to_y_up = np.linalg.inv(Y_UP_TO_Z_UP)
+
+    imported = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index, tile in enumerate(tiles):
+            data = Path(tile["file"]).read_bytes()
+            matrix = z_up_to_y_up @ ecef_to_local @ tile["transform"] @ Y_UP_TO_Z_UP
+            glb_path = Path(tmp_dir) / f"tile_{index}.glb"
+            glb_path.write_bytes(localize_glb(data, matrix))
+
+            bpy.ops.object.select_all(action="DESELECT")
+            bpy.ops.import_scene.gltf(filepath=str(glb_path))
+            for obj in bpy.context.selected_objects:
+                for users_collection in obj.users_collection:
+                    users_collection.objects.unlink(obj)
+                collection.objects.link(obj)
+                obj["tile_uri"] = tile["uri"]
+                obj["tile_sha1"] = hashlib.sha1(data).hexdigest()
+                imported.append(obj)
+    return imported
+
+
+def import_native_tiles(config):
+    """
+    Imports the tiles fetched by the native engine into the Google 3D Tiles
+    collection, placed in local East-North-Up coordinates around the origin.
+    """
+    scene = bpy.context.scene
+    box = config["input"]
+
+    origin_lat, origin_lon = box.get("origin_lat"), box.get("origin_lon")
+    if origin_lat is None or origin_lon is None:
+        if config["blosm"]["relative_to_initial_import"] and "lat" in scene:
+            origin_lat, origin_lon = scene["lat"], scene["lon"]
+        else:
+            origin_lat = (box["min_lat"] + box["max_lat"]) / 2
+            origin_lon = (box["min_lon"] + box["max_lon"]) / 2
+    scene["lat"], scene["lon"] = origin_lat, origin_lon
+
+    bbox = (box["min_lat"], box["min_lon"], box["max_lat"], box["max_lon"])
+    fetcher = TilesFetcher.from_config(config, bbox)
+    with stage("fetch") as details:
+        try:
+            tiles = fetcher.fetch_all()
+        except OSError as e:
+            print(f"\nFailed to fetch 3D Tiles: {e}")
+            return False
+        finally:
+            details.update(fetcher.stats)
+    if not tiles:
+        print("\nNo 3D Tiles found in the selected area.")
+        return False
+
+    collection = bpy.data.collections.new("Google 3D Tiles")
+    scene.collection.children.link(collection)
 
-def rescale_scene(scale_factor):
-    for obj in bpy.context.scene.objects:
-        if obj.type == "MESH":
-            obj.scale *= scale_factor
-            obj.location *= scale_factor  # also adjust location to match scale
-    print(f"Scene rescaled by a factor of {scale_factor}.")
+    with stage("gltf_import"):
+        import_tiles(tiles, collection, origin_lat, origin_lon)
+    drop_unowned_tiles(config)
+
+    if config["blosm"]["join_tiles_objects"]:
+        with stage("join"):
+            join_collection_meshes(collection)
+
+    print(f"Imported {len(tiles)} tile(s) around origin {origin_lat}, {origin_lon}.")
+    return True
 
 
 def import_google_3d_tiles(config):
     clear_scene()
 
+    if config.get("fetch", {}).get("engine") == "native":
+        imported = import_native_tiles(config)
+        return finish_tiles_import(config, imported)
+
     addon_name = "blosm"
     if addon_name not in bpy.context.preferences.addons:
         print(
             f"\n{addon_name} addon is not enabled. Please install and enable it first."
         )
-        return
+        return False
 
     scene = bpy.context.scene
+
+    # A shared origin makes separately imported chunks line up with each other
+    origin_lat = config["input"].get("origin_lat")
+    origin_lon = config["input"].get("origin_lon")
+    relative_to_initial_import = config["blosm"]["relative_to_initial_import"]
+    if origin_lat is not None and origin_lon is not None:
+        scene["lat"] = origin_lat
+        scene["lon"] = origin_lon
+        relative_to_initial_import = True
+        print(f"\nUsing shared projection origin: {origin_lat}, {origin_lon}")
+
     blosm_props = scene.blosm
     blosm_props.dataType = "3d-tiles"
     blosm_props.minLon = config["input"]["min_lon"]
@@ -114,17 +330,95 @@ def import_google_3d_tiles(config):
     blosm_props.lodOf3dTiles = config["blosm"]["lod"]
     blosm_props.threedTilesSource = config["blosm"]["threed_tiles_source"]
     blosm_props.join3dTilesObjects = config["blosm"]["join_tiles_objects"]
-    blosm_props.relativeToInitialImport = config["blosm"]["relative_to_initial_import"]
+    blosm_props.relativeToInitialImport = relative_to_initial_import
+
+    # Keep the downloaded files in the data directory so the tile cache can reuse them
+    if config.get("cache", {}).get("enabled"):
+        for cache_prop in ("cacheJsonFiles", "cache3dFiles"):
+            if hasattr(blosm_props, cache_prop):
+                setattr(blosm_props, cache_prop, True)
+
+    # Blosm downloads and imports inside one operator, so its network time
+    # cannot be told apart from the Blender time
+    with stage("blosm_import"):
+        try:
+            imported = bpy.ops.blosm.import_data() == {"FINISHED"}
+        except RuntimeError as e:
+            print(f"\nBlosm import raised an error: {e}")
+            imported = False
+    if imported:
+        drop_unowned_tiles(config, joined=config["blosm"]["join_tiles_objects"])
+    return finish_tiles_import(config, imported)
+
+
+def drop_unowned_tiles(config, joined=False):
+    """
+    A chunk imports every tile intersecting its cell, so tiles crossing a cell
+    border would be in several chunks. Removes the tiles whose center belongs
+    to another cell. Runs before the scene is rescaled.
+    """
+    chunk_box = config["input"].get("chunk_box")
+    collection = bpy.data.collections.get("Google 3D Tiles")
+    if not chunk_box or not collection:
+        return
+    objects = [obj for obj in collection.objects if obj.type == "MESH"]
+    if not objects:
+        return
+    if joined:
+        print("\nTiles joined by Blosm, border tiles may repeat in other chunks.")
+        return
 
-    if bpy.ops.blosm.import_data() == {"FINISHED"}:
-        print("\n3D Tiles successfully imported!\n")
-        rescale_scene(config["blosm"]["scale_factor"])
-    else:
+    scene = bpy.context.scene
+    projection = TransverseMercator(lat=scene["lat"], lon=scene["lon"])
+    bounds = calculate_real_bounds_batch(objects, projection)
+    box = config["input"]
+    cell = [box[key] for key in ("min_lat", "min_lon", "max_lat", "max_lon")]
+    owned = owns_centers(
+        (bounds[:, 0] + bounds[:, 2]) / 2,
+        (bounds[:, 1] + bounds[:, 3]) / 2,
+        cell,
+        chunk_box,
+    )
+
+    removed = [obj for obj, keep in zip(objects, owned) if not keep]
+    if removed:
+        meshes = [obj.data for obj in removed]
+        bpy.data.batch_remove(removed + meshes)
+        purge_orphans()
+        # An emptied chunk is not a failed import, its tiles are in other cells
+        collection["tiles_in_other_chunks"] = len(removed)
+    print(
+        f"\nKept {int(owned.sum())} tile(s) owned by this chunk, {len(removed)} left to others."
+    )
+
+
+def finish_tiles_import(config, imported):
+    """
+    Rescales a successful import, and reports an import that produced no
+    meshes as a failure instead of carrying on with an empty scene.
+    """
+    tiles_collection = bpy.data.collections.get("Google 3D Tiles")
+    if imported and not (
+        tiles_collection and any(obj.type == "MESH" for obj in tiles_collection.objects)
+    ):
+        if tiles_collection and tiles_collection.get("tiles_in_other_chunks"):
+            print("\nEvery tile of this chunk is owned by a neighbouring chunk.")
+        else:
+            print("\nThe import finished without any tile meshes.")
+            imported = False
+
+    if not imported:
         print("\nFailed to import 3D Tiles.")
+        return False
+
+    print("\n3D Tiles successfully imported!\n")
+    with stage("rescale"):
+        rescale_scene(config["blosm"]["scale_factor"])
+    return True
 
 
 def validate_collection_and_save_metadata(
-    output_dir, base_name, lod, projection, scale_factor
+    output_dir, base_name, lod, projection, scale_factor, hull_points=None
 ):
     tiles_collection = bpy.data.collections.get("Google 3D Tiles")
 
@@ -133,18 +427,27 @@ def validate_collection_and_save_metadata(
 
     metadata = []
 
-    # Calculate combined bounds for all objects in the collection
-    for obj in tiles_collection.objects:
-        if obj.type == "MESH":
-            real_min_lat, real_min_lon, real_max_lat, real_max_lon = (
-                calculate_real_bounds(obj, projection)
-            )
-
-            global_min_lat = min(global_min_lat, real_min_lat)
-            global_min_lon = min(global_min_lon, real_min_lon)
-            global_max_lat = max(global_max_lat, real_max_lat)
-            global_max_lon = max(global_max_lon, real_max_lon)
-
+    # Project the bounds of every mesh in the collection in one batched call.
+    # World matrices are brought up to date first, the scene has been rescaled
+    bpy.context.view_layer.update()
+    meshes = [obj for obj in tiles_collection.objects if obj.type == "MESH"]
+    bounds = calculate_real_bounds_batch(meshes, projection, scale_factor)
+    footprint_columns = {}
+    if hull_points and meshes:
+        # Tight bounds from every vertex, which also hold for rotated tiles
+        exact, hull, hull_offsets = calculate_exact_footprints(
+            meshes, projection, scale_factor, hull_points
+        )
+        bounds = np.where(np.isnan(exact), bounds, exact)
+        footprint_columns = {"footprint": hull, "footprint_offsets": hull_offsets}
+    if meshes:
+        # Calculate combined bounds for all objects in the collection
+        global_min_lat, global_min_lon = bounds[:, :2].min(axis=0).tolist()
+        global_max_lat, global_max_lon = bounds[:, 2:].max(axis=0).tolist()
+
+        for obj, (real_min_lat, real_min_lon, real_max_lat, real_max_lon) in zip(
+            meshes, bounds.tolist()
+        ):
             metadata.append(
                 {
                     "mesh_ID": obj.name,
@@ -197,12 +500,106 @@ def validate_collection_and_save_metadata(
         writer.writeheader()
         writer.writerows(metadata)
 
-    print(f"Metadata saved to {csv_path}\n")
+    print(f"Metadata saved to {csv_path}")
+
+    save_metadata_npz(
+        Path(output_dir) / f"{custom_name}_metadata.npz",
+        [obj.name for obj in meshes],
+        bounds,
+        origin_lat,
+        origin_lon,
+        scale_factor,
+        lod,
+        **get_source_mesh_columns(meshes),
+        **footprint_columns,
+    )
 
     return custom_name
 
 
-def save_blender_file(config):
+def get_source_mesh_columns(meshes):
+    """
+    Columns mapping merged cell meshes to the tile meshes they were built from,
+    stored as a flat name list with per-mesh offsets.
+    """
+    if not any("source_meshes" in obj for obj in meshes):
+        return {}
+
+    names, offsets = [], [0]
+    for obj in meshes:
+        names.extend(obj.get("source_meshes", obj.name).split("\n"))
+        offsets.append(len(names))
+    return {
+        "source_mesh_names": np.asarray(names, dtype=str),
+        "source_mesh_offsets": np.asarray(offsets, dtype=np.int64),
+    }
+
+
+def get_world_triangles(meshes, scale_factor):
+    """
+    World-space vertices of the meshes, divided by scale_factor to get meters,
+    with their triangles and where each mesh's triangles start.
+    """
+    vertices, triangles, offsets = [], [], [0]
+    vertex_count = 0
+    for obj in meshes:
+        mesh = obj.data
+        mesh.calc_loop_triangles()
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        indices = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", indices)
+
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        world = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        vertices.append((world / scale_factor).astype(np.float32))
+        triangles.append(indices.reshape(-1, 3) + vertex_count)
+        vertex_count += len(mesh.vertices)
+        offsets.append(offsets[-1] + len(mesh.loop_triangles))
+
+    if not vertices:
+        return np.empty((0, 3), np.float32), np.empty((0, 3), np.int32), offsets
+    return np.concatenate(vertices), np.concatenate(triangles), offsets
+
+
+def save_terrain_index(config, output_dir, custom_name):
+    """
+    Saves the triangles of the Google 3D Tiles meshes as {custom_name}_terrain.npz
+    for height and raycast queries without Blender.
+    """
+    tiles_collection = bpy.data.collections.get("Google 3D Tiles")
+    meshes = [
+        obj
+        for obj in (tiles_collection.objects if tiles_collection else [])
+        if obj.type == "MESH" and obj.data
+    ]
+    bpy.context.view_layer.update()
+    vertices, triangles, offsets = get_world_triangles(
+        meshes, config["blosm"]["scale_factor"]
+    )
+    if not len(triangles):
+        print("\nNo triangles to index for terrain queries.")
+        return {}
+
+    scene = bpy.context.scene
+    npz_path = save_terrain_npz(
+        Path(output_dir) / f"{custom_name}_terrain.npz",
+        vertices,
+        triangles,
+        [obj.name for obj in meshes],
+        offsets,
+        scene.get("lat", 0.0),
+        scene.get("lon", 0.0),
+        config["blosm"]["scale_factor"],
+        config["blosm"]["lod"],
+    )
+    return {"triangles": len(triangles), "size_mb": npz_path.stat().st_size / 1e6}
+
+
+DEFAULT_HULL_POINTS = 16
+
+
+def save_metadata(config):
     scene = bpy.context.scene
     projection = TransverseMercator(
         lat=scene.get("lat", 0.0), lon=scene.get("lon", 0.0)
@@ -215,11 +612,20 @@ def save_blender_file(config):
     output_dir = Path(config["output"]["output_dir"])
     ensure_output_directory(output_dir)
 
+    metadata = config.get("metadata", {})
+    hull_points = None
+    if metadata.get("exact_footprints"):
+        hull_points = int(metadata.get("hull_points") or DEFAULT_HULL_POINTS)
+
     custom_name = validate_collection_and_save_metadata(
-        output_dir, base_name, lod, projection, scale_factor
+        output_dir, base_name, lod, projection, scale_factor, hull_points
     )
 
-    blender_file = output_dir / f"{custom_name}.blend"
+    return output_dir, custom_name
+
+
+def save_blender_file(output_dir, custom_name):
+    blender_file = Path(output_dir) / f"{custom_name}.blend"
     if blender_file.exists():
         print(f"File {blender_file} already exists and will be overwritten.\n")
 
@@ -227,31 +633,35 @@ def save_blender_file(config):
     bpy.ops.wm.save_as_mainfile(filepath=str(blender_file))
     print(f"\nScene saved to {blender_file}")
 
-    return output_dir, custom_name
-
+    return blender_file
 
-def get_scene_triangles():
-    ## use dependency graph
-    # https://docs.blender.org/api/current/bpy.types.Depsgraph.html
-    depsgraph = bpy.context.evaluated_depsgraph_get()
 
-    # Update first the cache with calc_loop_triangles() before getting the triangle count
-    total_triangles = sum(
-        (obj.data.calc_loop_triangles(), len(obj.data.loop_triangles))[1]
-        for obj in depsgraph.objects
-        if obj.type == "MESH" and obj.data
-    )
+IMAGE_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
 
-    print(f"Total triangles in scene: {total_triangles}")
-    return total_triangles
 
-
-def unpack_textures():
+def unpack_textures(output_dir, unpack_dir=None):
+    """
+    Writes the packed images to files, in unpack_dir when given, otherwise in
+    the textures folder next to the .blend or the outputs. Returns the folder.
+    """
     print("\nUnpacking textures...")
 
-    unpack_dir = Path(bpy.data.filepath).parent / "textures"
-    bpy.ops.file.unpack_all(method="USE_LOCAL")
-    bpy.ops.file.make_paths_absolute()
+    if bpy.data.filepath and unpack_dir is None:
+        unpack_dir = Path(bpy.data.filepath).parent / "textures"
+        bpy.ops.file.unpack_all(method="USE_LOCAL")
+        bpy.ops.file.make_paths_absolute()
+        return unpack_dir
+
+    # The scene was never saved, or the caller needs a folder of its own
+    unpack_dir = Path(unpack_dir or Path(output_dir) / "textures")
+    unpack_dir.mkdir(parents=True, exist_ok=True)
+    for image in bpy.data.images:
+        if image.packed_file:
+            extension = IMAGE_EXTENSIONS.get(image.file_format, ".png")
+            image.filepath = str(
+                unpack_dir / f"{bpy.path.clean_name(image.name)}{extension}"
+            )
+            image.unpack(method="WRITE_ORIGINAL")
 
     return unpack_dir
 
@@ -279,16 +689,11 @@ def setup_fbx_export_settings():
     print("\nFBX export settings prepared.")
 
 
-def export_fbx(output_dir, custom_name):
-    blender_file = Path(output_dir) / f"{custom_name}.blend"
-    if not blender_file.exists():
-        print(f"Error: Input file {blender_file} does not exist.")
-        return
-
-    print(f"\nLoading Blender file: {blender_file}")
-    bpy.ops.wm.open_mainfile(filepath=str(blender_file))
-
-    texture_dir = unpack_textures()
+def export_fbx(output_dir, custom_name, texture_dir=None):
+    """
+    Exports the scene currently in memory, no need to reopen the saved .blend.
+    """
+    texture_dir = unpack_textures(output_dir, texture_dir)
     ensure_texture_links(texture_dir)
     setup_fbx_export_settings()
 
@@ -305,15 +710,48 @@ def export_fbx(output_dir, custom_name):
     print(f"FBX export completed: {fbx_filepath}")
 
 
-def export_gltf(output_dir, custom_name):
-    blender_file = Path(output_dir) / f"{custom_name}.blend"
-    if not blender_file.exists():
-        print(f"Error: Input file {blender_file} does not exist.")
-        return
-
-    print(f"\nLoading Blender file: {blender_file}")
-    bpy.ops.wm.open_mainfile(filepath=str(blender_file))
-
+# output.compression setting -> glTF exporter Draco quantization option
+DRACO_QUANTIZATION = {
+    "position_bits": "export_draco_position_quantization",
+    "normal_bits": "export_draco_normal_quantization",
+    "texcoord_bits": "export_draco_texcoord_quantization",
+    "color_bits": "export_draco_color_quantization",
+    "generic_bits": "export_draco_generic_quantization",
+}
+
+
+def get_gltf_compression_options(compression):
+    """
+    glTF exporter options for the output.compression config section. Draco
+    quantizes each attribute to the given number of bits (0 keeps it float)
+    and entropy codes the mesh at the given level, 0 fastest to 10 smallest.
+    """
+    if not compression or not compression.get("draco"):
+        return {}
+    options = {"export_draco_mesh_compression_enable": True}
+    if compression.get("draco_level") is not None:
+        options["export_draco_mesh_compression_level"] = int(compression["draco_level"])
+    for setting, option in DRACO_QUANTIZATION.items():
+        if compression.get(setting) is not None:
+            options[option] = int(compression[setting])
+    return options
+
+
+def export_gltf(output_dir, custom_name, compression=None):
+    """
+    Exports the scene currently in memory, no need to reopen the saved .blend.
+    Returns the size of the GLB in bytes.
+    """
     gltf_filepath = Path(output_dir) / f"{custom_name}.glb"
-    bpy.ops.export_scene.gltf(filepath=str(gltf_filepath), export_format="GLB")
-    print(f"GLTF export completed: {gltf_filepath}")
+    options = get_gltf_compression_options(compression)
+    start = time.perf_counter()
+    bpy.ops.export_scene.gltf(
+        filepath=str(gltf_filepath), export_format="GLB", **options
+    )
+    duration = time.perf_counter() - start
+    size = gltf_filepath.stat().st_size
+    print(
+        f"GLTF export completed: {gltf_filepath} ({size / 1e6:.1f} MB"
+        f"{', Draco compressed' if options else ''}, {duration:.1f}s)"
+    )
+    return size
@@ -0,0 +1,405 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+from pathlib import Path
+import time
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MANIFEST_NAME = "cache_manifest.json"
+# Serializes manifest updates and eviction between processes sharing the cache
+LOCK_NAME = "cache_manifest.lock"
+# Held shared by every run in progress, so eviction waits for the last one
+RUN_LOCK_NAME = "cache_runs.lock"
+
+# Unreachable proxy used to make sure an offline run never touches the network
+OFFLINE_PROXY = "http://127.0.0.1:9"
+PROXY_VARIABLES = ("HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy")
+NO_PROXY_VARIABLES = ("NO_PROXY", "no_proxy")
+
+# Tileset JSONs of the native fetcher, under the data directory
+TILESET_DIR = "native_tilesets"
+# Child tileset URIs carry a session, so online runs only reuse recent tilesets
+DEFAULT_TILESET_MAX_AGE_H = 2.0
+
+# Cache of the run in progress, so the fetcher can use it without having it
+# passed down
+active_cache = None
+
+
+@contextmanager
+def exclusive_lock(path):
+    """
+    Holds an exclusive lock on the file at path, created if missing, across
+    processes.
+    """
+    with open(path, "a+b") as file:
+        if fcntl:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def get_active_cache():
+    return active_cache
+
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TileCache:
+    """
+    A size-bounded cache over the Blosm data directory.
+
+    Blosm stores downloaded tiles under its data directory at paths derived from
+    the tile URIs. The cache keeps a manifest of those files keyed by their
+    relative path, with their content hash, size, last use and the LODs that
+    used them. Files with identical content are hard-linked to a single copy,
+    and the least recently used files are evicted once the cache grows above
+    its size cap. Hits are recorded by the native fetcher as it reads cached
+    tiles and tileset JSONs. Blosm reads its files itself, so its hits are not
+    counted, and the files it probably read are kept as recently used.
+
+    Runs sharing the data directory, such as parallel LOD workers, update the
+    manifest under a file lock and merge their changes into the one on disk.
+    Files are only evicted by a run that finds no other run in progress.
+    """
+
+    def __init__(
+        self,
+        data_dir,
+        max_size_mb=None,
+        offline=False,
+        track_hits=True,
+        tileset_max_age_h=DEFAULT_TILESET_MAX_AGE_H,
+    ):
+        self.data_dir = Path(data_dir)
+        self.manifest_path = self.data_dir / MANIFEST_NAME
+        self.max_size = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.offline = offline
+        self.track_hits = track_hits
+        self.tileset_max_age = float(tileset_max_age_h) * 3600
+        self.used = set()
+        self.saved_environment = {}
+        self.entries = self.load_manifest()
+        self.run_lock = None
+        self.snapshot = {}
+        self.lod = None
+        self.stats = {}
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("cache", {})
+        if not cache_config.get("enabled"):
+            return None
+        return cls(
+            config["blosm"]["data_dir"],
+            max_size_mb=cache_config.get("max_size_mb"),
+            offline=bool(cache_config.get("offline")),
+            track_hits=config.get("fetch", {}).get("engine") == "native",
+            tileset_max_age_h=(
+                DEFAULT_TILESET_MAX_AGE_H
+                if cache_config.get("tileset_max_age_h") is None
+                else cache_config["tileset_max_age_h"]
+            ),
+        )
+
+    def load_manifest(self):
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as file:
+                return json.load(file).get("entries", {})
+        except (OSError, ValueError) as e:
+            print(f"Cache manifest unreadable, rebuilding it: {e}")
+            return {}
+
+    def save_manifest(self):
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as file:
+            json.dump({"entries": self.entries}, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def scan(self):
+        """
+        Returns {relative path: os.stat_result} for every cached file.
+        """
+        files = {}
+        if not self.data_dir.exists():
+            return files
+        for path in self.data_dir.rglob("*"):
+            if path.is_file() and path.name not in (
+                MANIFEST_NAME,
+                self.manifest_path.with_suffix(".tmp").name,
+                LOCK_NAME,
+                RUN_LOCK_NAME,
+            ):
+                files[path.relative_to(self.data_dir).as_posix()] = path.stat()
+        return files
+
+    def cached_count(self, lod):
+        return sum(1 for entry in self.entries.values() if lod in entry["lods"])
+
+    def locked(self):
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        return exclusive_lock(self.data_dir / LOCK_NAME)
+
+    def acquire_run_lock(self):
+        if fcntl is None:
+            return
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.run_lock = open(self.data_dir / RUN_LOCK_NAME, "a+b")
+        fcntl.flock(self.run_lock, fcntl.LOCK_SH)
+
+    def release(self):
+        """
+        Ends the run: releases the run lock and restores the proxy settings
+        offline mode replaced. Safe to call more than once.
+        """
+        global active_cache
+        if active_cache is self:
+            active_cache = None
+        if self.run_lock:
+            self.run_lock.close()
+            self.run_lock = None
+        for variable, value in self.saved_environment.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+        self.saved_environment = {}
+
+    def get_tileset_path(self, url):
+        # Session and key change between runs, the path identifies the tileset
+        name = hashlib.sha1(urlsplit(url).path.encode("utf-8")).hexdigest()
+        return self.data_dir / TILESET_DIR / f"{name}.json"
+
+    def load_tileset(self, url):
+        """
+        The cached body of a tileset JSON, or None when it has to be fetched.
+        Offline runs take any cached tileset, online runs only recent ones.
+        """
+        path = self.get_tileset_path(url)
+        try:
+            age = time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if not self.offline and age > self.tileset_max_age:
+            return None
+        self.record_hit(path)
+        return path.read_bytes()
+
+    def record_hit(self, path):
+        try:
+            relative = Path(path).resolve().relative_to(self.data_dir.resolve())
+        except ValueError:
+            return
+        self.used.add(relative.as_posix())
+
+    def is_only_run(self):
+        """
+        Whether no other run is using the cache, so files can be evicted
+        without deleting tiles another process is still reading.
+        """
+        if self.run_lock is None:
+            return True
+        try:
+            fcntl.flock(self.run_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        fcntl.flock(self.run_lock, fcntl.LOCK_SH)
+        return True
+
+    def begin_run(self, lod):
+        global active_cache
+        self.lod = lod
+        self.used = set()
+        active_cache = self
+        self.acquire_run_lock()
+        with self.locked():
+            self.entries = self.load_manifest()
+            self.snapshot = self.scan()
+        print(
+            f"\nTile cache: {len(self.entries)} file(s), {self.total_size() / 1e6:.1f} MB, "
+            f"{self.cached_count(lod)} used before by {lod}."
+        )
+
+        if self.offline:
+            if not self.cached_count(lod):
+                self.release()
+                raise RuntimeError(
+                    f"Offline mode: the cache in {self.data_dir} has no tiles for {lod}."
+                )
+            self.saved_environment = {
+                variable: os.environ.get(variable)
+                for variable in PROXY_VARIABLES + NO_PROXY_VARIABLES
+            }
+            for variable in PROXY_VARIABLES:
+                os.environ[variable] = OFFLINE_PROXY
+            for variable in NO_PROXY_VARIABLES:
+                os.environ.pop(variable, None)
+            print("Offline mode: serving this run from the cache only.")
+
+    def end_run(self):
+        try:
+            with self.locked():
+                return self.update_manifest()
+        finally:
+            self.release()
+
+    def update_manifest(self):
+        now = time.time()
+        # Other runs may have added, used or evicted files since this one began
+        self.entries = self.load_manifest()
+        current = self.scan()
+        hits = misses = downloaded_bytes = 0
+        hashes = {entry["sha256"]: path for path, entry in self.entries.items()}
+
+        for path, stat in current.items():
+            before = self.snapshot.get(path)
+            downloaded = (
+                before is None
+                or before.st_mtime_ns != stat.st_mtime_ns
+                or before.st_size != stat.st_size
+            )
+
+            if downloaded or path not in self.entries:
+                # Files that were already there before the cache was enabled
+                # are adopted without counting them as downloads
+                if downloaded:
+                    misses += 1
+                    downloaded_bytes += stat.st_size
+                sha256 = hash_file(self.data_dir / path)
+                self.link_duplicate(path, hashes.get(sha256))
+                hashes.setdefault(sha256, path)
+                entry = self.entries.setdefault(path, {"lods": []})
+                entry.update({"sha256": sha256, "size": stat.st_size})
+                entry["last_used"] = now if downloaded else stat.st_mtime
+                if not downloaded:
+                    continue
+            elif path in self.used:
+                hits += 1
+            elif not self.track_hits and self.probably_used(path, before, stat):
+                # Kept as recently used, so eviction spares it, but not counted
+                self.entries[path]["last_used"] = now
+                continue
+            else:
+                continue
+
+            entry = self.entries[path]
+            entry["last_used"] = now
+            if not downloaded:
+                entry["hits"] = entry.get("hits", 0) + 1
+            if self.lod not in entry["lods"]:
+                entry["lods"].append(self.lod)
+
+        # Forget files that were removed outside of the cache
+        for path in set(self.entries) - set(current):
+            del self.entries[path]
+
+        if self.is_only_run():
+            evicted = self.evict()
+        else:
+            evicted = 0
+            print("\nOther runs are using the tile cache, eviction left to them.")
+        self.save_manifest()
+
+        self.stats = {
+            "lod": self.lod,
+            "hits": hits if self.track_hits else None,
+            "misses": misses,
+            "downloaded_bytes": downloaded_bytes,
+            "evicted": evicted,
+            "files": len(self.entries),
+            "size_bytes": self.total_size(),
+        }
+        return self.stats
+
+    def probably_used(self, path, before, stat):
+        """
+        Whether a Blosm run, whose reads cannot be recorded, may have read a
+        cached file: it was read according to its access time, or this LOD
+        used it before. Errs on keeping files, never on evicting them.
+        """
+        return (
+            stat.st_atime_ns > before.st_atime_ns
+            or self.lod in self.entries[path]["lods"]
+        )
+
+    def link_duplicate(self, path, existing_path):
+        """
+        Replaces a newly written file with a hard link to an identical cached one.
+        """
+        if not existing_path or existing_path == path:
+            return
+        target = self.data_dir / path
+        try:
+            tmp_path = target.with_name(target.name + ".link")
+            os.link(self.data_dir / existing_path, tmp_path)
+            os.replace(tmp_path, target)
+        except OSError:
+            pass
+
+    def total_size(self):
+        # Hard-linked duplicates share their storage, so count each hash once
+        sizes = {entry["sha256"]: entry["size"] for entry in self.entries.values()}
+        return sum(sizes.values())
+
+    def evict(self):
+        if not self.max_size:
+            return 0
+
+        links = {}
+        for entry in self.entries.values():
+            links[entry["sha256"]] = links.get(entry["sha256"], 0) + 1
+        total_size = self.total_size()
+
+        evicted = 0
+        by_age = sorted(self.entries.items(), key=lambda item: item[1]["last_used"])
+        for path, entry in by_age:
+            if total_size <= self.max_size:
+                break
+            try:
+                (self.data_dir / path).unlink()
+            except FileNotFoundError:
+                pass
+            del self.entries[path]
+            evicted += 1
+
+            # Storage is only released once the last link to the content is gone
+            links[entry["sha256"]] -= 1
+            if not links[entry["sha256"]]:
+                total_size -= entry["size"]
+        return evicted
+
+    def print_stats(self):
+        if not self.stats:
+            return
+        stats = self.stats
+        hits = "untracked" if stats["hits"] is None else stats["hits"]
+        print(
+            f"\nTile cache for {stats['lod']}: {hits} hit(s), {stats['misses']} miss(es), "
+            f"{stats['downloaded_bytes'] / 1e6:.1f} MB downloaded, {stats['evicted']} evicted, "
+            f"{stats['files']} file(s) / {stats['size_bytes'] / 1e6:.1f} MB cached."
+        )
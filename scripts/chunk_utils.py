@@ -0,0 +1,214 @@
+import csv
+import math
+from pathlib import Path
+import numpy as np
+from scripts.index_utils import save_metadata_npz
+
+METERS_PER_DEGREE = 111320.0
+
+# Rough edge length in meters of the 3D Tiles picked for each LOD, used to turn
+# an expected tile count per cell into a cell size
+LOD_TILE_SIZE_M = {
+    "lod1": 2000.0,
+    "lod2": 1000.0,
+    "lod3": 500.0,
+    "lod4": 250.0,
+    "lod5": 120.0,
+    "lod6": 60.0,
+}
+
+METADATA_FIELDS = ["mesh_ID", "max_lat", "max_lon", "min_lat", "min_lon"]
+TRAILER_ROWS = ("global_bounds:", "extra_data", "origin:")
+
+
+def get_cell_size(chunking, lod):
+    """
+    Cell size in meters, either given directly or derived from the expected
+    number of tiles per cell for the LOD.
+    """
+    if chunking.get("max_tiles_per_cell"):
+        tile_size = LOD_TILE_SIZE_M.get(lod, LOD_TILE_SIZE_M["lod4"])
+        return tile_size * math.sqrt(float(chunking["max_tiles_per_cell"]))
+    return float(chunking.get("cell_size_m") or 500.0)
+
+
+def partition_bbox(min_lat, min_lon, max_lat, max_lon, cell_size_m):
+    """
+    Splits the bounding box into a grid of cells of about cell_size_m meters.
+    Returns a list of regions with their grid position and bounds.
+    """
+    mid_lat = math.radians((min_lat + max_lat) / 2)
+    height_m = (max_lat - min_lat) * METERS_PER_DEGREE
+    width_m = (max_lon - min_lon) * METERS_PER_DEGREE * math.cos(mid_lat)
+
+    rows = max(1, math.ceil(height_m / cell_size_m))
+    cols = max(1, math.ceil(width_m / cell_size_m))
+    lat_step = (max_lat - min_lat) / rows
+    lon_step = (max_lon - min_lon) / cols
+
+    regions = []
+    for row in range(rows):
+        for col in range(cols):
+            regions.append(
+                {
+                    "row": row,
+                    "col": col,
+                    "min_lat": min_lat + row * lat_step,
+                    "min_lon": min_lon + col * lon_step,
+                    # Snap the last cell to the box edge to avoid rounding gaps
+                    "max_lat": (
+                        max_lat if row == rows - 1 else min_lat + (row + 1) * lat_step
+                    ),
+                    "max_lon": (
+                        max_lon if col == cols - 1 else min_lon + (col + 1) * lon_step
+                    ),
+                }
+            )
+    return regions
+
+
+def owns_centers(lats, lons, cell, box):
+    """
+    Whether each tile center belongs to the cell, so that a tile crossing cell
+    borders is kept by exactly one chunk. Cells hold their south and west
+    edges; the last row and column also hold the box's north and east edges.
+    Centers outside the box belong to the nearest edge cell. cell and box are
+    (min_lat, min_lon, max_lat, max_lon).
+    """
+    lats = np.clip(np.asarray(lats, dtype=np.float64), box[0], box[2])
+    lons = np.clip(np.asarray(lons, dtype=np.float64), box[1], box[3])
+    in_lat = (lats >= cell[0]) & ((lats < cell[2]) | (cell[2] >= box[2]))
+    in_lon = (lons >= cell[1]) & ((lons < cell[3]) | (cell[3] >= box[3]))
+    return in_lat & in_lon
+
+
+def build_chunk_regions(config, lod):
+    """
+    Builds the per-chunk argument overrides for a LOD. All chunks share the
+    center of the whole box as projection origin so the pieces line up.
+    """
+    box = config["input"]
+    cell_size_m = get_cell_size(config.get("chunking", {}), lod)
+    regions = partition_bbox(
+        box["min_lat"], box["min_lon"], box["max_lat"], box["max_lon"], cell_size_m
+    )
+
+    origin_lat = box.get("origin_lat")
+    origin_lon = box.get("origin_lon")
+    if origin_lat is None or origin_lon is None:
+        origin_lat = (box["min_lat"] + box["max_lat"]) / 2
+        origin_lon = (box["min_lon"] + box["max_lon"]) / 2
+
+    base_name = config["output"]["base_name"]
+    # Lets each chunk keep only the tiles it owns, see owns_centers
+    chunk_box = ",".join(
+        str(box[key]) for key in ("min_lat", "min_lon", "max_lat", "max_lon")
+    )
+    print(
+        f"\nSplitting {base_name} {lod} into {len(regions)} chunk(s) of ~{cell_size_m:.0f}m."
+    )
+
+    return [
+        {
+            "base_name": f"{base_name}_r{region['row']}c{region['col']}",
+            "min_lat": region["min_lat"],
+            "min_lon": region["min_lon"],
+            "max_lat": region["max_lat"],
+            "max_lon": region["max_lon"],
+            "origin_lat": origin_lat,
+            "origin_lon": origin_lon,
+            "chunk_box": chunk_box,
+        }
+        for region in regions
+    ]
+
+
+def merge_chunk_metadata(output_dir, base_name, lod, regions, scale_factor):
+    """
+    Combines the per-chunk metadata CSVs into {base_name}_{lod}_metadata.csv,
+    with a chunk column and the bounds and origin recomputed for the whole box.
+    A mesh listed by several chunks, with the same ID and bounds, is kept once.
+    """
+    output_dir = Path(output_dir)
+    rows = []
+    seen = set()
+    missing = []
+
+    for region in regions:
+        chunk_name = region["base_name"]
+        chunk_csv = output_dir / f"{chunk_name}_{lod}_metadata.csv"
+        if not chunk_csv.exists():
+            missing.append(chunk_csv.name)
+            continue
+
+        with chunk_csv.open(newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                if row["mesh_ID"] in TRAILER_ROWS:
+                    continue
+                key = tuple(row[field] for field in METADATA_FIELDS)
+                if key in seen:
+                    continue
+                seen.add(key)
+                row["chunk"] = chunk_name
+                rows.append(row)
+
+    if missing:
+        print(f"Missing chunk metadata, skipped: {', '.join(missing)}")
+
+    save_metadata_npz(
+        output_dir / f"{base_name}_{lod}_metadata.npz",
+        [row["mesh_ID"] for row in rows],
+        [
+            [
+                float(row[field])
+                for field in ("min_lat", "min_lon", "max_lat", "max_lon")
+            ]
+            for row in rows
+        ],
+        regions[0]["origin_lat"] if regions else 0.0,
+        regions[0]["origin_lon"] if regions else 0.0,
+        scale_factor,
+        lod,
+        chunk=[row["chunk"] for row in rows],
+    )
+
+    global_bounds = {"mesh_ID": "global_bounds:", "chunk": ""}
+    if rows:
+        global_bounds["max_lat"] = max(float(row["max_lat"]) for row in rows)
+        global_bounds["max_lon"] = max(float(row["max_lon"]) for row in rows)
+        global_bounds["min_lat"] = min(float(row["min_lat"]) for row in rows)
+        global_bounds["min_lon"] = min(float(row["min_lon"]) for row in rows)
+
+    origin_lat = regions[0]["origin_lat"] if regions else ""
+    origin_lon = regions[0]["origin_lon"] if regions else ""
+
+    rows.append(global_bounds)
+    rows.append(
+        {
+            "mesh_ID": "extra_data",
+            "max_lat": "----------",
+            "max_lon": "----------",
+            "min_lat": "----------",
+            "min_lon": "----------",
+            "chunk": "----------",
+        }
+    )
+    rows.append(
+        {
+            "mesh_ID": "origin:",
+            "max_lat": origin_lat,
+            "max_lon": origin_lon,
+            "min_lat": "scale_factor:",
+            "min_lon": scale_factor,
+            "chunk": "",
+        }
+    )
+
+    csv_path = output_dir / f"{base_name}_{lod}_metadata.csv"
+    with csv_path.open(mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=METADATA_FIELDS + ["chunk"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Combined metadata saved to {csv_path}\n")
+    return csv_path
@@ -1,3 +1,4 @@
+import copy
 from pathlib import Path
 import shutil
 import yaml
@@ -24,6 +25,17 @@ def ensure_config_exists():
     return config_path
 
 
+def is_safe_name(name):
+    """
+    Whether a base_name is a plain file name, which cannot point output or log
+    paths outside their directory.
+    """
+    name = str(name)
+    return bool(name.strip()) and not (
+        "/" in name or "\\" in name or ".." in name or name != Path(name).name
+    )
+
+
 def validate_config(config):
     required_fields = {
         "secret": ["google_api_key"],
@@ -46,6 +58,13 @@ def validate_config(config):
             ):
                 missing_fields.append(f"{section}.{field}")
 
+    base_name = config.get("output", {}).get("base_name")
+    if base_name and not is_safe_name(base_name):
+        raise ValueError(
+            f"\nConfiguration Error: output.base_name {base_name!r} must be a plain "
+            "file name, without path separators or '..'."
+        )
+
     if missing_fields:
         error_message = (
             "\nConfiguration Error: The following required fields are missing or empty:"
@@ -62,7 +81,53 @@ def load_config(config_path):
     return config
 
 
-def update_config(config, arguments, config_path):
+# CLI argument -> output.compression setting
+DRACO_ARGUMENTS = {
+    "draco_level": "draco_level",
+    "draco_position_bits": "position_bits",
+    "draco_normal_bits": "normal_bits",
+    "draco_texcoord_bits": "texcoord_bits",
+    "draco_color_bits": "color_bits",
+    "draco_generic_bits": "generic_bits",
+}
+
+
+# Export format -> file extension
+EXPORT_EXTENSIONS = {
+    "glb": ".glb",
+    "fbx": ".fbx",
+    "obj": ".obj",
+    "usd": ".usdc",
+}
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_export_formats(config):
+    formats = config.get("export", {}).get("formats") or []
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    formats = [str(export_format).strip().lower() for export_format in formats]
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_EXTENSIONS]
+    if unknown:
+        raise ValueError(
+            f"Unsupported export format(s): {', '.join(unknown)}. "
+            f"Use {', '.join(EXPORT_EXTENSIONS)}."
+        )
+    return list(dict.fromkeys(formats))
+
+
+def apply_arguments(config, arguments):
+    """
+    Returns a copy of the config with the arguments merged in, leaving the
+    given config and config.yaml untouched.
+    """
+    config = copy.deepcopy(config)
+
     if "google_api_key" in arguments:
         config.setdefault("secret", {})["google_api_key"] = arguments["google_api_key"]
 
@@ -75,9 +140,117 @@ def update_config(config, arguments, config_path):
     if "max_lon" in arguments:
         config.setdefault("input", {})["max_lon"] = float(arguments["max_lon"])
 
+    if "origin_lat" in arguments:
+        config.setdefault("input", {})["origin_lat"] = float(arguments["origin_lat"])
+    if "origin_lon" in arguments:
+        config.setdefault("input", {})["origin_lon"] = float(arguments["origin_lon"])
+    if "chunk_box" in arguments:
+        config.setdefault("input", {})["chunk_box"] = [
+            float(value) for value in str(arguments["chunk_box"]).split(",")
+        ]
+
+    if "chunked" in arguments:
+        config.setdefault("chunking", {})["enabled"] = True
+    if "cell_size_m" in arguments:
+        config.setdefault("chunking", {})["cell_size_m"] = float(
+            arguments["cell_size_m"]
+        )
+    if "max_tiles_per_cell" in arguments:
+        config.setdefault("chunking", {})["max_tiles_per_cell"] = int(
+            arguments["max_tiles_per_cell"]
+        )
+
+    if "merge_cells" in arguments:
+        config.setdefault("merge", {})["enabled"] = True
+    if "merge_cell_size_m" in arguments:
+        config.setdefault("merge", {})["cell_size_m"] = float(
+            arguments["merge_cell_size_m"]
+        )
+
+    if "optimize_textures" in arguments:
+        config.setdefault("textures", {})["enabled"] = True
+    if "texture_max_size" in arguments:
+        config.setdefault("textures", {})["max_size"] = int(
+            arguments["texture_max_size"]
+        )
+    if "texture_format" in arguments:
+        config.setdefault("textures", {})["format"] = arguments["texture_format"]
+    if "texture_quality" in arguments:
+        config.setdefault("textures", {})["quality"] = int(arguments["texture_quality"])
+
+    if "fetch_engine" in arguments:
+        config.setdefault("fetch", {})["engine"] = arguments["fetch_engine"]
+    if "tiles_url" in arguments:
+        config.setdefault("fetch", {})["tiles_url"] = arguments["tiles_url"]
+
+    if "offline" in arguments:
+        config.setdefault("cache", {}).update({"enabled": True, "offline": True})
+
+    if "profiling" in arguments:
+        config.setdefault("profiling", {})["enabled"] = parse_bool(
+            arguments["profiling"]
+        )
+    if "profile" in arguments:
+        config.setdefault("profiling", {}).update({"enabled": True, "cprofile": True})
+
     if "base_name" in arguments:
         config.setdefault("output", {})["base_name"] = arguments["base_name"]
 
+    if "output_dir" in arguments:
+        config.setdefault("output", {})["output_dir"] = arguments["output_dir"]
+    if "data_dir" in arguments:
+        config.setdefault("blosm", {})["data_dir"] = arguments["data_dir"]
+
+    if "save_blend" in arguments:
+        config.setdefault("output", {})["save_blend"] = parse_bool(
+            arguments["save_blend"]
+        )
+
+    if "refresh" in arguments:
+        config.setdefault("refresh", {})["enabled"] = parse_bool(arguments["refresh"])
+
+    if "exact_footprints" in arguments:
+        config.setdefault("metadata", {})["exact_footprints"] = parse_bool(
+            arguments["exact_footprints"]
+        )
+
+    if "terrain_index" in arguments:
+        config.setdefault("terrain", {})["enabled"] = parse_bool(
+            arguments["terrain_index"]
+        )
+
+    if "export_formats" in arguments:
+        config.setdefault("export", {})["formats"] = [
+            export_format
+            for export_format in str(arguments["export_formats"]).split(",")
+            if export_format
+        ]
+
+    if "export_glb" in arguments:
+        config.setdefault("output", {})["export_glb"] = parse_bool(
+            arguments["export_glb"]
+        )
+    if "tileset" in arguments:
+        config.setdefault("tileset", {})["enabled"] = parse_bool(arguments["tileset"])
+    if "tileset_max_depth" in arguments:
+        config.setdefault("tileset", {})["max_depth"] = int(
+            arguments["tileset_max_depth"]
+        )
+    if "tileset_node_triangles" in arguments:
+        config.setdefault("tileset", {})["max_node_triangles"] = int(
+            arguments["tileset_node_triangles"]
+        )
+
+    if "draco" in arguments:
+        config.setdefault("output", {}).setdefault("compression", {})["draco"] = (
+            parse_bool(arguments["draco"])
+        )
+    for argument, setting in DRACO_ARGUMENTS.items():
+        if argument in arguments:
+            config.setdefault("output", {}).setdefault("compression", {})[setting] = (
+                int(arguments[argument])
+            )
+
     if "lod" in arguments:
         config.setdefault("blosm", {})["lod"] = arguments["lod"]
 
@@ -87,6 +260,16 @@ def update_config(config, arguments, config_path):
             raise ValueError("Scale factor must be a positive value greater than 0.")
         config.setdefault("blosm", {})["scale_factor"] = scale_factor
 
+    return config
+
+
+def update_config(config, arguments, config_path, persist=True):
+    config = apply_arguments(config, arguments)
+
+    if not persist:
+        print("\nConfiguration updated in memory only.")
+        return config
+
     with config_path.open("w", encoding="utf-8") as file:
         yaml.safe_dump(config, file, default_flow_style=False)
 
@@ -0,0 +1,153 @@
+from multiprocessing.connection import Client, Listener
+import os
+import sys
+import time
+import traceback
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 6001
+AUTHKEY_ENV = "GOOGLE_TILES_DAEMON_KEY"
+
+
+def get_daemon_address(config):
+    daemon = config.get("daemon", {})
+    return (daemon.get("host") or DEFAULT_HOST, int(daemon.get("port") or DEFAULT_PORT))
+
+
+def get_daemon_authkey(config):
+    authkey = os.environ.get(AUTHKEY_ENV) or config.get("daemon", {}).get("authkey")
+    if not authkey:
+        raise ValueError(
+            f"No daemon authkey set. Set daemon.authkey in config.yaml or the {AUTHKEY_ENV} environment variable."
+        )
+    return str(authkey).encode("utf-8")
+
+
+def run_worker_daemon(handler, reset, address, authkey):
+    """
+    Serves jobs from a single warm Blender session until a shutdown request.
+
+    Each job is a dict of arguments, as parsed from the command line. handler
+    runs one job and returns (output_dir, filename); reset is called between
+    jobs to bring the scene back to empty.
+    """
+    with Listener(address, authkey=authkey) as listener:
+        print(f"\nWorker daemon listening on {address[0]}:{address[1]}...")
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                print(f"Rejected connection: {e}")
+                continue
+
+            with connection:
+                try:
+                    request = connection.recv()
+                    command, arguments = parse_request(request)
+                except EOFError:
+                    continue
+                except Exception as e:
+                    # A malformed request must not take the daemon down
+                    print(f"Invalid request: {e}")
+                    send_reply(connection, {"status": "failed", "error": str(e)})
+                    continue
+
+                if command == "shutdown":
+                    send_reply(connection, {"status": "stopped"})
+                    print("Shutdown requested, stopping worker daemon.")
+                    return
+
+                send_reply(connection, run_daemon_job(handler, reset, arguments))
+
+
+def parse_request(request):
+    """
+    Returns the (command, arguments) of a request, raising ValueError when it
+    is not a shutdown or a run request with a dict of arguments.
+    """
+    if not isinstance(request, dict):
+        raise ValueError(f"expected a dict, got {type(request).__name__}")
+    command = request.get("command")
+    if command == "shutdown":
+        return command, None
+    if command != "run":
+        raise ValueError(f"unknown command {command!r}")
+    arguments = request.get("arguments")
+    if not isinstance(arguments, dict):
+        raise ValueError("a run request needs a dict of arguments")
+    return command, arguments
+
+
+def send_reply(connection, reply):
+    try:
+        connection.send(reply)
+    except OSError as e:
+        print(f"Could not reply to the client: {e}")
+
+
+def run_daemon_job(handler, reset, arguments):
+    lod = arguments.get("lod", "")
+    print(f"\nDaemon job received: {arguments.get('base_name', '')} {lod}")
+
+    start = time.perf_counter()
+    result = {"status": "ok", "output_dir": None, "filename": None, "error": None}
+    try:
+        output_dir, filename = handler(arguments)
+        result["output_dir"] = str(output_dir) if output_dir else None
+        result["filename"] = filename
+        if not output_dir:
+            result["status"] = "failed"
+    except Exception as e:
+        traceback.print_exc()
+        result.update({"status": "failed", "error": str(e)})
+    finally:
+        try:
+            reset()
+        except Exception as e:
+            print(f"Failed to reset the scene: {e}")
+
+    result["duration"] = time.perf_counter() - start
+    print(f"Daemon job {result['status']} in {result['duration']:.1f}s.")
+    return result
+
+
+def submit_job(arguments, address, authkey):
+    """
+    Sends one job to a running worker daemon and waits for its result.
+    """
+    with Client(address, authkey=authkey) as connection:
+        connection.send({"command": "run", "arguments": arguments})
+        return connection.recv()
+
+
+def stop_daemon(address, authkey):
+    with Client(address, authkey=authkey) as connection:
+        connection.send({"command": "shutdown"})
+        return connection.recv()
+
+
+if __name__ == "__main__":
+    # Client side, runs with any Python: python -m scripts.daemon_utils key=value ...
+    from pathlib import Path
+    from scripts.config_utils import load_config
+
+    config = load_config(
+        Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+    )
+    address = get_daemon_address(config)
+    authkey = get_daemon_authkey(config)
+
+    arguments = {}
+    for arg in sys.argv[1:]:
+        if "=" in arg:
+            key, value = arg.split("=", 1)
+            arguments[key] = value
+        else:
+            arguments[arg] = True
+
+    if "shutdown" in arguments:
+        print(stop_daemon(address, authkey))
+    else:
+        result = submit_job(arguments, address, authkey)
+        print(result)
+        sys.exit(0 if result["status"] == "ok" else 1)
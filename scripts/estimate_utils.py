@@ -0,0 +1,245 @@
+import asyncio
+import json
+import math
+from pathlib import Path
+import sys
+from urllib.parse import urlsplit
+from scripts.chunk_utils import METERS_PER_DEGREE
+from scripts.fetch_utils import (
+    LOD_GEOMETRIC_ERROR,
+    TilesFetcher,
+    get_tile_cache_name,
+    read_glb,
+)
+
+# Fallbacks while no tile of the area is in the local tile cache, in the range
+# of what Google's photorealistic tiles weigh
+DEFAULT_TILE_BYTES = 350_000
+DEFAULT_TILE_TRIANGLES = 20_000
+DEFAULT_BANDWIDTH_MB_S = 10.0
+DEFAULT_BLENDER_SECONDS_PER_TILE = 0.5
+
+# Used when the survey made no request that could be timed
+DEFAULT_REQUEST_SECONDS = 0.3
+
+# Config limit -> estimate field it applies to
+LIMIT_FIELDS = {
+    "max_tiles": "tiles",
+    "max_download_mb": "download_mb",
+    "max_triangles": "triangles",
+    "max_minutes": "minutes",
+}
+
+
+class TilesetSurvey(TilesFetcher):
+    """
+    Walks a tileset like TilesFetcher but only reads tileset.json files: the
+    tiles it would download are recorded, not fetched. Parsed tilesets are kept
+    in a cache that can be shared between surveys, so estimating several LODs
+    of an area costs a single traversal of the finest one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tileset_cache = {}
+
+    async def traverse_tileset(self, url, parent_transform):
+        path = urlsplit(url).path
+        if path not in self.tileset_cache:
+            self.tileset_cache[path] = json.loads(await self.load_tileset(url))
+            self.stats["tilesets"] += 1
+        await self.traverse_tile(
+            self.tileset_cache[path]["root"], url, parent_transform
+        )
+
+    async def download_tile(self, url, transform):
+        path = self.download_dir / get_tile_cache_name(url)
+        self.stats["tiles"] += 1
+        self.tiles.append(
+            {"uri": urlsplit(url).path, "file": str(path), "cached": path.exists()}
+        )
+
+    def survey(self):
+        asyncio.run(self.run())
+        return self.tiles
+
+
+def get_glb_triangles(path):
+    """
+    Triangle count of a binary glTF, read from its accessor counts so Draco
+    compressed tiles do not have to be decoded.
+    """
+    gltf, _ = read_glb(Path(path).read_bytes())
+    accessors = gltf.get("accessors", [])
+    triangles = 0
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            if primitive.get("mode", 4) != 4:
+                continue
+            if "indices" in primitive:
+                count = accessors[primitive["indices"]]["count"]
+            else:
+                count = accessors[primitive["attributes"]["POSITION"]]["count"]
+            triangles += count // 3
+    return triangles
+
+
+def measure_cached_tiles(tiles):
+    """
+    Average size and triangle count of the surveyed tiles already in the
+    local tile cache, or None when none of them are.
+    """
+    sizes, triangles = [], []
+    for tile in tiles:
+        if not tile["cached"]:
+            continue
+        try:
+            sizes.append(Path(tile["file"]).stat().st_size)
+            triangles.append(get_glb_triangles(tile["file"]))
+        except (OSError, ValueError, KeyError, IndexError):
+            continue
+    if not sizes:
+        return None
+    return sum(sizes) / len(sizes), sum(triangles) / len(triangles)
+
+
+def get_box_size_m(config):
+    box = config["input"]
+    mid_lat = math.radians((box["min_lat"] + box["max_lat"]) / 2)
+    height_m = (box["max_lat"] - box["min_lat"]) * METERS_PER_DEGREE
+    width_m = (box["max_lon"] - box["min_lon"]) * METERS_PER_DEGREE * math.cos(mid_lat)
+    return abs(width_m), abs(height_m)
+
+
+def estimate_lod(config, lod, tileset_cache):
+    box = config["input"]
+    bbox = (box["min_lat"], box["min_lon"], box["max_lat"], box["max_lon"])
+    survey = TilesetSurvey.from_config(
+        {**config, "blosm": {**config["blosm"], "lod": lod}}, bbox
+    )
+    survey.tileset_cache = tileset_cache
+    tiles = survey.survey()
+
+    estimate_settings = config.get("estimate", {})
+    fetch = config.get("fetch", {})
+    cached = sum(1 for tile in tiles if tile["cached"])
+    missing = len(tiles) - cached
+
+    tile_bytes, tile_triangles = measure_cached_tiles(tiles) or (
+        DEFAULT_TILE_BYTES,
+        DEFAULT_TILE_TRIANGLES,
+    )
+    download_mb = missing * tile_bytes / 1e6
+
+    stats = survey.scheduler.stats
+    request_seconds = (
+        stats["network_time"] / stats["requests"]
+        if stats["requests"]
+        else DEFAULT_REQUEST_SECONDS
+    )
+    concurrency = int(fetch.get("concurrency") or 16)
+    fetch_seconds = missing * request_seconds / concurrency
+    if fetch.get("rate_limit"):
+        fetch_seconds = max(fetch_seconds, missing / float(fetch["rate_limit"]))
+    fetch_seconds += download_mb / float(
+        estimate_settings.get("bandwidth_mb_s") or DEFAULT_BANDWIDTH_MB_S
+    )
+    blender_seconds = len(tiles) * float(
+        estimate_settings.get("blender_seconds_per_tile")
+        or DEFAULT_BLENDER_SECONDS_PER_TILE
+    )
+
+    return {
+        "lod": lod,
+        # The survey walks the tileset like the native fetcher, Blosm picks
+        # its own tiles and may import a different number
+        "engine": "native",
+        "tiles": len(tiles),
+        "cached_tiles": cached,
+        "download_mb": round(download_mb, 1),
+        "triangles": int(len(tiles) * tile_triangles),
+        "fetch_seconds": round(fetch_seconds, 1),
+        "blender_seconds": round(blender_seconds, 1),
+        "minutes": round((fetch_seconds + blender_seconds) / 60, 1),
+        "measured": cached > 0,
+    }
+
+
+def estimate_region(config, lods, tileset_cache=None):
+    """
+    Estimates tile count, download size, triangle count and wall-clock time
+    of each LOD for the configured box, reading only tileset metadata. The
+    tiles counted are those the native engine would fetch.
+    """
+    unknown = [lod for lod in lods if lod not in LOD_GEOMETRIC_ERROR]
+    if unknown:
+        raise ValueError(
+            f"Unknown LOD(s) {', '.join(map(str, unknown))}, "
+            f"expected one of {', '.join(LOD_GEOMETRIC_ERROR)}."
+        )
+    tileset_cache = {} if tileset_cache is None else tileset_cache
+    # Finest first: coarser LODs are then answered from the tileset cache
+    ordered = sorted(set(lods), key=lambda lod: LOD_GEOMETRIC_ERROR.get(lod, 0.0))
+    estimates = {lod: estimate_lod(config, lod, tileset_cache) for lod in ordered}
+    return [estimates[lod] for lod in dict.fromkeys(lods)]
+
+
+def print_estimates(base_name, estimates):
+    print(f"\nEstimate for {base_name}, tiles as selected by the native engine:")
+    for estimate in estimates:
+        note = "" if estimate["measured"] else " (sizes assumed, nothing cached)"
+        print(
+            f"  {estimate['lod']}: {estimate['tiles']} tile(s) "
+            f"({estimate['cached_tiles']} cached), {estimate['download_mb']} MB to "
+            f"download, ~{estimate['triangles']:,} triangles, "
+            f"~{estimate['minutes']} min{note}"
+        )
+
+
+def get_limits(config):
+    limits = config.get("estimate", {}).get("limits") or {}
+    return {
+        key: float(value)
+        for key, value in limits.items()
+        if key in LIMIT_FIELDS and value
+    }
+
+
+def check_limits(estimate, limits):
+    """
+    Returns a description of every limit the estimate goes over.
+    """
+    return [
+        f"{LIMIT_FIELDS[key]} {estimate[LIMIT_FIELDS[key]]} > {limit:g}"
+        for key, limit in limits.items()
+        if estimate[LIMIT_FIELDS[key]] > limit
+    ]
+
+
+def get_chunk_cell_size(config, estimate, limits):
+    """
+    Cell size in meters that splits the box into enough chunks for each of
+    them to stay under the limits, assuming the load is spread evenly.
+    """
+    chunks = max(
+        [estimate[LIMIT_FIELDS[key]] / limit for key, limit in limits.items()] + [1.0]
+    )
+    width_m, height_m = get_box_size_m(config)
+    return max(1.0, math.sqrt(width_m * height_m / math.ceil(chunks)))
+
+
+if __name__ == "__main__":
+    # Runs with any Python: python -m scripts.estimate_utils key=value ... lods=lod2,lod4
+    from scripts.config_utils import apply_arguments, load_config, validate_config
+
+    config = load_config(
+        Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+    )
+    arguments = dict(arg.split("=", 1) for arg in sys.argv[1:] if "=" in arg)
+    lods = arguments.pop("lods", "").split(",") if "lods" in arguments else None
+    config = apply_arguments(config, arguments)
+    validate_config(config)
+
+    estimates = estimate_region(config, lods or [config["blosm"]["lod"]])
+    print_estimates(config["output"]["base_name"], estimates)
+    print(json.dumps(estimates, indent=2))
@@ -0,0 +1,120 @@
+from pathlib import Path
+import bpy
+from scripts.blender_utils import export_fbx, export_gltf, unpack_textures
+from scripts.config_utils import DRACO_ARGUMENTS, EXPORT_EXTENSIONS, get_export_formats
+from scripts.worker_utils import get_blender_path, get_max_workers, run_parallel_jobs
+
+
+def export_obj(output_dir, custom_name, texture_dir=None):
+    obj_filepath = Path(output_dir) / f"{custom_name}.obj"
+    if texture_dir:
+        # The textures stay in their own folder, referenced by the .mtl
+        unpack_textures(output_dir, texture_dir)
+        bpy.ops.wm.obj_export(filepath=str(obj_filepath), path_mode="RELATIVE")
+    else:
+        bpy.ops.wm.obj_export(filepath=str(obj_filepath), path_mode="COPY")
+    print(f"OBJ export completed: {obj_filepath}")
+
+
+def export_usd(output_dir, custom_name):
+    usd_filepath = Path(output_dir) / f"{custom_name}.usdc"
+    bpy.ops.wm.usd_export(filepath=str(usd_filepath), export_textures=True)
+    print(f"USD export completed: {usd_filepath}")
+
+
+def get_format_texture_dir(output_dir, custom_name, export_format):
+    """
+    Texture folder of one format, so exports running side by side never
+    write the same texture files.
+    """
+    return Path(output_dir) / f"{custom_name}_{export_format}_textures"
+
+
+def export_scene_format(
+    export_format, output_dir, custom_name, config, texture_dir=None
+):
+    """
+    Exports the scene currently in memory to one format. Returns the path of
+    the exported file. FBX and OBJ unpack their textures to texture_dir when
+    given, instead of the shared textures folder.
+    """
+    if export_format == "glb":
+        export_gltf(output_dir, custom_name, config["output"].get("compression"))
+    elif export_format == "fbx":
+        export_fbx(output_dir, custom_name, texture_dir)
+    elif export_format == "obj":
+        export_obj(output_dir, custom_name, texture_dir)
+    elif export_format == "usd":
+        export_usd(output_dir, custom_name)
+    else:
+        raise ValueError(
+            f"Unsupported export format: {export_format}. "
+            f"Use {', '.join(EXPORT_EXTENSIONS)}."
+        )
+    return Path(output_dir) / f"{custom_name}{EXPORT_EXTENSIONS[export_format]}"
+
+
+def build_export_jobs(blend_path, formats, output_dir, custom_name, config):
+    """
+    One worker job per format, each opening the saved .blend on its own.
+    """
+    compression = config["output"].get("compression") or {}
+    compression_arguments = {
+        argument: compression[setting]
+        for argument, setting in DRACO_ARGUMENTS.items()
+        if compression.get(setting) is not None
+    }
+    compression_arguments["draco"] = bool(compression.get("draco"))
+
+    jobs = []
+    for export_format in formats:
+        arguments = {
+            "export_format": export_format,
+            "output_dir": str(output_dir),
+            "filename": custom_name,
+        }
+        if export_format == "glb":
+            arguments.update(compression_arguments)
+        jobs.append(
+            {
+                "name": f"{custom_name}_{export_format}",
+                "arguments": arguments,
+                "blend_path": str(blend_path),
+                "mode": "export_worker",
+            }
+        )
+    return jobs
+
+
+def run_export_fanout(config, output_dir, custom_name):
+    """
+    Exports the saved .blend to every format of export.formats at once, each in
+    its own background Blender process, at most export.max_workers at a time.
+    Returns the duration and size per format.
+    """
+    formats = get_export_formats(config)
+    blend_path = Path(output_dir) / f"{custom_name}.blend"
+    jobs = build_export_jobs(blend_path, formats, output_dir, custom_name, config)
+    max_workers = config.get("export", {}).get("max_workers") or get_max_workers(config)
+    results = run_parallel_jobs(
+        jobs,
+        get_blender_path(config),
+        max(1, int(max_workers)),
+        log_dir=config.get("workers", {}).get("log_dir"),
+    )
+
+    report = {}
+    print("\nExports:")
+    for export_format, result in zip(formats, results):
+        size = result.get("size")
+        report[export_format] = {
+            "ok": result["returncode"] == 0,
+            "seconds": round(result["duration"], 3),
+            "size_mb": round(size / 1e6, 3) if size is not None else None,
+        }
+        size_text = f"{size / 1e6:.1f} MB" if size is not None else "no output"
+        print(
+            f"  - {export_format}: {size_text} in {result['duration']:.1f}s"
+            f"{'' if result['returncode'] == 0 else ' (FAILED)'}"
+        )
+    return report
@@ -0,0 +1,419 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import http.client
+import json
+import math
+import os
+from pathlib import Path
+import struct
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import numpy as np
+from scripts.cache_utils import get_active_cache
+from scripts.projection_utils import ecef_to_geodetic
+from scripts.throttle_utils import RequestScheduler
+
+GOOGLE_TILES_URL = "https://tile.googleapis.com/v1/3dtiles/root.json"
+
+# Largest geometric error (in meters) of the tiles kept for each LOD; coarser
+# tiles are refined into their children
+LOD_GEOMETRIC_ERROR = {
+    "lod1": 600.0,
+    "lod2": 200.0,
+    "lod3": 60.0,
+    "lod4": 20.0,
+    "lod5": 6.0,
+    "lod6": 2.0,
+}
+
+# Bounding volumes larger than this are never culled, their corners say
+# little about which part of the globe they cover
+MAX_CULLING_RADIUS = 1.0e6
+
+# glTF content is y-up while 3D Tiles transforms are z-up
+Y_UP_TO_Z_UP = np.array(
+    [[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=np.float64
+)
+
+
+class ConnectionPool:
+    """
+    Keeps idle HTTP/1.1 connections per host so tile requests reuse keep-alive
+    connections instead of opening a new TLS session every time.
+    """
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, scheme, netloc):
+        with self.lock:
+            connections = self.idle.get((scheme, netloc))
+            if connections:
+                return connections.pop(), True
+
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def release(self, scheme, netloc, connection):
+        with self.lock:
+            self.idle.setdefault((scheme, netloc), []).append(connection)
+
+    def get(self, url):
+        """
+        Blocking GET returning (status, headers, body). A reused connection that
+        turns out to be closed by the server is replaced once transparently.
+        """
+        parts = urlsplit(url)
+        path = urlunsplit(("", "", parts.path or "/", parts.query, ""))
+
+        for attempt in range(2):
+            connection, reused = self.acquire(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path, headers={"Connection": "keep-alive"})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, ConnectionError) as e:
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise OSError(f"Request to {parts.netloc} failed: {e}") from e
+            except OSError:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self.release(parts.scheme, parts.netloc, connection)
+            return response.status, dict(response.getheaders()), body
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+
+def resolve_url(base_url, uri):
+    """
+    Resolves a content URI against its tileset URL, carrying over query
+    parameters such as the API key and session that the URI does not set.
+    """
+    url = urljoin(base_url, uri)
+    parts = urlsplit(url)
+    query = dict(parse_qsl(urlsplit(base_url).query))
+    query.update(parse_qsl(parts.query))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def get_tile_transform(tile):
+    if "transform" not in tile:
+        return np.identity(4)
+    # 3D Tiles matrices are stored column-major
+    return np.array(tile["transform"], dtype=np.float64).reshape(4, 4).T
+
+
+def get_volume_bounds(volume, transform):
+    """
+    Geographic bounds (min_lat, min_lon, max_lat, max_lon) of a bounding
+    volume, or None when the volume is too large to be culled.
+    """
+    if "region" in volume:
+        west, south, east, north = volume["region"][:4]
+        return (
+            math.degrees(south),
+            math.degrees(west),
+            math.degrees(north),
+            math.degrees(east),
+        )
+
+    if "box" in volume:
+        box = np.array(volume["box"], dtype=np.float64)
+        center, axes = box[:3], box[3:].reshape(3, 3)
+    elif "sphere" in volume:
+        center, radius = np.array(volume["sphere"][:3]), volume["sphere"][3]
+        axes = np.identity(3) * radius
+    else:
+        return None
+
+    if np.linalg.norm(axes, axis=1).max() > MAX_CULLING_RADIUS:
+        return None
+
+    signs = np.array(
+        [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64
+    )
+    corners = np.ones((8, 4))
+    corners[:, :3] = center + signs @ axes
+    geographic = ecef_to_geodetic((corners @ transform.T)[:, :3])
+    return (
+        geographic[:, 0].min(),
+        geographic[:, 1].min(),
+        geographic[:, 0].max(),
+        geographic[:, 1].max(),
+    )
+
+
+def get_tile_cache_name(url):
+    # Session and key change between runs, the path identifies the content
+    return hashlib.sha1(urlsplit(url).path.encode("utf-8")).hexdigest() + ".glb"
+
+
+def save_tile(path, body):
+    """
+    Writes a downloaded tile through a temporary file of its own, so processes
+    sharing the download directory never see or clobber a partial tile.
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=path.name, suffix=".part", delete=False
+    ) as file:
+        file.write(body)
+    os.replace(file.name, path)
+
+
+class TilesFetcher:
+    """
+    Walks a 3D Tiles tileset, keeps the tiles that intersect the requested box
+    at the LOD's geometric error, and downloads their content concurrently
+    over pooled connections.
+    """
+
+    def __init__(
+        self,
+        tiles_url,
+        bbox,
+        max_error,
+        download_dir,
+        api_key=None,
+        timeout=30,
+        fetch_settings=None,
+        cache=None,
+    ):
+        self.root_url = tiles_url
+        if api_key:
+            self.root_url = resolve_url(tiles_url, f"?{urlencode({'key': api_key})}")
+        self.bbox = bbox
+        self.max_error = max_error
+        self.download_dir = Path(download_dir)
+        self.fetch_settings = fetch_settings or {}
+        # Tileset JSONs are kept in the tile cache, offline runs never send
+        self.cache = cache
+        self.offline = bool(cache and cache.offline)
+        self.pool = ConnectionPool(timeout=timeout)
+        self.scheduler = None
+        self.tiles = []
+        self.stats = {
+            "tilesets": 0,
+            "tiles": 0,
+            "cached_tiles": 0,
+            "cached_tilesets": 0,
+            "culled": 0,
+        }
+
+    @classmethod
+    def from_config(cls, config, bbox, **kwargs):
+        fetch = config.get("fetch", {})
+        lod = config["blosm"]["lod"]
+        kwargs.setdefault("cache", get_active_cache())
+        return cls(
+            fetch.get("tiles_url") or GOOGLE_TILES_URL,
+            bbox,
+            float(fetch.get("geometric_error") or LOD_GEOMETRIC_ERROR[lod]),
+            Path(config["blosm"]["data_dir"]) / "native_tiles",
+            api_key=config["secret"]["google_api_key"],
+            timeout=float(fetch.get("timeout") or 30),
+            fetch_settings=fetch,
+            **kwargs,
+        )
+
+    def intersects(self, volume, transform):
+        bounds = get_volume_bounds(volume, transform)
+        if bounds is None:
+            return True
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return (
+            bounds[0] <= max_lat
+            and bounds[2] >= min_lat
+            and bounds[1] <= max_lon
+            and bounds[3] >= min_lon
+        )
+
+    async def send(self, url):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.pool.get, url)
+
+    async def fetch(self, url):
+        if self.offline:
+            raise OSError(
+                f"{urlsplit(url).path}: not in the tile cache, and this is an offline run"
+            )
+        try:
+            return await self.scheduler.request(self.send, url)
+        except OSError as e:
+            raise OSError(f"{urlsplit(url).path}: {e}") from e
+
+    async def load_tileset(self, url):
+        if self.cache:
+            body = self.cache.load_tileset(url)
+            if body is not None:
+                self.stats["cached_tilesets"] += 1
+                return body
+
+        body = await self.fetch(url)
+        if self.cache:
+            path = self.cache.get_tileset_path(url)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            save_tile(path, body)
+        return body
+
+    async def traverse_tileset(self, url, parent_transform):
+        tileset = json.loads(await self.load_tileset(url))
+        self.stats["tilesets"] += 1
+        await self.traverse_tile(tileset["root"], url, parent_transform)
+
+    async def traverse_tile(self, tile, base_url, parent_transform):
+        transform = parent_transform @ get_tile_transform(tile)
+        if not self.intersects(tile["boundingVolume"], transform):
+            self.stats["culled"] += 1
+            return
+
+        children = tile.get("children", [])
+        # Keep this tile's content once it is fine enough, otherwise refine
+        refined = tile.get("geometricError", 0.0) <= self.max_error or not children
+        content = tile.get("content") or {}
+        content_uri = content.get("uri") or content.get("url")
+
+        tasks = []
+        if content_uri:
+            url = resolve_url(base_url, content_uri)
+            if urlsplit(url).path.endswith(".json"):
+                tasks.append(self.traverse_tileset(url, transform))
+            elif refined:
+                tasks.append(self.download_tile(url, transform))
+        if not refined:
+            tasks.extend(
+                self.traverse_tile(child, base_url, transform) for child in children
+            )
+        await asyncio.gather(*tasks)
+
+    async def download_tile(self, url, transform):
+        path = self.download_dir / get_tile_cache_name(url)
+        cached = path.exists()
+        if cached:
+            self.stats["cached_tiles"] += 1
+            if self.cache:
+                self.cache.record_hit(path)
+        else:
+            save_tile(path, await self.fetch(url))
+
+        self.stats["tiles"] += 1
+        self.tiles.append(
+            {
+                "uri": urlsplit(url).path,
+                "file": str(path),
+                "transform": transform,
+                "cached": cached,
+            }
+        )
+
+    async def run(self):
+        self.scheduler = RequestScheduler.from_config(self.fetch_settings)
+        self.executor = ThreadPoolExecutor(max_workers=self.scheduler.limiter.maximum)
+        try:
+            await self.traverse_tileset(self.root_url, np.identity(4))
+        finally:
+            self.executor.shutdown(wait=False)
+            self.pool.close()
+        self.tiles.sort(key=lambda tile: tile["uri"])
+
+    def fetch_all(self):
+        """
+        Traverses the tileset and downloads the selected tiles. Returns a list of
+        tiles with their local file, URI path and tile-to-ECEF transform.
+        """
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        try:
+            asyncio.run(self.run())
+        finally:
+            self.stats["elapsed"] = time.perf_counter() - start
+            if self.scheduler:
+                self.stats.update(self.scheduler.stats)
+                print(f"\nRequest accounting: {self.scheduler.summary()}.")
+
+        print(
+            f"Fetched {self.stats['tiles']} tile(s) ({self.stats['cached_tiles']} cached) "
+            f"from {self.stats['tilesets']} tileset(s) "
+            f"({self.stats['cached_tilesets']} cached) in {self.stats['elapsed']:.1f}s, "
+            f"{self.stats['culled']} subtree(s) culled."
+        )
+        return self.tiles
+
+
+def read_glb(data):
+    magic, version, length = struct.unpack_from("<III", data, 0)
+    if magic != 0x46546C67:
+        raise ValueError("Not a binary glTF file.")
+
+    gltf, binary, offset = None, b"", 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8 : offset + 8 + chunk_length]
+        if chunk_type == 0x4E4F534A:
+            gltf = json.loads(chunk)
+        elif chunk_type == 0x004E4942:
+            binary = bytes(chunk)
+        offset += 8 + chunk_length
+    return gltf, binary
+
+
+def write_glb(gltf, binary):
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+
+    chunks = struct.pack("<II", len(json_chunk), 0x4E4F534A) + json_chunk
+    if binary:
+        chunks += struct.pack("<II", len(binary), 0x004E4942) + binary
+    return struct.pack("<III", 0x46546C67, 2, 12 + len(chunks)) + chunks
+
+
+def get_node_matrix(node):
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+
+    x, y, z, w = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+    matrix = np.identity(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def localize_glb(data, matrix):
+    """
+    Pre-multiplies the root nodes of a binary glTF by matrix, in double
+    precision, so tiles can be imported directly in local coordinates without
+    going through float32 ECEF positions.
+    """
+    gltf, binary = read_glb(data)
+    scene = gltf.get("scenes", [{}])[gltf.get("scene", 0)]
+    for node_index in scene.get("nodes", []):
+        node = gltf["nodes"][node_index]
+        local = matrix @ get_node_matrix(node)
+        for key in ("translation", "rotation", "scale"):
+            node.pop(key, None)
+        node["matrix"] = local.T.ravel().tolist()
+    return write_glb(gltf, binary)
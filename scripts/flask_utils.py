@@ -1,16 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import threading
-from flask import Flask, render_template, jsonify, request
+import time
+import uuid
+from flask import Flask, render_template, jsonify, request, send_from_directory, abort
 from werkzeug.serving import make_server
+from scripts.config_utils import apply_arguments, is_safe_name, load_config
+from scripts.estimate_utils import check_limits, estimate_region, get_limits
+from scripts.worker_utils import build_jobs, run_worker_job
 
 # Initialize Flask app
 project_root = Path(__file__).resolve().parent.parent
 templates_dir = project_root / "templates"
+config_path = project_root / "config" / "config.yaml"
 app = Flask(__name__, template_folder=str(templates_dir))
 app.config["SELECTION_DATA"] = None
+app.config["SERVICE_MODE"] = False
 
 shutdown_event = threading.Event()
 
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_MAX_FINISHED_JOBS = 100
+
+# Job queue state for the persistent service mode
+jobs = {}
+jobs_lock = threading.Lock()
+job_executor = None
+job_settings = {"max_finished_jobs": DEFAULT_MAX_FINISHED_JOBS}
+
 
 @app.route("/")
 def index():
@@ -18,7 +35,10 @@ def index():
     zoom_level = 7
     print("Serving Map Selection UI...")
     return render_template(
-        "index.html", start_coords=start_coords, zoom_level=zoom_level
+        "index.html",
+        start_coords=start_coords,
+        zoom_level=zoom_level,
+        service_mode=app.config["SERVICE_MODE"],
     )
 
 
@@ -51,12 +71,210 @@ def select_area():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/estimate", methods=["POST"])
+def estimate():
+    """
+    Dry run for the selected area: reads only tileset metadata and returns the
+    estimated tiles, download size, triangles and time of each selected LOD.
+    """
+    try:
+        selection = request.get_json()
+        arguments = {
+            key: selection[key]
+            for key in ("google_api_key", "min_lat", "min_lon", "max_lat", "max_lon")
+        }
+        lods = list(dict.fromkeys(selection["lods"]))
+    except (KeyError, TypeError) as e:
+        return jsonify({"error": f"Invalid estimate request: {e}"}), 400
+
+    config = apply_arguments(load_config(config_path), arguments)
+    try:
+        estimates = estimate_region(config, lods)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except OSError as e:
+        return jsonify({"error": f"Could not read the tileset: {e}"}), 502
+
+    limits = get_limits(config)
+    for lod_estimate in estimates:
+        lod_estimate["exceeded"] = check_limits(lod_estimate, limits)
+    return jsonify({"estimates": estimates})
+
+
+def job_status(job):
+    """
+    Public view of a job, without the API key.
+    """
+    return {
+        "id": job["id"],
+        "base_name": job["base_name"],
+        "status": job["status"],
+        "created": job["created"],
+        "progress": {
+            "done": sum(
+                1 for lod in job["lods"].values() if lod["status"] in ("done", "failed")
+            ),
+            "total": len(job["lods"]),
+        },
+        "lods": job["lods"],
+        "artifacts": sorted(job["artifacts"]),
+    }
+
+
+def update_job_status(job):
+    statuses = [lod["status"] for lod in job["lods"].values()]
+    if all(status == "queued" for status in statuses):
+        job["status"] = "queued"
+    elif any(status in ("queued", "running") for status in statuses):
+        job["status"] = "running"
+    elif all(status == "done" for status in statuses):
+        job["status"] = "done"
+    else:
+        job["status"] = "failed"
+
+
+def find_artifacts(output_dir, filename):
+    output_dir = Path(output_dir)
+    return {
+        path.name: str(output_dir)
+        for pattern in (f"{filename}.*", f"{filename}_*")
+        for path in output_dir.glob(pattern)
+        if path.is_file()
+    }
+
+
+def prune_jobs(max_finished):
+    """
+    Forgets the oldest finished jobs beyond max_finished, so a long-running
+    service does not keep every job ever submitted. Call with jobs_lock held.
+    """
+    finished = sorted(
+        (job for job in jobs.values() if job["status"] in ("done", "failed")),
+        key=lambda job: job["created"],
+    )
+    for job in finished[: max(0, len(finished) - max_finished)]:
+        del jobs[job["id"]]
+
+
+def run_queued_lod(job_id, worker_job):
+    """
+    Runs one LOD of a queued job. Runs in the executor, whose futures are
+    never read, so failures are recorded on the job here.
+    """
+    lod = worker_job["arguments"]["lod"]
+    with jobs_lock:
+        job = jobs[job_id]
+        job["lods"][lod]["status"] = "running"
+        update_job_status(job)
+
+    state = {"status": "failed"}
+    try:
+        result = run_worker_job(
+            worker_job, job_settings["blender_path"], job_settings.get("log_dir")
+        )
+        state.update(
+            {
+                "status": "done" if result["returncode"] == 0 else "failed",
+                "duration": round(result["duration"], 1),
+            }
+        )
+        if result["output_dir"] and result["filename"]:
+            artifacts = find_artifacts(result["output_dir"], result["filename"])
+            with jobs_lock:
+                job["artifacts"].update(artifacts)
+    except Exception as e:
+        print(f"\n[{worker_job['name']}] Job failed: {e}")
+        state["error"] = str(e)
+    finally:
+        with jobs_lock:
+            job["lods"][lod].update(state)
+            update_job_status(job)
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    if job_executor is None:
+        return jsonify({"error": "The job service is not running."}), 503
+
+    try:
+        selection = request.get_json()
+        arguments = {
+            key: selection[key]
+            for key in (
+                "google_api_key",
+                "base_name",
+                "scale_factor",
+                "min_lat",
+                "min_lon",
+                "max_lat",
+                "max_lon",
+            )
+        }
+        lods = list(dict.fromkeys(selection["lods"]))
+    except (KeyError, TypeError) as e:
+        return jsonify({"error": f"Invalid job request: {e}"}), 400
+    # The name ends up in output and log paths
+    if not is_safe_name(arguments["base_name"]):
+        return (
+            jsonify(
+                {"error": "base_name must be a file name without '/', '\\' or '..'."}
+            ),
+            400,
+        )
+
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        "id": job_id,
+        "base_name": arguments["base_name"],
+        "status": "queued",
+        "created": time.time(),
+        "lods": {lod: {"status": "queued", "duration": None} for lod in lods},
+        "artifacts": {},
+    }
+    with jobs_lock:
+        prune_jobs(job_settings["max_finished_jobs"])
+        jobs[job_id] = job
+
+    # The job id keeps the outputs and logs of jobs with the same base_name apart
+    output_arguments = {**arguments, "base_name": f"{arguments['base_name']}_{job_id}"}
+    for worker_job in build_jobs(output_arguments, lods):
+        job_executor.submit(run_queued_lod, job_id, worker_job)
+
+    print(f"\nQueued job {job_id}: {arguments['base_name']} {', '.join(lods)}")
+    return jsonify({"id": job_id, "message": f"Job {job_id} queued."}), 202
+
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    with jobs_lock:
+        return jsonify([job_status(job) for job in jobs.values()])
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    with jobs_lock:
+        if job_id not in jobs:
+            abort(404)
+        return jsonify(job_status(jobs[job_id]))
+
+
+@app.route("/jobs/<job_id>/artifacts/<name>", methods=["GET"])
+def download_artifact(job_id, name):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        # Only files produced by this job can be downloaded
+        if not job or name not in job["artifacts"]:
+            abort(404)
+        directory = Path(job["artifacts"][name]).resolve()
+    return send_from_directory(directory, name, as_attachment=True)
+
+
 class ServerThread(threading.Thread):
-    def __init__(self, app, port=5000):
+    def __init__(self, app, port=5000, host=DEFAULT_HOST):
         super().__init__()
         self.port = port
         try:
-            self.server = make_server("0.0.0.0", self.port, app)
+            self.server = make_server(host, self.port, app)
         except OSError as e:
             print(f"Port {self.port} is unavailable. Please check if it's in use.")
             raise e
@@ -87,3 +305,45 @@ def run_map_selection_ui(port=5000):
     server_thread.join()
 
     return app.config["SELECTION_DATA"]
+
+
+def run_job_service(
+    blender_path,
+    max_workers,
+    log_dir=None,
+    port=5000,
+    host=DEFAULT_HOST,
+    max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS,
+):
+    """
+    Serves the map UI as a persistent service: every selection is queued as a
+    job and its LODs run in a bounded pool of headless Blender workers. Only
+    local clients can reach it unless host is set to another interface.
+    """
+    global job_executor
+
+    job_settings.update(
+        {
+            "blender_path": blender_path,
+            "log_dir": log_dir,
+            "max_finished_jobs": int(max_finished_jobs),
+        }
+    )
+    job_executor = ThreadPoolExecutor(max_workers=max_workers)
+    app.config["SERVICE_MODE"] = True
+
+    server_thread = ServerThread(app, port=port, host=host)
+    server_thread.start()
+    print(
+        f"Job service running with up to {max_workers} worker(s). Press Ctrl+C to stop."
+    )
+
+    try:
+        while server_thread.is_alive():
+            server_thread.join(timeout=1)
+    except KeyboardInterrupt:
+        print("\nStopping job service...")
+    finally:
+        server_thread.shutdown()
+        server_thread.join()
+        job_executor.shutdown(wait=False, cancel_futures=True)
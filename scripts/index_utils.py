@@ -0,0 +1,180 @@
+import math
+from pathlib import Path
+import numpy as np
+
+NODE_SIZE = 16
+
+# Columns of the bounds arrays, matching the metadata CSV
+MIN_LAT, MIN_LON, MAX_LAT, MAX_LON = range(4)
+
+
+def build_str_index(bounds, node_size=NODE_SIZE):
+    """
+    Builds a packed R-tree over (N, 4) bounds of (min_lat, min_lon, max_lat, max_lon)
+    using Sort-Tile-Recursive ordering.
+
+    Returns (item_order, node_bounds, level_offsets): the leaf level holds the
+    item bounds in item_order, each node of a higher level covers node_size
+    consecutive nodes of the level below, and level_offsets gives where each
+    level starts in node_bounds, from the leaves up to the single root.
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    # Corners projected from a rotated box can come out swapped
+    bounds = np.hstack(
+        [
+            np.minimum(bounds[:, :2], bounds[:, 2:]),
+            np.maximum(bounds[:, :2], bounds[:, 2:]),
+        ]
+    )
+    count = len(bounds)
+    if count == 0:
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, 4), dtype=np.float64),
+            np.array([0, 0], dtype=np.int64),
+        )
+
+    center_lat = (bounds[:, MIN_LAT] + bounds[:, MAX_LAT]) / 2
+    center_lon = (bounds[:, MIN_LON] + bounds[:, MAX_LON]) / 2
+
+    # Cut the items into vertical slices by longitude, then sort each slice by latitude
+    leaf_count = math.ceil(count / node_size)
+    slice_size = math.ceil(math.sqrt(leaf_count)) * node_size
+    by_lon = np.argsort(center_lon, kind="stable")
+    item_order = np.concatenate(
+        [
+            part[np.argsort(center_lat[part], kind="stable")]
+            for part in np.split(by_lon, range(slice_size, count, slice_size))
+        ]
+    )
+
+    levels = [bounds[item_order]]
+    while len(levels[-1]) > 1:
+        levels.append(_parent_bounds(levels[-1], node_size))
+
+    level_offsets = np.cumsum([0] + [len(level) for level in levels])
+    return item_order, np.concatenate(levels), level_offsets
+
+
+def _parent_bounds(children, node_size):
+    parent_count = math.ceil(len(children) / node_size)
+    padded = np.full((parent_count * node_size, 4), np.nan)
+    padded[: len(children)] = children
+    groups = padded.reshape(parent_count, node_size, 4)
+
+    parents = np.empty((parent_count, 4), dtype=np.float64)
+    parents[:, MIN_LAT] = np.nanmin(groups[:, :, MIN_LAT], axis=1)
+    parents[:, MIN_LON] = np.nanmin(groups[:, :, MIN_LON], axis=1)
+    parents[:, MAX_LAT] = np.nanmax(groups[:, :, MAX_LAT], axis=1)
+    parents[:, MAX_LON] = np.nanmax(groups[:, :, MAX_LON], axis=1)
+    return parents
+
+
+def save_metadata_npz(
+    npz_path, mesh_ids, bounds, origin_lat, origin_lon, scale_factor, lod, **columns
+):
+    """
+    Writes the metadata as typed columns with the origin and scale factor as
+    scalars, plus a packed R-tree over the mesh bounds. Extra per-mesh columns
+    can be passed as keyword arguments.
+    """
+    bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+    item_order, node_bounds, level_offsets = build_str_index(bounds)
+
+    np.savez(
+        npz_path,
+        mesh_ID=np.asarray(mesh_ids, dtype=str),
+        min_lat=bounds[:, MIN_LAT],
+        min_lon=bounds[:, MIN_LON],
+        max_lat=bounds[:, MAX_LAT],
+        max_lon=bounds[:, MAX_LON],
+        origin_lat=np.float64(origin_lat),
+        origin_lon=np.float64(origin_lon),
+        scale_factor=np.float64(scale_factor),
+        lod=np.str_(lod),
+        index_node_size=np.int64(NODE_SIZE),
+        index_item_order=item_order,
+        index_node_bounds=node_bounds,
+        index_level_offsets=level_offsets,
+        **{name: np.asarray(values) for name, values in columns.items()},
+    )
+    print(f"Columnar metadata saved to {npz_path}\n")
+    return Path(npz_path)
+
+
+class MeshIndex:
+    """
+    Answers which meshes cover a point or a box from a metadata .npz file,
+    walking the packed R-tree instead of scanning every mesh.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.mesh_ids = data["mesh_ID"]
+        self.origin_lat = float(data["origin_lat"])
+        self.origin_lon = float(data["origin_lon"])
+        self.scale_factor = float(data["scale_factor"])
+        self.lod = str(data["lod"])
+        self.node_size = int(data["index_node_size"])
+        self.item_order = data["index_item_order"]
+        self.node_bounds = data["index_node_bounds"]
+        self.level_offsets = data["index_level_offsets"]
+
+    @classmethod
+    def load(cls, npz_path):
+        with np.load(npz_path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def query(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Returns the indices of the meshes whose bounds intersect the box.
+        """
+        if not len(self.item_order):
+            return np.empty(0, dtype=np.int64)
+
+        # Start from the root and keep the intersecting children, level by level
+        candidates = np.zeros(1, dtype=np.int64)
+        for level in range(len(self.level_offsets) - 2, -1, -1):
+            boxes = self.node_bounds[self.level_offsets[level] + candidates]
+            hits = candidates[
+                (boxes[:, MIN_LAT] <= max_lat)
+                & (boxes[:, MAX_LAT] >= min_lat)
+                & (boxes[:, MIN_LON] <= max_lon)
+                & (boxes[:, MAX_LON] >= min_lon)
+            ]
+            if level == 0:
+                return np.sort(self.item_order[hits])
+
+            child_count = self.level_offsets[level] - self.level_offsets[level - 1]
+            children = hits[:, None] * self.node_size + np.arange(self.node_size)
+            candidates = children.ravel()
+            candidates = candidates[candidates < child_count]
+
+    def source_meshes(self, mesh_id):
+        """
+        Names of the tile meshes a merged cell mesh was built from, or the mesh
+        itself when the tiles were not merged.
+        """
+        if "source_mesh_offsets" not in self.data:
+            return [mesh_id]
+        index = int(np.flatnonzero(self.mesh_ids == mesh_id)[0])
+        offsets = self.data["source_mesh_offsets"]
+        names = self.data["source_mesh_names"]
+        return names[offsets[index] : offsets[index + 1]].tolist()
+
+    def footprint(self, mesh_id):
+        """
+        (lat, lon) vertices of the convex polygon around a mesh's footprint,
+        or None when the metadata was saved without exact footprints.
+        """
+        if "footprint_offsets" not in self.data:
+            return None
+        index = int(np.flatnonzero(self.mesh_ids == mesh_id)[0])
+        offsets = self.data["footprint_offsets"]
+        return self.data["footprint"][offsets[index] : offsets[index + 1]]
+
+    def meshes_in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        return self.mesh_ids[self.query(min_lat, min_lon, max_lat, max_lon)].tolist()
+
+    def meshes_at_point(self, lat, lon):
+        return self.mesh_ids[self.query(lat, lon, lat, lon)].tolist()
@@ -0,0 +1,131 @@
+from pathlib import Path
+import bpy
+import numpy as np
+from scripts.blender_utils import IMAGE_EXTENSIONS, purge_orphans
+from scripts.fetch_utils import LOD_GEOMETRIC_ERROR
+from scripts.stats_utils import get_material_images, get_mesh_triangles
+
+DEFAULT_MIN_TEXTURE_SIZE = 64
+
+
+def sort_lods_fine_to_coarse(lods):
+    return sorted(set(lods), key=lambda lod: LOD_GEOMETRIC_ERROR.get(lod, 0.0))
+
+
+def get_triangle_ratio(source_lod, target_lod):
+    """
+    Share of the source LOD's triangles kept for the target LOD. Edge length
+    follows the geometric error, so the triangle count of a surface goes with
+    its square.
+    """
+    source_error = LOD_GEOMETRIC_ERROR[source_lod]
+    target_error = LOD_GEOMETRIC_ERROR[target_lod]
+    return min(1.0, (source_error / target_error) ** 2)
+
+
+def get_tile_meshes():
+    tiles_collection = bpy.data.collections.get("Google 3D Tiles")
+    if not tiles_collection:
+        return []
+    return [obj for obj in tiles_collection.objects if obj.type == "MESH" and obj.data]
+
+
+def decimate_meshes(objects, ratio):
+    """
+    Collapses every mesh to about ratio of its triangles. The modifiers are
+    evaluated in a single depsgraph pass and the results swapped in as the
+    objects' meshes, without going through modifier_apply per object.
+    """
+    if ratio >= 1.0 or not objects:
+        return
+
+    modifiers = []
+    for obj in objects:
+        modifier = obj.modifiers.new("LOD Decimate", "DECIMATE")
+        modifier.decimate_type = "COLLAPSE"
+        modifier.ratio = ratio
+        modifiers.append(modifier)
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    for obj, modifier in zip(objects, modifiers):
+        decimated = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph))
+        obj.modifiers.remove(modifier)
+        name = obj.data.name
+        obj.data = decimated
+        decimated.name = name
+
+    purge_orphans()
+
+
+def downscale_textures(objects, scale, texture_dir, min_size=DEFAULT_MIN_TEXTURE_SIZE):
+    """
+    Scales down the images used by the objects' materials. Packed images are
+    repacked, file images are saved as new files in texture_dir so the source
+    LOD's textures stay untouched. Returns the number of images scaled.
+    """
+    if scale >= 1.0:
+        return 0
+
+    images = {
+        image.name: image
+        for obj in objects
+        for slot in obj.material_slots
+        for image in get_material_images(slot.material)
+    }
+
+    scaled = 0
+    for image in images.values():
+        width, height = image.size
+        new_width = max(min(width, min_size), int(round(width * scale)))
+        new_height = max(min(height, min_size), int(round(height * scale)))
+        if (new_width, new_height) == (width, height) or not width or not height:
+            continue
+
+        image.scale(new_width, new_height)
+        if image.packed_file:
+            image.pack()
+        else:
+            texture_dir.mkdir(parents=True, exist_ok=True)
+            extension = IMAGE_EXTENSIONS.get(image.file_format, ".png")
+            image.filepath_raw = str(
+                texture_dir / f"{bpy.path.clean_name(image.name)}{extension}"
+            )
+            image.save()
+        scaled += 1
+    return scaled
+
+
+def derive_lod(config, source_lod, target_lod, texture_dir):
+    """
+    Turns the scene holding source_lod into target_lod, decimating the tile
+    meshes to the target's triangle budget and scaling their textures down.
+    """
+    derive = config.get("derive", {})
+    objects = get_tile_meshes()
+    triangles = sum(get_mesh_triangles(obj.data) for obj in objects)
+
+    ratio = get_triangle_ratio(source_lod, target_lod)
+    budget = (derive.get("triangle_budgets") or {}).get(target_lod)
+    if budget and triangles:
+        ratio = min(1.0, float(budget) / triangles)
+
+    texture_scale = derive.get("texture_scale")
+    if texture_scale is None:
+        # Texel size follows the edge length
+        texture_scale = np.sqrt(get_triangle_ratio(source_lod, target_lod))
+
+    decimate_meshes(objects, ratio)
+    scaled = downscale_textures(
+        objects,
+        float(texture_scale),
+        Path(texture_dir),
+        int(derive.get("min_texture_size") or DEFAULT_MIN_TEXTURE_SIZE),
+    )
+
+    derived_triangles = sum(get_mesh_triangles(obj.data) for obj in get_tile_meshes())
+    print(
+        f"\nDerived {target_lod} from {source_lod}: {triangles} -> "
+        f"{derived_triangles} triangles (ratio {ratio:.4f}), "
+        f"{scaled} texture(s) scaled by {float(texture_scale):.2f}."
+    )
+    return derived_triangles
@@ -0,0 +1,212 @@
+from collections import defaultdict
+import hashlib
+import bmesh
+import bpy
+import numpy as np
+from scripts.blender_utils import join_objects, purge_orphans
+from scripts.projection_utils import bound_box_corners_world
+
+DEFAULT_CELL_SIZE_M = 250.0
+DEFAULT_WELD_DISTANCE_M = 0.01
+
+
+def get_image_key(image):
+    """
+    Identity of an image's content: its packed bytes, else its file.
+    """
+    if image.packed_file:
+        digest = hashlib.sha1(image.packed_file.data).hexdigest()
+        return ("packed", digest)
+    return ("file", bpy.path.abspath(image.filepath), tuple(image.size))
+
+
+def deduplicate_images():
+    """
+    Points every user of an image to the first image with the same content.
+    Returns the number of duplicates removed.
+    """
+    canonical = {}
+    duplicates = 0
+    for image in list(bpy.data.images):
+        if image.type != "IMAGE" or not (image.packed_file or image.filepath):
+            continue
+        key = get_image_key(image)
+        if key in canonical:
+            image.user_remap(canonical[key])
+            duplicates += 1
+        else:
+            canonical[key] = image
+    return duplicates
+
+
+def get_socket_value(socket):
+    value = getattr(socket, "default_value", None)
+    if value is None:
+        return None
+    if hasattr(value, "__len__"):
+        return tuple(round(component, 6) for component in value)
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def get_material_key(material):
+    """
+    Signature of a material's node graph: node types, images and unlinked
+    input values, and the links between the nodes.
+    """
+    if not material.use_nodes or not material.node_tree:
+        return ("flat", tuple(round(value, 6) for value in material.diffuse_color))
+
+    tree = material.node_tree
+    nodes = tuple(
+        (
+            node.name,
+            node.bl_idname,
+            node.image.name if getattr(node, "image", None) else None,
+            tuple(
+                get_socket_value(socket)
+                for socket in node.inputs
+                if not socket.is_linked
+            ),
+        )
+        for node in sorted(tree.nodes, key=lambda node: node.name)
+    )
+    links = tuple(
+        sorted(
+            (
+                link.from_node.name,
+                link.from_socket.identifier,
+                link.to_node.name,
+                link.to_socket.identifier,
+            )
+            for link in tree.links
+        )
+    )
+    return (nodes, links, material.blend_method)
+
+
+def deduplicate_materials():
+    canonical = {}
+    duplicates = 0
+    for material in list(bpy.data.materials):
+        key = get_material_key(material)
+        if key in canonical:
+            material.user_remap(canonical[key])
+            duplicates += 1
+        else:
+            canonical[key] = material
+    return duplicates
+
+
+def group_objects_by_cell(objects, cell_size):
+    """
+    Buckets the objects by the grid cell holding the center of their world
+    bounding box.
+    """
+    corners = bound_box_corners_world(objects).reshape(-1, 2, 2)
+    cells = np.floor(corners.mean(axis=1) / cell_size).astype(np.int64)
+    groups = defaultdict(list)
+    for obj, (col, row) in zip(objects, cells.tolist()):
+        groups[(row, col)].append(obj)
+    return groups
+
+
+def get_tile_edges(objects):
+    """
+    The x and y coordinates, in world units, of the bounding box edges of the
+    objects, sorted. Tile seams lie along these lines.
+    """
+    corners = bound_box_corners_world(objects).reshape(-1, 2, 2)
+    return np.unique(corners[:, :, 0]), np.unique(corners[:, :, 1])
+
+
+def near_edges(values, edges, distance):
+    """
+    Whether each value is within distance of one of the sorted edges.
+    """
+    index = np.searchsorted(edges, values)
+    below = edges[np.maximum(index - 1, 0)]
+    above = edges[np.minimum(index, len(edges) - 1)]
+    return np.minimum(np.abs(values - below), np.abs(values - above)) <= distance
+
+
+def weld_seams(obj, distance, edges):
+    """
+    Merges the vertices closer than distance, in world units, so the borders
+    of neighbouring tiles share vertices after joining. Only the vertices near
+    the tile edges, given as sorted x and y lines, are welded.
+    """
+    mesh = obj.data
+    count = len(mesh.vertices)
+    if not count:
+        return 0
+    co = np.empty(count * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", co)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    xy = co.reshape(-1, 3) @ matrix[:2, :3].T + matrix[:2, 3]
+    edges_x, edges_y = edges
+    candidates = near_edges(xy[:, 0], edges_x, distance) | near_edges(
+        xy[:, 1], edges_y, distance
+    )
+    if not candidates.any():
+        return 0
+
+    local_distance = distance / max(max(obj.matrix_world.to_scale()), 1e-12)
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.verts.ensure_lookup_table()
+    verts = [bm.verts[i] for i in np.flatnonzero(candidates).tolist()]
+    before = len(bm.verts)
+    bmesh.ops.remove_doubles(bm, verts=verts, dist=local_distance)
+    welded = before - len(bm.verts)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+    return welded
+
+
+def merge_tiles_into_cells(config):
+    """
+    Merges the meshes of the Google 3D Tiles collection into one object per
+    grid cell, welding tile seams and sharing identical materials and images.
+    Each merged object keeps the names of its tile meshes in "source_meshes".
+    """
+    tiles_collection = bpy.data.collections.get("Google 3D Tiles")
+    if not tiles_collection:
+        return 0
+
+    merge = config.get("merge", {})
+    scale_factor = config["blosm"]["scale_factor"]
+    # The scene is already rescaled, so meters become scene units
+    cell_size = float(merge.get("cell_size_m") or DEFAULT_CELL_SIZE_M) * scale_factor
+    weld_distance_m = merge.get("weld_distance_m")
+    if weld_distance_m is None:
+        weld_distance_m = DEFAULT_WELD_DISTANCE_M
+    weld_distance = float(weld_distance_m) * scale_factor
+
+    images = deduplicate_images()
+    materials = deduplicate_materials()
+
+    bpy.context.view_layer.update()
+    objects = [obj for obj in tiles_collection.objects if obj.type == "MESH"]
+    groups = group_objects_by_cell(objects, cell_size)
+
+    welded = 0
+    for (row, col), cell_objects in sorted(groups.items()):
+        source_meshes = sorted(obj.name for obj in cell_objects)
+        edges = get_tile_edges(cell_objects)
+        merged = join_objects(cell_objects)
+        merged.name = f"cell_{row}_{col}"
+        merged.data.name = merged.name
+        merged["source_meshes"] = "\n".join(source_meshes)
+        if weld_distance > 0:
+            welded += weld_seams(merged, weld_distance, edges)
+
+    purge_orphans()
+    print(
+        f"\nMerged {len(objects)} tile mesh(es) into {len(groups)} cell(s) of "
+        f"~{cell_size / scale_factor:.0f}m, welded {welded} seam vertices, "
+        f"removed {materials} duplicate material(s) and {images} duplicate image(s)."
+    )
+    return len(groups)
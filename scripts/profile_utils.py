@@ -0,0 +1,225 @@
+import cProfile
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Profiler of the run in progress, so nested code can open stages without
+# having it passed down
+active_run = None
+
+
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class RunProfiler:
+    """
+    Records the wall and CPU time of every stage of a run, the peak RSS after
+    each one and, optionally, the Python allocation peak (tracemalloc) and a
+    cProfile of each top-level stage. Stages nest.
+    """
+
+    def __init__(self, name, cprofile=False, trace_memory=False, info=None):
+        self.name = name
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.info = info or {}
+        self.stages = []
+        self.stack = []
+        self.profiles = {}
+        self.started = time.time()
+        self.start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        record = {
+            "name": name,
+            "depth": len(self.stack),
+            "start": time.perf_counter() - self.start,
+            "args": {},
+        }
+        if self.trace_memory:
+            # Fold the peak so far into the parent before resetting it
+            if self.stack:
+                self.stack[-1]["py_peak"] = max(
+                    self.stack[-1].get("py_peak", 0), tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+
+        # Only one cProfile can be active at a time, so nested stages share it
+        profile = cProfile.Profile() if self.cprofile and not self.stack else None
+        self.stack.append(record)
+        cpu_start = time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield record["args"]
+        finally:
+            if profile:
+                profile.disable()
+                self.profiles[f"{len(self.profiles):02d}_{name}"] = profile
+            record["duration"] = time.perf_counter() - self.start - record["start"]
+            record["cpu"] = time.process_time() - cpu_start
+            record["peak_rss_mb"] = get_peak_rss_mb()
+            self.stack.pop()
+
+            if self.trace_memory:
+                peak = max(record.pop("py_peak", 0), tracemalloc.get_traced_memory()[1])
+                record["py_peak_mb"] = round(peak / (1024 * 1024), 1)
+                if self.stack:
+                    self.stack[-1]["py_peak"] = max(
+                        self.stack[-1].get("py_peak", 0), peak
+                    )
+            self.stages.append(record)
+
+    def report(self):
+        total = time.perf_counter() - self.start
+        stages = sorted(self.stages, key=lambda record: record["start"])
+        return {
+            "name": self.name,
+            "started": self.started,
+            "total_seconds": round(total, 3),
+            "peak_rss_mb": get_peak_rss_mb(),
+            **self.info,
+            "stages": [
+                {
+                    **record,
+                    "start": round(record["start"], 3),
+                    "duration": round(record["duration"], 3),
+                    "cpu": round(record["cpu"], 3),
+                }
+                for record in stages
+            ],
+        }
+
+    def chrome_trace(self):
+        """
+        Stages as complete events in the Chrome trace format, viewable in
+        chrome://tracing or Perfetto.
+        """
+        pid = os.getpid()
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.name}}
+        ]
+        for record in self.stages:
+            events.append(
+                {
+                    "name": record["name"],
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": 0,
+                    "ts": record["start"] * 1e6,
+                    "dur": record["duration"] * 1e6,
+                    "args": record["args"],
+                }
+            )
+            if record["peak_rss_mb"] is not None:
+                events.append(
+                    {
+                        "name": "peak_rss_mb",
+                        "ph": "C",
+                        "pid": pid,
+                        "ts": (record["start"] + record["duration"]) * 1e6,
+                        "args": {"peak_rss_mb": record["peak_rss_mb"]},
+                    }
+                )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, output_dir):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        report_path = output_dir / f"{self.name}_profile.json"
+        with report_path.open("w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+        trace_path = output_dir / f"{self.name}_trace.json"
+        with trace_path.open("w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+
+        if self.profiles:
+            profile_dir = output_dir / f"{self.name}_cprofile"
+            profile_dir.mkdir(exist_ok=True)
+            for stage_name, profile in self.profiles.items():
+                profile.dump_stats(str(profile_dir / f"{stage_name}.prof"))
+
+        print(f"Run profile saved to {report_path} and {trace_path}")
+        return report_path, trace_path
+
+    def print_summary(self):
+        print(f"\nStage timings for {self.name}:")
+        for record in sorted(self.stages, key=lambda record: record["start"]):
+            memory = ""
+            if record["peak_rss_mb"] is not None:
+                memory = f", peak RSS {record['peak_rss_mb']} MB"
+            print(
+                f"  {'  ' * record['depth']}{record['name']}: "
+                f"{record['duration']:.2f}s (cpu {record['cpu']:.2f}s){memory}"
+            )
+
+
+def start_run(config):
+    """
+    Starts profiling a run if profiling is enabled. Returns the profiler.
+    """
+    global active_run
+
+    profiling = config.get("profiling", {})
+    if not profiling.get("enabled"):
+        active_run = None
+        return None
+
+    active_run = RunProfiler(
+        f"{config['output']['base_name']}_{config['blosm']['lod']}",
+        cprofile=bool(profiling.get("cprofile")),
+        trace_memory=bool(profiling.get("tracemalloc")),
+        info={
+            "lod": config["blosm"]["lod"],
+            "engine": config.get("fetch", {}).get("engine") or "blosm",
+            "bbox": [
+                config["input"][key]
+                for key in ("min_lat", "min_lon", "max_lat", "max_lon")
+            ],
+        },
+    )
+    return active_run
+
+
+def finish_run(output_dir):
+    global active_run
+
+    profiler, active_run = active_run, None
+    if profiler is None:
+        return None
+    if profiler.trace_memory:
+        tracemalloc.stop()
+    profiler.print_summary()
+    return profiler.save(output_dir)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a stage of the active run. Yields a dict for extra details to record
+    with the stage; does nothing when no run is being profiled.
+    """
+    if active_run is None:
+        yield {}
+        return
+    with active_run.stage(name) as args:
+        yield args
@@ -1,5 +1,5 @@
 import math
-import mathutils
+import numpy as np
 
 
 class TransverseMercator:
@@ -44,30 +44,230 @@ class TransverseMercator:
         lat = math.degrees(lat)
         return (lat, lon)
 
+    def fromGeographicArray(self, lat, lon=None, out=None):
+        """
+        Vectorized fromGeographic. Accepts an Nx2 array of (lat, lon) or separate
+        lat and lon arrays, and returns an Nx2 array of (x, y). If given, `out`
+        must be a float64 array of shape (N, 2) and is filled in place.
+        """
+        lat, lon = _split_pairs(lat, lon)
+        out = _prepare_output(out, lat.shape[0])
+
+        lat = np.radians(lat)
+        lon = np.radians(lon - self.lon)
+        B = np.sin(lon) * np.cos(lat)
+        np.multiply(
+            0.5 * self.k * self.radius, np.log((1.0 + B) / (1.0 - B)), out=out[:, 0]
+        )
+        np.multiply(
+            self.k * self.radius,
+            np.arctan(np.tan(lat) / np.cos(lon)) - self.latInRadians,
+            out=out[:, 1],
+        )
+        return out
+
+    def toGeographicArray(self, x, y=None, out=None):
+        """
+        Vectorized toGeographic. Accepts an Nx2 array of (x, y) or separate x and
+        y arrays, and returns an Nx2 array of (lat, lon). If given, `out` must be
+        a float64 array of shape (N, 2) and is filled in place.
+        """
+        x, y = _split_pairs(x, y)
+        out = _prepare_output(out, x.shape[0])
+
+        x = x / (self.k * self.radius)
+        y = y / (self.k * self.radius)
+        D = y + self.latInRadians
+        np.degrees(np.arcsin(np.sin(D) / np.cosh(x)), out=out[:, 0])
+        np.add(self.lon, np.degrees(np.arctan(np.sinh(x) / np.cos(D))), out=out[:, 1])
+        return out
+
+
+def _split_pairs(a, b):
+    if b is None:
+        pairs = np.asarray(a, dtype=np.float64).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+    return (
+        np.asarray(a, dtype=np.float64).ravel(),
+        np.asarray(b, dtype=np.float64).ravel(),
+    )
+
+
+def _prepare_output(out, count):
+    if out is None:
+        return np.empty((count, 2), dtype=np.float64)
+    if out.shape != (count, 2) or out.dtype != np.float64:
+        raise ValueError(
+            f"Output buffer must be a float64 array of shape ({count}, 2), got {out.dtype} {out.shape}."
+        )
+    return out
+
+
+def bound_box_corners_world(objects):
+    """
+    Returns the min and max corners of each object's local bounding box in world
+    space, stacked as a (2N, 2) array of (x, y): rows 2i and 2i+1 belong to object i.
+    """
+    corners = np.empty((len(objects) * 2, 2), dtype=np.float64)
+    for i, obj in enumerate(objects):
+        # Ensure the object's bounding box is valid
+        if not obj.bound_box:
+            raise ValueError(f"Object {obj.name} has an invalid or empty bounding box.")
+
+        box = np.array([v[:] for v in obj.bound_box], dtype=np.float64)
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+
+        # Apply world transformation to the min/max bounds in local coordinates
+        local = np.ones((2, 4), dtype=np.float64)
+        local[0, :3] = box.min(axis=0)
+        local[1, :3] = box.max(axis=0)
+        corners[2 * i : 2 * i + 2] = (local @ matrix.T)[:, :2]
+    return corners
+
 
-def calculate_real_bounds(obj, projection):
+def calculate_real_bounds_batch(objects, projection, scale_factor=1.0):
     """
-    Calculate the real latitude and longitude bounds of an object using the Transverse Mercator projection.
+    Calculate the real latitude and longitude bounds of many objects at once,
+    projecting all their corners in a single batched call. World coordinates
+    are divided by scale_factor to get back to meters.
+    Returns an (N, 4) array of (min_lat, min_lon, max_lat, max_lon).
     """
+    corners = bound_box_corners_world(objects) / scale_factor
+    geographic = projection.toGeographicArray(corners)
+    return geographic.reshape(-1, 4)
 
-    # Ensure the object's bounding box is valid
-    if not obj.bound_box:
-        raise ValueError(f"Object {obj.name} has an invalid or empty bounding box.")
 
-    # Calculate min/max bounds in local coordinates
-    min_bound = [min(v[i] for v in obj.bound_box) for i in range(3)]
-    max_bound = [max(v[i] for v in obj.bound_box) for i in range(3)]
+def _world_vertices_xy(objects, scale_factor):
+    """
+    World x, y of every vertex of the objects, divided by scale_factor, as one
+    (V, 2) array, and where each object's vertices start in it.
+    """
+    counts = np.array([len(obj.data.vertices) for obj in objects], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    xy = np.empty((offsets[-1], 2), dtype=np.float64)
+    co = np.empty(int(counts.max(initial=0)) * 3, dtype=np.float32)
+    for obj, start, count in zip(objects, offsets[:-1], counts):
+        obj.data.vertices.foreach_get("co", co[: count * 3])
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        np.matmul(
+            co[: count * 3].reshape(-1, 3),
+            matrix[:2, :3].T,
+            out=xy[start : start + count],
+        )
+        xy[start : start + count] += matrix[:2, 3]
+    xy /= scale_factor
+    return xy, offsets
+
+
+def calculate_exact_footprints(objects, projection, scale_factor=1.0, hull_points=16):
+    """
+    Projects every vertex of the objects to get their exact lat/lon bounds,
+    and a convex polygon of up to hull_points vertices inside each convex hull:
+    the extreme vertices along evenly spaced directions, in angular order.
+    Returns (bounds, hull, hull_offsets): the (N, 4) bounds of (min_lat,
+    min_lon, max_lat, max_lon), and an (H, 2) array of (lat, lon) where object
+    i's polygon is hull[hull_offsets[i]:hull_offsets[i + 1]].
+    Objects without vertices get NaN bounds and an empty polygon.
+    """
+    objects = list(objects)
+    geographic, offsets = _world_vertices_xy(objects, scale_factor)
+    projection.toGeographicArray(geographic, out=geographic)
 
-    # Apply world transformation
-    min_bound_world = obj.matrix_world @ mathutils.Vector(min_bound)
-    max_bound_world = obj.matrix_world @ mathutils.Vector(max_bound)
+    bounds = np.full((len(objects), 4), np.nan)
+    counts = np.diff(offsets)
+    filled = counts > 0
+    starts = offsets[:-1][filled]
+    if not len(starts):
+        return bounds, np.empty((0, 2)), np.zeros(len(objects) + 1, dtype=np.int64)
+    bounds[filled, :2] = np.minimum.reduceat(geographic, starts, axis=0)
+    bounds[filled, 2:] = np.maximum.reduceat(geographic, starts, axis=0)
 
-    # Convert to geographic coordinates
-    real_min_lat, real_min_lon = projection.toGeographic(
-        min_bound_world.x, min_bound_world.y
+    # Directions in meters, a degree of longitude is shorter than one of latitude
+    owners = np.repeat(np.arange(len(starts)), counts[filled])
+    angles = np.linspace(0, 2 * np.pi, hull_points, endpoint=False)
+    directions = np.column_stack(
+        [np.sin(angles), np.cos(angles) * math.cos(math.radians(projection.lat))]
     )
-    real_max_lat, real_max_lon = projection.toGeographic(
-        max_bound_world.x, max_bound_world.y
+    extremes = np.empty((len(starts), hull_points), dtype=np.int64)
+    for k, direction in enumerate(directions):
+        reach = geographic @ direction
+        hits = np.flatnonzero(reach >= np.maximum.reduceat(reach, starts)[owners])
+        # First extreme vertex of each object
+        _, first = np.unique(owners[hits], return_index=True)
+        extremes[:, k] = hits[first]
+
+    # Neighbouring directions often share their extreme vertex
+    keep = extremes != np.roll(extremes, 1, axis=1)
+    keep[~keep.any(axis=1), 0] = True
+    hull = geographic[extremes[keep]]
+    hull_counts = np.zeros(len(objects), dtype=np.int64)
+    hull_counts[filled] = keep.sum(axis=1)
+    return bounds, hull, np.concatenate([[0], np.cumsum(hull_counts)])
+
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+
+def geodetic_to_ecef(lat, lon, height=0.0):
+    """
+    Converts geodetic coordinates in degrees (arrays or scalars) to Earth-centered
+    Earth-fixed (x, y, z) in meters, returned as an (N, 3) array.
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64)).ravel()
+    lon = np.radians(np.asarray(lon, dtype=np.float64)).ravel()
+    height = np.broadcast_to(np.asarray(height, dtype=np.float64), lat.shape)
+
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+    return np.column_stack(
+        [
+            (n + height) * np.cos(lat) * np.cos(lon),
+            (n + height) * np.cos(lat) * np.sin(lon),
+            (n * (1 - WGS84_E2) + height) * np.sin(lat),
+        ]
     )
 
-    return real_min_lat, real_min_lon, real_max_lat, real_max_lon
+
+def ecef_to_geodetic(points, iterations=5):
+    """
+    Converts an (N, 3) array of ECEF coordinates to an (N, 3) array of
+    (lat, lon, height), in degrees and meters.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    p = np.hypot(x, y)
+    lon = np.arctan2(y, x)
+
+    # Fixed-point iteration on the latitude, converges to sub-millimeter quickly
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+    for _ in range(iterations):
+        n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+        height = p / np.maximum(np.cos(lat), 1e-12) - n
+        lat = np.arctan2(z, p * (1 - WGS84_E2 * n / (n + height)))
+
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+    height = p / np.maximum(np.cos(lat), 1e-12) - n
+    return np.column_stack([np.degrees(lat), np.degrees(lon), height])
+
+
+def enu_to_ecef_matrix(lat, lon, height=0.0):
+    """
+    4x4 matrix taking local East-North-Up coordinates at (lat, lon, height) to ECEF.
+    """
+    phi, lam = math.radians(lat), math.radians(lon)
+    east = [-math.sin(lam), math.cos(lam), 0.0]
+    north = [
+        -math.sin(phi) * math.cos(lam),
+        -math.sin(phi) * math.sin(lam),
+        math.cos(phi),
+    ]
+    up = [math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)]
+
+    matrix = np.identity(4)
+    matrix[:3, 0] = east
+    matrix[:3, 1] = north
+    matrix[:3, 2] = up
+    matrix[:3, 3] = geodetic_to_ecef(lat, lon, height)[0]
+    return matrix
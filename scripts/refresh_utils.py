@@ -0,0 +1,188 @@
+from collections import defaultdict
+import hashlib
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+import bpy
+from scripts.blender_utils import import_tiles, purge_orphans, rescale_scene
+from scripts.fetch_utils import TilesFetcher, get_tile_cache_name, save_tile
+from scripts.profile_utils import stage
+
+
+def get_output_name(config):
+    return f"{config['output']['base_name']}_{config['blosm']['lod']}"
+
+
+def get_manifest_path(output_dir, custom_name):
+    return Path(output_dir) / f"{custom_name}_manifest.json"
+
+
+def save_tile_manifest(config, output_dir, custom_name):
+    """
+    Records which tiles, by URI and content hash, make up the output, so a
+    later refresh only fetches what changed. Scenes whose objects no longer
+    map to single tiles (Blosm imports, joined or merged tiles) get none.
+    """
+    manifest_path = get_manifest_path(output_dir, custom_name)
+    tiles_collection = bpy.data.collections.get("Google 3D Tiles")
+    meshes = [
+        obj
+        for obj in (tiles_collection.objects if tiles_collection else [])
+        if obj.type == "MESH"
+    ]
+    if (
+        not meshes
+        or config["blosm"]["join_tiles_objects"]
+        or any("tile_uri" not in obj or "source_meshes" in obj for obj in meshes)
+    ):
+        # A manifest of an earlier run would no longer match the .blend
+        manifest_path.unlink(missing_ok=True)
+        return None
+
+    tiles = defaultdict(lambda: {"sha1": None, "objects": []})
+    for obj in meshes:
+        tile = tiles[obj["tile_uri"]]
+        tile["sha1"] = obj.get("tile_sha1")
+        tile["objects"].append(obj.name)
+
+    box = config["input"]
+    manifest = {
+        "lod": config["blosm"]["lod"],
+        "scale_factor": config["blosm"]["scale_factor"],
+        "bbox": [box["min_lat"], box["min_lon"], box["max_lat"], box["max_lon"]],
+        "origin": [bpy.context.scene.get("lat"), bpy.context.scene.get("lon")],
+        "tiles": dict(sorted(tiles.items())),
+    }
+    with manifest_path.open("w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    print(f"Tile manifest saved to {manifest_path}")
+    return manifest_path
+
+
+def find_previous_output(config):
+    """
+    The manifest and .blend of an earlier run with the same name and LOD, or
+    None when there is nothing to refresh.
+    """
+    output_dir = Path(config["output"]["output_dir"])
+    custom_name = get_output_name(config)
+    manifest_path = get_manifest_path(output_dir, custom_name)
+    blend_path = output_dir / f"{custom_name}.blend"
+    if not manifest_path.exists() or not blend_path.exists():
+        return None
+
+    with manifest_path.open(encoding="utf-8") as file:
+        manifest = json.load(file)
+    # The tiles in the .blend are placed for the LOD and scale of that run
+    if manifest.get("lod") != config["blosm"]["lod"] or manifest.get(
+        "scale_factor"
+    ) != float(config["blosm"]["scale_factor"]):
+        return None
+    return {"manifest": manifest, "blend_path": blend_path}
+
+
+class RefreshFetcher(TilesFetcher):
+    """
+    Traverses the tileset like a full fetch, but only downloads the tiles the
+    manifest does not list. Google's content URIs change with their content,
+    so a listed URI means an unchanged tile. With verify, listed tiles are
+    downloaded again and compared by content hash instead.
+    """
+
+    def __init__(self, *args, known=None, verify=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        # {URI path: content SHA-1} of the tiles in the previous output
+        self.known = dict(known or {})
+        self.verify = verify
+
+    async def download_tile(self, url, transform):
+        uri = urlsplit(url).path
+        if uri not in self.known:
+            await super().download_tile(url, transform)
+            return
+
+        if self.verify:
+            body = await self.fetch(url)
+            if hashlib.sha1(body).hexdigest() != self.known[uri]:
+                path = self.download_dir / get_tile_cache_name(url)
+                save_tile(path, body)
+                self.stats["tiles"] += 1
+                self.tiles.append(
+                    {
+                        "uri": uri,
+                        "file": str(path),
+                        "transform": transform,
+                        "cached": False,
+                    }
+                )
+                return
+
+        self.stats["tiles"] += 1
+        self.tiles.append(
+            {"uri": uri, "file": None, "transform": transform, "known": True}
+        )
+
+
+def refresh_tiles(config, previous):
+    """
+    Opens the previous .blend and patches it for the current box: objects of
+    tiles no longer selected or changed are removed, new and changed tiles
+    imported. Returns the counts of kept, added, updated and removed tiles,
+    or None when the fetch failed.
+    """
+    manifest = previous["manifest"]
+    bpy.ops.wm.open_mainfile(filepath=str(previous["blend_path"]))
+    scene = bpy.context.scene
+    collection = bpy.data.collections.get("Google 3D Tiles")
+    if collection is None:
+        return None
+
+    box = config["input"]
+    bbox = (box["min_lat"], box["min_lon"], box["max_lat"], box["max_lon"])
+    fetcher = RefreshFetcher.from_config(
+        config,
+        bbox,
+        known={uri: tile["sha1"] for uri, tile in manifest["tiles"].items()},
+        verify=bool(config.get("refresh", {}).get("verify_hashes")),
+    )
+    with stage("fetch") as details:
+        try:
+            tiles = fetcher.fetch_all()
+        except OSError as e:
+            print(f"\nFailed to fetch 3D Tiles: {e}")
+            return None
+        finally:
+            details.update(fetcher.stats)
+
+    kept = {tile["uri"] for tile in tiles if tile.get("known")}
+    fetched = [tile for tile in tiles if not tile.get("known")]
+    stale = set(manifest["tiles"]) - kept
+
+    removed = [
+        obj
+        for obj in collection.objects
+        if obj.get("tile_uri") in stale and obj.type == "MESH"
+    ]
+    if removed:
+        meshes = [obj.data for obj in removed]
+        bpy.data.batch_remove(removed + meshes)
+        purge_orphans()
+
+    if fetched:
+        with stage("gltf_import"):
+            imported = import_tiles(fetched, collection, scene["lat"], scene["lon"])
+        # The rest of the scene was rescaled when it was first imported
+        rescale_scene(config["blosm"]["scale_factor"], only=imported)
+
+    fetched_uris = {tile["uri"] for tile in fetched}
+    changes = {
+        "kept": len(kept),
+        "added": len(fetched_uris - set(manifest["tiles"])),
+        "updated": len(fetched_uris & set(manifest["tiles"])),
+        "removed": len(stale - fetched_uris),
+    }
+    print(
+        f"\nRefresh: {changes['kept']} tile(s) unchanged, {changes['added']} added, "
+        f"{changes['updated']} updated, {changes['removed']} removed."
+    )
+    return changes
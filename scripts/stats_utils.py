@@ -0,0 +1,121 @@
+import json
+import os
+from pathlib import Path
+import bpy
+import numpy as np
+
+
+def get_mesh_triangles(mesh):
+    """
+    Triangle count of a mesh from its polygon sizes, without triangulating it.
+    """
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    return int(loop_totals.sum() - 2 * len(loop_totals))
+
+
+def get_image_bytes(image):
+    if image.packed_file:
+        return image.packed_file.size
+
+    filepath = bpy.path.abspath(image.filepath)
+    if filepath and os.path.isfile(filepath):
+        return os.path.getsize(filepath)
+
+    # Generated or missing images, count their uncompressed pixels
+    width, height = image.size
+    return width * height * image.channels
+
+
+def get_material_images(material):
+    if not material or not material.use_nodes:
+        return []
+    return [
+        node.image
+        for node in material.node_tree.nodes
+        if node.type == "TEX_IMAGE" and node.image
+    ]
+
+
+def get_scene_statistics():
+    """
+    Collects triangle, vertex, material and texture byte counts for every mesh
+    object in the scene, and the totals.
+    """
+    mesh_stats = {}
+    image_bytes = {}
+    objects = []
+    materials = set()
+
+    for obj in bpy.context.scene.objects:
+        if obj.type != "MESH" or not obj.data:
+            continue
+
+        mesh = obj.data
+        # Meshes shared by several objects are only measured once
+        if mesh.name not in mesh_stats:
+            mesh_stats[mesh.name] = {
+                "triangles": get_mesh_triangles(mesh),
+                "vertices": len(mesh.vertices),
+            }
+
+        object_materials = {
+            slot.material for slot in obj.material_slots if slot.material
+        }
+        object_images = {}
+        for material in object_materials:
+            for image in get_material_images(material):
+                if image.name not in image_bytes:
+                    image_bytes[image.name] = get_image_bytes(image)
+                object_images[image.name] = image_bytes[image.name]
+        materials.update(material.name for material in object_materials)
+
+        objects.append(
+            {
+                "name": obj.name,
+                "triangles": mesh_stats[mesh.name]["triangles"],
+                "vertices": mesh_stats[mesh.name]["vertices"],
+                "materials": len(object_materials),
+                "textures": len(object_images),
+                "texture_bytes": sum(object_images.values()),
+            }
+        )
+
+    totals = {
+        "objects": len(objects),
+        "triangles": sum(obj["triangles"] for obj in objects),
+        "vertices": sum(obj["vertices"] for obj in objects),
+        "materials": len(materials),
+        "textures": len(image_bytes),
+        "texture_bytes": sum(image_bytes.values()),
+    }
+
+    print(
+        f"Total triangles in scene: {totals['triangles']}, vertices: {totals['vertices']}, "
+        f"materials: {totals['materials']}, textures: {totals['textures']} "
+        f"({totals['texture_bytes'] / 1e6:.1f} MB)"
+    )
+    return {"totals": totals, "objects": objects}
+
+
+def save_scene_statistics(output_dir, custom_name, statistics, config):
+    """
+    Writes the statistics with the projection origin as {custom_name}_stats.json,
+    next to the metadata CSV.
+    """
+    scene = bpy.context.scene
+    report = {
+        "name": custom_name,
+        "lod": config["blosm"]["lod"],
+        "origin": {"lat": scene.get("lat", 0.0), "lon": scene.get("lon", 0.0)},
+        "scale_factor": config["blosm"]["scale_factor"],
+        "totals": statistics["totals"],
+        "objects": statistics["objects"],
+    }
+
+    json_path = Path(output_dir) / f"{custom_name}_stats.json"
+    with json_path.open("w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"Scene statistics saved to {json_path}\n")
+    return json_path
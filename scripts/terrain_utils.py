@@ -0,0 +1,264 @@
+import math
+from pathlib import Path
+import sys
+import numpy as np
+from scripts.projection_utils import TransverseMercator
+
+try:
+    from mathutils.bvhtree import BVHTree
+except ImportError:
+    BVHTree = None
+
+# Average number of triangles per cell of the height grid
+TRIANGLES_PER_CELL = 8
+
+# Height queries are processed in batches of this many points
+QUERY_BATCH = 100_000
+
+# Barycentric tolerance, so points on shared edges hit one of the triangles
+EDGE_EPSILON = 1e-9
+
+
+def build_height_grid(vertices, triangles, triangles_per_cell=TRIANGLES_PER_CELL):
+    """
+    Buckets the triangles by the cells of a uniform grid over their x, y extent.
+    Returns (grid_origin, cell_size, grid_shape, cell_starts, cell_triangles):
+    the triangles overlapping cell (row, col) are
+    cell_triangles[cell_starts[c]:cell_starts[c + 1]] with c = row * cols + col.
+    """
+    corners = vertices[triangles][:, :, :2]
+    tri_min, tri_max = corners.min(axis=1), corners.max(axis=1)
+    grid_origin = tri_min.min(axis=0)
+    extent = np.maximum(tri_max.max(axis=0) - grid_origin, 1e-6)
+
+    cell_size = math.sqrt(
+        extent[0] * extent[1] * triangles_per_cell / max(len(triangles), 1)
+    )
+    # Cells smaller than the triangles only multiply the bucket entries
+    cell_size = max(cell_size, float(np.mean(tri_max - tri_min)), 1e-6)
+    cols, rows = np.maximum(np.ceil(extent / cell_size).astype(np.int64), 1)
+
+    first = np.minimum(
+        ((tri_min - grid_origin) // cell_size).astype(np.int64), [cols - 1, rows - 1]
+    )
+    last = np.minimum(
+        ((tri_max - grid_origin) // cell_size).astype(np.int64), [cols - 1, rows - 1]
+    )
+    widths = last[:, 0] - first[:, 0] + 1
+    counts = widths * (last[:, 1] - first[:, 1] + 1)
+
+    # One entry per (triangle, overlapped cell)
+    entry_triangles = np.repeat(np.arange(len(triangles), dtype=np.int64), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    entry_widths = widths[entry_triangles]
+    entry_cols = first[entry_triangles, 0] + local % entry_widths
+    entry_rows = first[entry_triangles, 1] + local // entry_widths
+    entry_cells = entry_rows * cols + entry_cols
+
+    order = np.argsort(entry_cells, kind="stable")
+    cell_starts = np.zeros(rows * cols + 1, dtype=np.int64)
+    np.cumsum(np.bincount(entry_cells, minlength=rows * cols), out=cell_starts[1:])
+    return (
+        grid_origin,
+        cell_size,
+        np.array([rows, cols], dtype=np.int64),
+        cell_starts,
+        entry_triangles[order].astype(np.int32),
+    )
+
+
+def save_terrain_npz(
+    npz_path,
+    vertices,
+    triangles,
+    mesh_ids,
+    mesh_offsets,
+    origin_lat,
+    origin_lon,
+    scale_factor,
+    lod,
+):
+    """
+    Writes the world-space triangles of the scene, in meters from the origin,
+    with a height grid over them so queries need no rebuild.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int32).reshape(-1, 3)
+    grid_origin, cell_size, grid_shape, cell_starts, cell_triangles = build_height_grid(
+        vertices, triangles
+    )
+
+    np.savez(
+        npz_path,
+        vertices=vertices,
+        triangles=triangles,
+        mesh_ID=np.asarray(mesh_ids, dtype=str),
+        mesh_offsets=np.asarray(mesh_offsets, dtype=np.int64),
+        origin_lat=np.float64(origin_lat),
+        origin_lon=np.float64(origin_lon),
+        scale_factor=np.float64(scale_factor),
+        lod=np.str_(lod),
+        grid_origin=grid_origin,
+        grid_cell_size=np.float64(cell_size),
+        grid_shape=grid_shape,
+        grid_cell_starts=cell_starts,
+        grid_cell_triangles=cell_triangles,
+    )
+    print(f"Terrain index saved to {npz_path}\n")
+    return Path(npz_path)
+
+
+class TerrainQuery:
+    """
+    Ground and roof heights and raycasts at lat/lon points over a fetched area,
+    from a terrain .npz file. Heights are in meters above the plane tangent to
+    the origin, as in the scene; hit positions are returned as lat, lon, height.
+    """
+
+    def __init__(self, data):
+        self.vertices = data["vertices"]
+        self.triangles = data["triangles"]
+        self.mesh_ids = data["mesh_ID"]
+        self.mesh_offsets = data["mesh_offsets"]
+        self.origin_lat = float(data["origin_lat"])
+        self.origin_lon = float(data["origin_lon"])
+        self.scale_factor = float(data["scale_factor"])
+        self.lod = str(data["lod"])
+        self.grid_origin = data["grid_origin"]
+        self.cell_size = float(data["grid_cell_size"])
+        self.rows, self.cols = data["grid_shape"].tolist()
+        self.cell_starts = data["grid_cell_starts"]
+        self.cell_triangles = data["grid_cell_triangles"]
+        self.projection = TransverseMercator(lat=self.origin_lat, lon=self.origin_lon)
+        self.bvh = None
+
+    @classmethod
+    def load(cls, npz_path):
+        with np.load(npz_path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def get_mesh_ids(self, triangle_indices):
+        """
+        Mesh_ID of each triangle index, empty string for -1.
+        """
+        triangle_indices = np.asarray(triangle_indices, dtype=np.int64)
+        meshes = np.searchsorted(self.mesh_offsets, triangle_indices, side="right") - 1
+        ids = self.mesh_ids[np.clip(meshes, 0, len(self.mesh_ids) - 1)]
+        return np.where(triangle_indices >= 0, ids, "")
+
+    def heights(self, lat, lon=None):
+        """
+        Height of the highest surface, roofs included, straight above or below
+        each of the N points, NaN outside the meshes. Accepts an Nx2 array of
+        (lat, lon) or separate lat and lon arrays.
+        """
+        points = self.projection.fromGeographicArray(lat, lon)
+        heights = np.full(len(points), np.nan)
+        for start in range(0, len(points), QUERY_BATCH):
+            batch = slice(start, start + QUERY_BATCH)
+            heights[batch] = self._batch_heights(points[batch])
+        return heights
+
+    def _batch_heights(self, points):
+        cells = np.floor((points - self.grid_origin) / self.cell_size).astype(np.int64)
+        inside = (
+            (cells[:, 0] >= 0)
+            & (cells[:, 0] < self.cols)
+            & (cells[:, 1] >= 0)
+            & (cells[:, 1] < self.rows)
+        )
+        cell_ids = np.where(inside, cells[:, 1] * self.cols + cells[:, 0], 0)
+        starts = self.cell_starts[cell_ids]
+        counts = np.where(inside, self.cell_starts[cell_ids + 1] - starts, 0)
+
+        # Every (point, candidate triangle) pair in one flat batch
+        point_indices = np.repeat(np.arange(len(points)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = self.cell_triangles[np.repeat(starts, counts) + local]
+
+        a, b, c = (
+            self.vertices[self.triangles[candidates, corner]].astype(np.float64)
+            for corner in range(3)
+        )
+        v0, v1 = b - a, c - a
+        v2 = points[point_indices] - a[:, :2]
+        denominator = v0[:, 0] * v1[:, 1] - v1[:, 0] * v0[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            u = (v2[:, 0] * v1[:, 1] - v1[:, 0] * v2[:, 1]) / denominator
+            v = (v0[:, 0] * v2[:, 1] - v2[:, 0] * v0[:, 1]) / denominator
+        hits = (
+            (denominator != 0)
+            & (u >= -EDGE_EPSILON)
+            & (v >= -EDGE_EPSILON)
+            & (u + v <= 1 + EDGE_EPSILON)
+        )
+
+        z = a[hits, 2] + u[hits] * v0[hits, 2] + v[hits] * v1[hits, 2]
+        heights = np.full(len(points), -np.inf)
+        np.maximum.at(heights, point_indices[hits], z)
+        heights[np.isneginf(heights)] = np.nan
+        return heights
+
+    def get_bvh(self):
+        """
+        BVH tree over the triangles, built on first use. BVH trees cannot be
+        saved, but building one from the stored arrays takes seconds.
+        """
+        if self.bvh is None:
+            if BVHTree is None:
+                raise ImportError(
+                    "Raycasts need mathutils: run inside Blender or pip install mathutils."
+                )
+            self.bvh = BVHTree.FromPolygons(
+                self.vertices.tolist(), self.triangles.tolist(), all_triangles=True
+            )
+        return self.bvh
+
+    def raycast(self, lat, lon, height, direction, max_distance=None):
+        """
+        Casts N rays from (lat, lon, height) along direction, an (N, 3) or (3,)
+        East-North-Up vector. Returns a dict of (N, ...) arrays: lat, lon and
+        height of the first hit, its normal, distance, triangle and mesh_ID,
+        NaN (or -1 and "") where the ray hits nothing.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        points = self.projection.fromGeographicArray(lat, lon)
+        origins = np.column_stack(
+            [points, np.broadcast_to(np.asarray(height, dtype=np.float64), len(points))]
+        )
+        directions = np.broadcast_to(
+            np.asarray(direction, dtype=np.float64), origins.shape
+        )
+
+        bvh = self.get_bvh()
+        locations = np.full((len(origins), 3), np.nan)
+        normals = np.full((len(origins), 3), np.nan)
+        distances = np.full(len(origins), np.nan)
+        triangles = np.full(len(origins), -1, dtype=np.int64)
+        distance = float("inf") if max_distance is None else float(max_distance)
+        for i, (origin, ray) in enumerate(zip(origins.tolist(), directions.tolist())):
+            location, normal, index, hit_distance = bvh.ray_cast(origin, ray, distance)
+            if location is not None:
+                locations[i], normals[i] = location, normal
+                distances[i], triangles[i] = hit_distance, index
+
+        geographic = self.projection.toGeographicArray(locations[:, :2])
+        return {
+            "lat": geographic[:, 0],
+            "lon": geographic[:, 1],
+            "height": locations[:, 2],
+            "normal": normals,
+            "distance": distances,
+            "triangle": triangles,
+            "mesh_ID": self.get_mesh_ids(triangles),
+        }
+
+
+if __name__ == "__main__":
+    # python -m scripts.terrain_utils <name>_terrain.npz lat,lon [lat,lon ...]
+    query = TerrainQuery.load(sys.argv[1])
+    points = np.array(
+        [[float(value) for value in arg.split(",")] for arg in sys.argv[2:]]
+    ).reshape(-1, 2)
+    for (lat, lon), height in zip(points.tolist(), query.heights(points)):
+        print(f"{lat}, {lon}: {height:.2f} m")
@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+from pathlib import Path
+import bpy
+import numpy as np
+from scripts.blender_utils import IMAGE_EXTENSIONS
+from scripts.merge_utils import deduplicate_images
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DEFAULT_MAX_SIZE = 2048
+DEFAULT_QUALITY = 85
+
+# Texture format setting -> (Pillow format, Blender file format)
+TEXTURE_FORMATS = {
+    "jpeg": ("JPEG", "JPEG"),
+    "webp": ("WEBP", "WEBP"),
+    "png": ("PNG", "PNG"),
+}
+
+
+def get_image_data(image):
+    """
+    The encoded bytes of an image, packed or on disk, or None for generated
+    images that only exist as pixels.
+    """
+    if image.packed_file:
+        return bytes(image.packed_file.data)
+    filepath = bpy.path.abspath(image.filepath)
+    if filepath and os.path.isfile(filepath):
+        return Path(filepath).read_bytes()
+    return None
+
+
+def encode_texture(data, max_size, texture_format, quality):
+    """
+    Decodes an image, fits it in max_size x max_size and encodes it again.
+    Returns (bytes, Pillow format), or None when the result is no smaller and
+    no resize was needed. Runs in worker threads, Pillow releases the GIL while
+    decoding and encoding.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = source
+        resized = max(image.size) > max_size
+        if resized:
+            image = image.copy()
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        if texture_format == "keep":
+            pil_format = source.format
+            if pil_format.lower() not in TEXTURE_FORMATS:
+                pil_format = "PNG"
+        else:
+            pil_format = TEXTURE_FORMATS[texture_format][0]
+
+        # JPEG has no alpha channel, keep those images lossless
+        has_alpha = image.mode in ("RGBA", "LA") and image.getextrema()[-1][0] < 255
+        if pil_format == "JPEG" and has_alpha:
+            pil_format = "PNG"
+        if pil_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        if pil_format == "PNG":
+            image.save(output, format="PNG", optimize=True)
+        else:
+            image.save(output, format=pil_format, quality=quality)
+
+    encoded = output.getvalue()
+    if not resized and len(encoded) >= len(data):
+        return None
+    return encoded, pil_format
+
+
+def replace_image(image, data, pil_format, texture_dir):
+    """
+    Points the Blender image at the re-encoded file, packed again if it was.
+    """
+    file_format = TEXTURE_FORMATS[pil_format.lower()][1]
+    texture_dir.mkdir(parents=True, exist_ok=True)
+    path = texture_dir / (
+        f"{bpy.path.clean_name(image.name)}{IMAGE_EXTENSIONS[file_format]}"
+    )
+    path.write_bytes(data)
+
+    was_packed = bool(image.packed_file)
+    if was_packed:
+        image.unpack(method="REMOVE")
+    image.filepath = str(path)
+    image.file_format = file_format
+    image.reload()
+    if was_packed:
+        image.pack()
+
+
+def has_alpha_in_blender(image):
+    """
+    Whether a Blender image has any pixel that is not fully opaque.
+    """
+    if image.channels != 4:
+        return False
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return bool(pixels[3::4].min() < 1.0)
+
+
+def encode_in_blender(image, data, max_size, texture_format, quality, texture_dir):
+    """
+    Fallback without Pillow: fits the image in max_size x max_size and saves it
+    with Blender in the requested format and quality. Returns (bytes, format)
+    like encode_texture, or None when the image is left as it was.
+    """
+    original_format = image.file_format
+    if texture_format == "keep":
+        file_format = original_format
+        if file_format.lower() not in TEXTURE_FORMATS:
+            file_format = "PNG"
+    else:
+        file_format = TEXTURE_FORMATS[texture_format][1]
+
+    width, height = image.size
+    resized = max(width, height) > max_size
+    if file_format == "JPEG" and has_alpha_in_blender(image):
+        file_format = "PNG"
+    # Blender has no PNG optimizer, saving a PNG again only costs time
+    if not resized and file_format == original_format == "PNG":
+        return None
+    if resized:
+        factor = max_size / max(width, height)
+        image.scale(max(1, int(width * factor)), max(1, int(height * factor)))
+
+    texture_dir.mkdir(parents=True, exist_ok=True)
+    path = texture_dir / (
+        f"{bpy.path.clean_name(image.name)}{IMAGE_EXTENSIONS[file_format]}"
+    )
+    image.file_format = file_format
+    image.save(filepath=str(path), quality=quality)
+    encoded = path.read_bytes()
+    if not resized and len(encoded) >= len(data):
+        image.file_format = original_format
+        path.unlink()
+        return None
+    return encoded, file_format
+
+
+def optimize_textures(config, texture_dir):
+    """
+    Deduplicates identical images, then resizes and re-encodes the rest, in a
+    thread pool with Pillow or with Blender otherwise. Returns the before/after
+    byte counts.
+    """
+    textures = config.get("textures", {})
+    max_size = int(textures.get("max_size") or DEFAULT_MAX_SIZE)
+    texture_format = str(textures.get("format") or "jpeg").lower()
+    quality = int(textures.get("quality") or DEFAULT_QUALITY)
+    if texture_format != "keep" and texture_format not in TEXTURE_FORMATS:
+        raise ValueError(
+            f"Unsupported texture format: {texture_format}. "
+            f"Use keep, {', '.join(TEXTURE_FORMATS)}."
+        )
+
+    duplicates = deduplicate_images()
+    images = [
+        image for image in bpy.data.images if image.users and image.type == "IMAGE"
+    ]
+    sources = {image.name: get_image_data(image) for image in images}
+    images = [image for image in images if sources[image.name]]
+    report = {
+        "images": len(images),
+        "duplicates": duplicates,
+        "bytes_before": sum(len(sources[image.name]) for image in images),
+        "reencoded": 0,
+    }
+
+    if Image is None:
+        print("\nPillow is not installed, textures are re-encoded one at a time.")
+        bytes_after = 0
+        for image in images:
+            result = encode_in_blender(
+                image,
+                sources[image.name],
+                max_size,
+                texture_format,
+                quality,
+                Path(texture_dir),
+            )
+            if result is None:
+                bytes_after += len(sources[image.name])
+                continue
+            data, file_format = result
+            replace_image(image, data, file_format, Path(texture_dir))
+            bytes_after += len(data)
+            report["reencoded"] += 1
+        report["bytes_after"] = bytes_after
+    else:
+        workers = int(textures.get("workers") or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                lambda image: encode_texture(
+                    sources[image.name], max_size, texture_format, quality
+                ),
+                images,
+            )
+            # Blender data is only touched from this thread
+            bytes_after = 0
+            for image, result in zip(images, results):
+                if result is None:
+                    bytes_after += len(sources[image.name])
+                    continue
+                data, pil_format = result
+                replace_image(image, data, pil_format, Path(texture_dir))
+                bytes_after += len(data)
+                report["reencoded"] += 1
+        report["bytes_after"] = bytes_after
+
+    print(
+        f"\nTextures: {report['images']} image(s), {duplicates} duplicate(s) removed, "
+        f"{report['reencoded']} re-encoded, {report['bytes_before'] / 1e6:.1f} MB -> "
+        f"{report['bytes_after'] / 1e6:.1f} MB."
+    )
+    return report
@@ -0,0 +1,205 @@
+import asyncio
+import random
+import time
+
+THROTTLE_STATUSES = (429,)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Limits the request rate to `rate` requests per second, allowing bursts of
+    up to `burst` requests.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit tuned with additive increase / multiplicative decrease:
+    every successful request grows the limit by about one per round trip of
+    requests, and a throttled or failed request halves it, at most once per
+    cooldown so a burst of errors from one window only counts once.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=64, cooldown=1.0):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, congested):
+        async with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if congested:
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+def get_setting(settings, key, default):
+    """
+    A setting, or the default when it is missing. Unlike `or`, keeps 0.
+    """
+    value = settings.get(key)
+    return default if value is None else value
+
+
+def get_header(headers, name):
+    """
+    A response header by name, whatever its case.
+    """
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, retry_after=None):
+    """
+    Exponential backoff with full jitter, never shorter than a Retry-After hint.
+    """
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+class RequestScheduler:
+    """
+    Runs requests through a token bucket and an adaptive concurrency limit,
+    retries throttled and transient failures with jittered backoff, and keeps
+    per-run accounting of requests, bytes, retries and errors.
+    """
+
+    def __init__(
+        self,
+        rate_limit=None,
+        burst=None,
+        concurrency=16,
+        min_concurrency=1,
+        max_concurrency=None,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=30.0,
+    ):
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.limiter = AdaptiveLimiter(
+            concurrency,
+            min_concurrency,
+            concurrency * 4 if max_concurrency is None else max_concurrency,
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {
+            "requests": 0,
+            "bytes": 0,
+            "retries": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "connection_errors": 0,
+            "network_time": 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, fetch):
+        concurrency = int(get_setting(fetch, "concurrency", 16))
+        return cls(
+            rate_limit=fetch.get("rate_limit"),
+            burst=fetch.get("burst"),
+            concurrency=concurrency,
+            min_concurrency=int(get_setting(fetch, "min_concurrency", 1)),
+            max_concurrency=int(get_setting(fetch, "max_concurrency", concurrency * 4)),
+            max_retries=int(get_setting(fetch, "max_retries", 3)),
+            backoff_base=float(get_setting(fetch, "backoff_base", 0.5)),
+            backoff_max=float(get_setting(fetch, "backoff_max", 30.0)),
+        )
+
+    async def request(self, send, url):
+        """
+        Awaits send(url) -> (status, headers, body) until it succeeds, fails
+        permanently or runs out of retries. Returns the body of a 200 response.
+        """
+        status, body = None, b""
+        for attempt in range(self.max_retries + 1):
+            if self.bucket:
+                await self.bucket.acquire()
+            await self.limiter.acquire()
+
+            start = time.perf_counter()
+            headers = {}
+            try:
+                status, headers, body = await send(url)
+            except OSError as e:
+                status, body = None, str(e).encode("utf-8")
+                self.stats["connection_errors"] += 1
+            self.stats["network_time"] += time.perf_counter() - start
+            self.stats["requests"] += 1
+
+            congested = status is None or status in RETRY_STATUSES
+            if status in THROTTLE_STATUSES:
+                self.stats["throttled"] += 1
+            elif status is not None and status >= 500:
+                self.stats["server_errors"] += 1
+            await self.limiter.release(congested)
+
+            if status == 200:
+                self.stats["bytes"] += len(body)
+                return body
+            if not congested or attempt == self.max_retries:
+                break
+
+            self.stats["retries"] += 1
+            await asyncio.sleep(
+                backoff_delay(
+                    attempt,
+                    self.backoff_base,
+                    self.backoff_max,
+                    get_header(headers, "Retry-After"),
+                )
+            )
+
+        raise OSError(f"GET failed with {status}: {body[:200]!r}")
+
+    def summary(self):
+        stats = self.stats
+        return (
+            f"{stats['requests']} request(s), {stats['bytes'] / 1e6:.1f} MB, "
+            f"{stats['retries']} retries ({stats['throttled']} throttled, "
+            f"{stats['server_errors']} server error(s), "
+            f"{stats['connection_errors']} connection error(s)), "
+            f"final concurrency {int(self.limiter.limit)}"
+        )
@@ -0,0 +1,309 @@
+import json
+from pathlib import Path
+import tempfile
+import bpy
+import numpy as np
+from scripts.blender_utils import get_gltf_compression_options, purge_orphans
+from scripts.fetch_utils import LOD_GEOMETRIC_ERROR
+from scripts.lod_utils import decimate_meshes, downscale_textures
+from scripts.projection_utils import ecef_to_geodetic, enu_to_ecef_matrix
+from scripts.stats_utils import get_mesh_triangles
+
+DEFAULT_MAX_DEPTH = 8
+DEFAULT_NODE_TRIANGLES = 200_000
+DEFAULT_MIN_TEXTURE_SIZE = 64
+
+
+def get_world_boxes(objects):
+    """
+    World axis-aligned box of each object from all 8 corners of its local
+    bounding box, as an (N, 2, 3) array of (min, max).
+    """
+    boxes = np.empty((len(objects), 2, 3), dtype=np.float64)
+    for i, obj in enumerate(objects):
+        local = np.ones((8, 4), dtype=np.float64)
+        local[:, :3] = [corner[:] for corner in obj.bound_box]
+        world = (local @ np.array(obj.matrix_world, dtype=np.float64).T)[:, :3]
+        boxes[i, 0] = world.min(axis=0)
+        boxes[i, 1] = world.max(axis=0)
+    return boxes
+
+
+def build_quadtree(
+    indices, boxes, triangles, bounds, max_triangles, max_depth, depth=0
+):
+    """
+    Splits the objects into quadrants of the (min_x, min_y, max_x, max_y) bounds
+    until a node holds at most max_triangles or max_depth is reached. Objects
+    go to the quadrant holding their center. Returns nested dicts of indices.
+    """
+    node = {"indices": indices, "children": []}
+    if triangles[indices].sum() <= max_triangles or depth >= max_depth:
+        return node
+    if len(indices) < 2:
+        return node
+
+    min_x, min_y, max_x, max_y = bounds
+    mid_x, mid_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+    centers = boxes[indices, :, :2].mean(axis=1)
+    east = centers[:, 0] >= mid_x
+    north = centers[:, 1] >= mid_y
+    quadrants = [
+        (~east & ~north, (min_x, min_y, mid_x, mid_y)),
+        (east & ~north, (mid_x, min_y, max_x, mid_y)),
+        (~east & north, (min_x, mid_y, mid_x, max_y)),
+        (east & north, (mid_x, mid_y, max_x, max_y)),
+    ]
+    for mask, quadrant in quadrants:
+        if mask.any():
+            node["children"].append(
+                build_quadtree(
+                    indices[mask],
+                    boxes,
+                    triangles,
+                    quadrant,
+                    max_triangles,
+                    max_depth,
+                    depth + 1,
+                )
+            )
+    return node
+
+
+def get_region(box, root_transform):
+    """
+    3D Tiles region (west, south, east, north in radians, min and max height
+    in meters) enclosing a scene-space (min, max) box.
+    """
+    corners = np.ones((8, 4), dtype=np.float64)
+    corners[:, :3] = [
+        [box[i][0], box[j][1], box[k][2]]
+        for i in (0, 1)
+        for j in (0, 1)
+        for k in (0, 1)
+    ]
+    geodetic = ecef_to_geodetic((corners @ root_transform.T)[:, :3])
+    lat, lon, height = (
+        np.radians(geodetic[:, 0]),
+        np.radians(geodetic[:, 1]),
+        geodetic[:, 2],
+    )
+    return [
+        float(lon.min()),
+        float(lat.min()),
+        float(lon.max()),
+        float(lat.max()),
+        float(height.min()),
+        float(height.max()),
+    ]
+
+
+def copy_for_simplification(objects, collection):
+    """
+    Copies the objects with their own meshes, materials and images, so they
+    can be decimated and their textures scaled without touching the scene.
+    """
+    materials = {}
+    images = {}
+    copies = []
+    for obj in objects:
+        duplicate = obj.copy()
+        duplicate.data = obj.data.copy()
+        collection.objects.link(duplicate)
+        for slot in duplicate.material_slots:
+            material = slot.material
+            if not material:
+                continue
+            if material.name not in materials:
+                material_copy = material.copy()
+                if material_copy.use_nodes:
+                    for node in material_copy.node_tree.nodes:
+                        if node.type == "TEX_IMAGE" and node.image:
+                            if node.image.name not in images:
+                                images[node.image.name] = node.image.copy()
+                            node.image = images[node.image.name]
+                materials[material.name] = material_copy
+            slot.material = materials[material.name]
+        copies.append(duplicate)
+    return copies
+
+
+def export_selection(objects, filepath, options):
+    bpy.ops.object.select_all(action="DESELECT")
+    for obj in objects:
+        obj.select_set(True)
+    bpy.ops.export_scene.gltf(
+        filepath=str(filepath), export_format="GLB", use_selection=True, **options
+    )
+    return Path(filepath).stat().st_size
+
+
+def free_copies(objects):
+    meshes = [obj.data for obj in objects if obj.data]
+    bpy.data.batch_remove(list(objects) + meshes)
+    purge_orphans()
+
+
+class TilesetWriter:
+    """
+    Writes the scene as a 3D Tiles tileset: a quadtree whose leaves hold the
+    tile meshes at full detail and whose inner nodes hold decimated copies of
+    everything below them. Each inner node is simplified from its children's
+    simplified copies, so besides the scene only about 3 budgets per level of
+    pending siblings plus one node of copies are held at a time.
+    """
+
+    def __init__(self, config, objects, tiles_dir):
+        tileset = config.get("tileset", {})
+        self.scale_factor = config["blosm"]["scale_factor"]
+        self.max_triangles = int(
+            tileset.get("max_node_triangles") or DEFAULT_NODE_TRIANGLES
+        )
+        self.max_depth = int(tileset.get("max_depth") or DEFAULT_MAX_DEPTH)
+        self.min_texture_size = int(
+            tileset.get("min_texture_size") or DEFAULT_MIN_TEXTURE_SIZE
+        )
+        self.source_error = LOD_GEOMETRIC_ERROR.get(config["blosm"]["lod"], 1.0)
+        self.options = get_gltf_compression_options(config["output"].get("compression"))
+
+        self.objects = objects
+        self.tiles_dir = Path(tiles_dir)
+        self.boxes = get_world_boxes(objects)
+        self.triangles = np.array(
+            [get_mesh_triangles(obj.data) for obj in objects], dtype=np.int64
+        )
+
+        # Scene units around the origin's East-North-Up frame to ECEF meters
+        scene = bpy.context.scene
+        unscale = np.diag([1 / self.scale_factor] * 3 + [1.0])
+        self.root_transform = (
+            enu_to_ecef_matrix(scene.get("lat", 0.0), scene.get("lon", 0.0)) @ unscale
+        )
+        self.stats = {"nodes": 0, "leaves": 0, "bytes": 0, "triangles": 0}
+
+    def write(self):
+        indices = np.arange(len(self.objects))
+        mins, maxs = self.boxes[:, 0].min(axis=0), self.boxes[:, 1].max(axis=0)
+        # Square root bounds so every level splits into square cells
+        size = max(maxs[0] - mins[0], maxs[1] - mins[1])
+        bounds = (mins[0], mins[1], mins[0] + size, mins[1] + size)
+        tree = build_quadtree(
+            indices,
+            self.boxes,
+            self.triangles,
+            bounds,
+            self.max_triangles,
+            self.max_depth,
+        )
+
+        (self.tiles_dir / "content").mkdir(parents=True, exist_ok=True)
+        collection = bpy.data.collections.new("Tileset Simplified")
+        bpy.context.scene.collection.children.link(collection)
+        try:
+            with tempfile.TemporaryDirectory() as texture_dir:
+                root, _, _ = self.write_node(tree, "0", collection, Path(texture_dir))
+        finally:
+            free_copies(collection.objects)
+            bpy.data.collections.remove(collection)
+
+        root["transform"] = self.root_transform.T.ravel().tolist()
+        diagonal_m = float(np.linalg.norm(maxs - mins)) / self.scale_factor
+        tileset = {
+            "asset": {"version": "1.1", "generator": "Google-Tiles-Fetcher"},
+            "geometricError": max(diagonal_m, root["geometricError"]),
+            "root": root,
+        }
+        tileset_path = self.tiles_dir / "tileset.json"
+        with tileset_path.open("w", encoding="utf-8") as file:
+            json.dump(tileset, file)
+        self.stats["bytes"] += tileset_path.stat().st_size
+        return tileset_path
+
+    def write_node(self, node, node_id, collection, texture_dir):
+        """
+        Writes the node's subtree, children first. Returns its tile, the
+        simplified copies standing for the subtree, at most the node budget,
+        and their geometric error. The parent builds its own content from
+        those copies, so no node ever copies more than 4 budgets' worth.
+        """
+        indices = node["indices"]
+        box = np.stack(
+            [self.boxes[indices, 0].min(axis=0), self.boxes[indices, 1].max(axis=0)]
+        )
+        content_path = self.tiles_dir / "content" / f"{node_id}.glb"
+
+        children, copies, child_errors = [], [], []
+        for index, child in enumerate(node["children"]):
+            tile, child_copies, error = self.write_node(
+                child, f"{node_id}_{index}", collection, texture_dir
+            )
+            children.append(tile)
+            copies.extend(child_copies)
+            child_errors.append(error)
+
+        if children:
+            ratio = self.simplify(copies, texture_dir)
+            self.stats["bytes"] += export_selection(copies, content_path, self.options)
+            self.stats["triangles"] += int(
+                sum(get_mesh_triangles(obj.data) for obj in copies)
+            )
+            # Edge length, and so the error, grows with 1 / sqrt(ratio)
+            error = max(child_errors) / ratio**0.5
+            tile_error = error
+        else:
+            objects = [self.objects[index] for index in indices]
+            self.stats["bytes"] += export_selection(objects, content_path, self.options)
+            self.stats["triangles"] += int(self.triangles[indices].sum())
+            self.stats["leaves"] += 1
+            # Only a leaf copies full resolution meshes, and only its own
+            copies = copy_for_simplification(objects, collection)
+            error = self.source_error / self.simplify(copies, texture_dir) ** 0.5
+            tile_error = 0.0
+        self.stats["nodes"] += 1
+
+        tile = {
+            "boundingVolume": {"region": get_region(box, self.root_transform)},
+            "geometricError": tile_error,
+            "refine": "REPLACE",
+            "content": {"uri": f"content/{node_id}.glb"},
+        }
+        if children:
+            tile["children"] = children
+        return tile, copies, error
+
+    def simplify(self, copies, texture_dir):
+        """
+        Decimates the copies in place to the node triangle budget, textures
+        scaled down to match. Returns the triangle ratio applied.
+        """
+        triangles = int(sum(get_mesh_triangles(obj.data) for obj in copies))
+        ratio = min(1.0, self.max_triangles / max(triangles, 1))
+        decimate_meshes(copies, ratio)
+        # Texel size follows the edge length
+        downscale_textures(copies, ratio**0.5, texture_dir, self.min_texture_size)
+        return ratio
+
+
+def export_tileset(config, output_dir, custom_name):
+    """
+    Writes {custom_name}_tiles/tileset.json and its content GLBs. Returns the
+    node, byte and triangle counts.
+    """
+    tiles_collection = bpy.data.collections.get("Google 3D Tiles")
+    objects = [
+        obj
+        for obj in (tiles_collection.objects if tiles_collection else [])
+        if obj.type == "MESH" and obj.data and len(obj.data.polygons)
+    ]
+    if not objects:
+        print("\nNo meshes to export as 3D Tiles.")
+        return {}
+
+    bpy.context.view_layer.update()
+    writer = TilesetWriter(config, objects, Path(output_dir) / f"{custom_name}_tiles")
+    tileset_path = writer.write()
+    print(
+        f"\n3D Tiles export completed: {tileset_path} ({writer.stats['nodes']} nodes, "
+        f"{writer.stats['leaves']} leaves, {writer.stats['bytes'] / 1e6:.1f} MB)"
+    )
+    return writer.stats
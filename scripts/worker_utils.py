@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import subprocess
+import time
+
+project_root = Path(__file__).resolve().parent.parent
+main_script = project_root / "main.py"
+
+# Marker line a worker prints so the scheduler can pick up its outputs
+RESULT_MARKER = "WORKER_RESULT "
+
+# The API key is handed to workers through the environment, not the command line
+API_KEY_ENV = "GOOGLE_TILES_API_KEY"
+
+
+def get_blender_path(config):
+    blender_path = config.get("workers", {}).get("blender_path")
+    if blender_path:
+        return str(blender_path)
+
+    import bpy
+
+    return bpy.app.binary_path
+
+
+def get_max_workers(config):
+    max_workers = config.get("workers", {}).get("max_workers")
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+    return max(1, int(max_workers))
+
+
+def build_worker_command(blender_path, arguments, blend_path=None, mode="worker"):
+    """
+    Builds a headless Blender command that runs main.py as a worker for one job,
+    with the given .blend open if any.
+    """
+    command = [str(blender_path), "--background"]
+    if blend_path:
+        command.append(str(blend_path))
+    command += [
+        "--python-exit-code",
+        "1",
+        "--python",
+        str(main_script),
+        "--",
+        mode,
+    ]
+    for key, value in arguments.items():
+        if key in ("google_api_key", mode):
+            continue
+        if value is True:
+            command.append(key)
+        else:
+            command.append(f"{key}={value}")
+    return command
+
+
+def build_worker_env(arguments):
+    env = os.environ.copy()
+    if arguments.get("google_api_key"):
+        env[API_KEY_ENV] = str(arguments["google_api_key"])
+    return env
+
+
+def report_worker_result(output_dir, filename, **details):
+    """
+    Called by a worker to hand its outputs back to the scheduler.
+    """
+    result = {
+        "output_dir": str(output_dir) if output_dir else None,
+        "filename": filename,
+        **details,
+    }
+    print(f"{RESULT_MARKER}{json.dumps(result)}", flush=True)
+
+
+def build_jobs(arguments, lods, regions=None):
+    """
+    Fans the arguments out into one job per LOD, and per region if given.
+    Each region is a dict overriding min_lat/min_lon/max_lat/max_lon and
+    optionally base_name.
+    """
+    jobs = []
+    for region in regions or [{}]:
+        for lod in lods:
+            job_arguments = dict(arguments)
+            job_arguments.update(region)
+            job_arguments["lod"] = lod
+            jobs.append(
+                {
+                    "name": f"{job_arguments.get('base_name', 'job')}_{lod}",
+                    "arguments": job_arguments,
+                }
+            )
+    return jobs
+
+
+def run_worker_job(job, blender_path, log_dir=None):
+    """
+    Runs a single job in its own headless Blender process, streaming its log to
+    the console (and to a log file if log_dir is given).
+    """
+    name = job["name"]
+    command = build_worker_command(
+        blender_path,
+        job["arguments"],
+        job.get("blend_path"),
+        job.get("mode", "worker"),
+    )
+    result = {
+        "name": name,
+        "returncode": None,
+        "output_dir": None,
+        "filename": None,
+        "duration": 0.0,
+        "log_path": None,
+    }
+
+    log_file = None
+    if log_dir:
+        log_dir = Path(log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        result["log_path"] = str(log_dir / f"{name}.log")
+        log_file = open(result["log_path"], "w", encoding="utf-8")
+
+    print(f"\n[{name}] Starting worker...")
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            command,
+            cwd=str(project_root),
+            env=build_worker_env(job["arguments"]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        for line in process.stdout:
+            if log_file:
+                log_file.write(line)
+            if line.startswith(RESULT_MARKER):
+                result.update(json.loads(line[len(RESULT_MARKER) :]))
+            else:
+                print(f"[{name}] {line}", end="")
+        result["returncode"] = process.wait()
+    except OSError as e:
+        print(f"[{name}] Failed to start worker: {e}")
+        result["returncode"] = -1
+    finally:
+        if log_file:
+            log_file.close()
+
+    result["duration"] = time.perf_counter() - start
+    status = "succeeded" if result["returncode"] == 0 else "failed"
+    print(f"[{name}] Worker {status} in {result['duration']:.1f}s.")
+    return result
+
+
+def run_parallel_jobs(jobs, blender_path, max_workers, log_dir=None, on_result=None):
+    """
+    Runs the jobs in headless Blender workers, at most max_workers at a time.
+    Returns the per-job results in the same order as the jobs. If given,
+    on_result(job, result) is called as soon as each job finishes.
+    """
+
+    def run_job(job):
+        result = run_worker_job(job, blender_path, log_dir)
+        if on_result:
+            on_result(job, result)
+        return result
+
+    print(f"\nScheduling {len(jobs)} job(s) on up to {max_workers} worker(s)...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_job, jobs))
+
+    print("\nJob summary:")
+    for result in results:
+        status = (
+            "OK" if result["returncode"] == 0 else f"FAILED ({result['returncode']})"
+        )
+        print(f"  - {result['name']}: {status} in {result['duration']:.1f}s")
+    return results
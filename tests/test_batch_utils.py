@@ -0,0 +1,130 @@
+"""
+Batch manifest loading, job keys and resumable batch state.
+"""
+
+import json
+from pathlib import Path
+from scripts.batch_utils import (
+    BatchState,
+    build_batch_jobs,
+    get_job_key,
+    get_job_outputs,
+    load_batch_manifest,
+)
+from scripts.config_utils import apply_arguments, load_config
+
+TEMPLATE_PATH = (
+    Path(__file__).resolve().parent.parent / "config" / "config_template.yaml"
+)
+
+ENTRY = {
+    "base_name": "paris",
+    "min_lat": 48.85,
+    "min_lon": 2.33,
+    "max_lat": 48.87,
+    "max_lon": 2.36,
+}
+
+
+def make_config(**arguments):
+    return apply_arguments(
+        load_config(TEMPLATE_PATH),
+        {"google_api_key": "key", "lod": "lod2", **ENTRY, **arguments},
+    )
+
+
+def build_jobs(tmp_path, **entry):
+    return build_batch_jobs(
+        [{**ENTRY, "output_dir": str(tmp_path), **entry}],
+        {"google_api_key": "key"},
+        load_config(TEMPLATE_PATH),
+    )
+
+
+def test_yaml_manifest_merges_defaults_into_jobs(tmp_path):
+    manifest = tmp_path / "batch.yaml"
+    manifest.write_text(
+        "defaults:\n"
+        "  lods: [lod1, lod2]\n"
+        "  scale_factor: 0.5\n"
+        "jobs:\n"
+        "  - base_name: paris\n"
+        "  - base_name: rome\n"
+        "    scale_factor: 2\n",
+        encoding="utf-8",
+    )
+
+    assert load_batch_manifest(manifest) == [
+        {"lods": ["lod1", "lod2"], "scale_factor": 0.5, "base_name": "paris"},
+        {"lods": ["lod1", "lod2"], "scale_factor": 2, "base_name": "rome"},
+    ]
+
+
+def test_list_and_jsonl_manifests_have_no_defaults(tmp_path):
+    entries = [{"base_name": "paris"}, {"base_name": "rome", "lod": "lod3"}]
+    listed = tmp_path / "batch.yml"
+    listed.write_text("- base_name: paris\n- base_name: rome\n  lod: lod3\n")
+    lines = tmp_path / "batch.jsonl"
+    lines.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n\n")
+
+    assert load_batch_manifest(listed) == entries
+    assert load_batch_manifest(lines) == entries
+
+
+def test_job_key_depends_only_on_output_settings():
+    key = get_job_key(make_config())
+    assert get_job_key(make_config()) == key
+
+    # Reordered sections and settings that do not change the outputs
+    config = make_config()
+    config = dict(reversed(list(config.items())))
+    config["secret"]["google_api_key"] = "other"
+    config["workers"]["max_workers"] = 32
+    config["cache"]["enabled"] = True
+    config["fetch"]["concurrency"] = 4
+    config["profiling"] = {"enabled": True}
+    assert get_job_key(config) == key
+
+    assert get_job_key(make_config(lod="lod3")) != key
+    assert get_job_key(make_config(max_lat=48.88)) != key
+    assert get_job_key(make_config(fetch_engine="native")) != key
+    assert get_job_key(make_config(merge_cells=True)) != key
+
+
+def test_list_values_reach_workers_as_comma_separated_arguments(tmp_path):
+    jobs = build_jobs(tmp_path, lods=["lod1", "lod2"], export_formats=["fbx", "obj"])
+
+    assert [job["name"] for job in jobs] == ["paris_lod1", "paris_lod2"]
+    for job in jobs:
+        assert job["arguments"]["export_formats"] == "fbx,obj"
+        assert job["config"]["export"]["formats"] == ["fbx", "obj"]
+
+
+def test_batch_state_needs_a_done_record_and_every_output(tmp_path):
+    manifest = tmp_path / "batch.yaml"
+    [job] = build_jobs(tmp_path)
+    result = {
+        "returncode": 0,
+        "output_dir": str(tmp_path),
+        "filename": "paris_lod2.glb",
+        "duration": 1.0,
+    }
+
+    state = BatchState(manifest)
+    assert not state.is_done(job)
+    state.record(job, result)
+    # Recorded as done, but the outputs were never written
+    assert not state.is_done(job)
+
+    outputs = get_job_outputs(job["config"])
+    for path in outputs:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    assert BatchState(manifest).is_done(job)
+
+    outputs[-1].unlink()
+    assert not BatchState(manifest).is_done(job)
+
+    state.record(job, {**result, "returncode": 1})
+    outputs[-1].write_bytes(b"")
+    assert not BatchState(manifest).is_done(job)
@@ -0,0 +1,130 @@
+"""
+Tile cache manifest, eviction and deduplication, on plain files in a
+temporary data directory.
+"""
+
+import json
+import os
+import pytest
+from scripts import cache_utils
+from scripts.cache_utils import MANIFEST_NAME, TileCache
+
+
+def write(data_dir, name, data):
+    path = data_dir / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def load_entries(data_dir):
+    with (data_dir / MANIFEST_NAME).open(encoding="utf-8") as file:
+        return json.load(file)["entries"]
+
+
+def run(cache, lod, writes=(), hits=()):
+    cache.begin_run(lod)
+    for name, data in writes:
+        write(cache.data_dir, name, data)
+    for name in hits:
+        cache.record_hit(cache.data_dir / name)
+    return cache.end_run()
+
+
+def test_records_downloads_and_hits(tmp_path):
+    stats = run(TileCache(tmp_path), "lod1", writes=[("a.glb", b"a" * 10)])
+    assert (stats["misses"], stats["hits"], stats["downloaded_bytes"]) == (1, 0, 10)
+
+    stats = run(TileCache(tmp_path), "lod2", hits=["a.glb"])
+    assert (stats["misses"], stats["hits"]) == (0, 1)
+    entry = load_entries(tmp_path)["a.glb"]
+    assert entry["lods"] == ["lod1", "lod2"]
+    assert entry["hits"] == 1
+
+
+def test_concurrent_runs_merge_their_entries(tmp_path):
+    first, second = TileCache(tmp_path), TileCache(tmp_path)
+    first.begin_run("lod1")
+    second.begin_run("lod2")
+    write(tmp_path, "a.glb", b"a")
+    first.end_run()
+    write(tmp_path, "b.glb", b"b")
+    second.end_run()
+
+    entries = load_entries(tmp_path)
+    assert set(entries) == {"a.glb", "b.glb"}
+    # The first run's entry survives the second run writing the manifest
+    assert "lod1" in entries["a.glb"]["lods"]
+
+
+@pytest.mark.skipif(cache_utils.fcntl is None, reason="run lock needs fcntl")
+def test_eviction_waits_for_other_runs(tmp_path):
+    run(TileCache(tmp_path), "lod1", writes=[("a.glb", b"a" * 100)])
+    busy = TileCache(tmp_path)
+    busy.begin_run("lod2")
+    stats = run(TileCache(tmp_path, max_size_mb=1e-5), "lod3")
+    assert stats["evicted"] == 0
+    assert (tmp_path / "a.glb").exists()
+
+    busy.end_run()
+    stats = run(TileCache(tmp_path, max_size_mb=1e-5), "lod3")
+    assert stats["evicted"] == 1
+    assert not (tmp_path / "a.glb").exists()
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    run(TileCache(tmp_path), "lod1", writes=[("old.glb", b"o" * 60)])
+    run(TileCache(tmp_path), "lod1", writes=[("new.glb", b"n" * 60)])
+    # The old file is used again, so the new one is now the least recent
+    run(TileCache(tmp_path), "lod1", hits=["old.glb"])
+
+    # Room for one of the two files
+    stats = run(TileCache(tmp_path, max_size_mb=100 / (1024 * 1024)), "lod1")
+    assert stats["evicted"] == 1
+    assert (tmp_path / "old.glb").exists()
+    assert not (tmp_path / "new.glb").exists()
+    assert set(load_entries(tmp_path)) == {"old.glb"}
+
+
+def test_hard_links_identical_files(tmp_path):
+    stats = run(
+        TileCache(tmp_path),
+        "lod1",
+        writes=[("x/a.glb", b"same" * 10), ("y/b.glb", b"same" * 10)],
+    )
+
+    a, b = (tmp_path / "x" / "a.glb").stat(), (tmp_path / "y" / "b.glb").stat()
+    assert (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+    # Linked copies are only counted once
+    assert stats["size_bytes"] == 40
+
+
+def test_offline_run_restores_proxies(tmp_path, monkeypatch):
+    monkeypatch.setenv("HTTP_PROXY", "http://proxy:3128")
+    monkeypatch.delenv("HTTPS_PROXY", raising=False)
+    run(TileCache(tmp_path), "lod1", writes=[("a.glb", b"a")])
+
+    cache = TileCache(tmp_path, offline=True)
+    cache.begin_run("lod1")
+    assert os.environ["HTTPS_PROXY"] == cache_utils.OFFLINE_PROXY
+    cache.end_run()
+    assert os.environ["HTTP_PROXY"] == "http://proxy:3128"
+    assert "HTTPS_PROXY" not in os.environ
+
+
+def test_offline_run_without_tiles_fails(tmp_path):
+    with pytest.raises(RuntimeError, match="Offline mode"):
+        TileCache(tmp_path, offline=True).begin_run("lod1")
+    assert cache_utils.active_cache is None
+
+
+def test_untracked_runs_keep_files_of_their_lod(tmp_path):
+    run(TileCache(tmp_path), "lod1", writes=[("a.glb", b"a" * 60)])
+    run(TileCache(tmp_path), "lod2", writes=[("b.glb", b"b" * 60)])
+    # Blosm runs cannot record their reads; a.glb was used before by lod1
+    stats = run(TileCache(tmp_path, track_hits=False), "lod1")
+    assert stats["hits"] is None
+
+    stats = run(TileCache(tmp_path, max_size_mb=100 / (1024 * 1024)), "lod3")
+    assert (tmp_path / "a.glb").exists()
+    assert not (tmp_path / "b.glb").exists()
@@ -0,0 +1,99 @@
+"""
+Chunk grid partition, tile ownership across cell borders and the merge of the
+per-chunk metadata.
+"""
+
+import csv
+import numpy as np
+from scripts.chunk_utils import (
+    METADATA_FIELDS,
+    merge_chunk_metadata,
+    owns_centers,
+    partition_bbox,
+)
+
+BOX = (48.85, 2.33, 48.87, 2.36)
+
+
+def cell_of(region):
+    return [region[key] for key in ("min_lat", "min_lon", "max_lat", "max_lon")]
+
+
+def write_chunk_csv(path, meshes):
+    with path.open(mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=METADATA_FIELDS)
+        writer.writeheader()
+        # Bounds are in the CSV's max_lat, max_lon, min_lat, min_lon order
+        for mesh_id, bounds in meshes:
+            writer.writerow(dict(zip(METADATA_FIELDS, [mesh_id, *bounds])))
+        writer.writerow(dict.fromkeys(METADATA_FIELDS, "") | {"mesh_ID": "origin:"})
+
+
+def test_partition_covers_the_box_without_overlap():
+    regions = partition_bbox(*BOX, cell_size_m=500)
+    rows = max(region["row"] for region in regions) + 1
+    cols = max(region["col"] for region in regions) + 1
+    assert len(regions) == rows * cols > 1
+
+    # Neighbouring cells share their edge exactly, and the grid ends on the box
+    grid = {(region["row"], region["col"]): region for region in regions}
+    for (row, col), region in grid.items():
+        if row + 1 < rows:
+            assert region["max_lat"] == grid[row + 1, col]["min_lat"]
+        else:
+            assert region["max_lat"] == BOX[2]
+        if col + 1 < cols:
+            assert region["max_lon"] == grid[row, col + 1]["min_lon"]
+        else:
+            assert region["max_lon"] == BOX[3]
+    assert grid[0, 0]["min_lat"] == BOX[0] and grid[0, 0]["min_lon"] == BOX[1]
+
+
+def test_every_center_has_exactly_one_owner():
+    regions = partition_bbox(*BOX, cell_size_m=500)
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(BOX[0] - 0.01, BOX[2] + 0.01, 2000)
+    lons = rng.uniform(BOX[1] - 0.01, BOX[3] + 0.01, 2000)
+    # Centers right on the inner cell borders and the box corners
+    edges_lat = [region["min_lat"] for region in regions] + [BOX[2]]
+    edges_lon = [region["min_lon"] for region in regions] + [BOX[3]]
+    lats = np.concatenate([lats, edges_lat])
+    lons = np.concatenate([lons, edges_lon])
+
+    owners = sum(
+        owns_centers(lats, lons, cell_of(region), BOX).astype(int) for region in regions
+    )
+    assert (owners == 1).all()
+
+
+def test_merge_keeps_meshes_listed_by_several_chunks_once(tmp_path):
+    regions = [
+        {"base_name": f"city_r0c{col}", "origin_lat": 48.86, "origin_lon": 2.345}
+        for col in range(2)
+    ]
+    shared = ("tile_b", [48.861, 2.346, 48.859, 2.344])
+    write_chunk_csv(
+        tmp_path / "city_r0c0_lod3_metadata.csv",
+        [("tile_a", [48.861, 2.333, 48.859, 2.331]), shared],
+    )
+    write_chunk_csv(
+        tmp_path / "city_r0c1_lod3_metadata.csv",
+        [shared, ("tile_c", [48.861, 2.359, 48.859, 2.358])],
+    )
+
+    csv_path = merge_chunk_metadata(tmp_path, "city", "lod3", regions, 0.01)
+
+    with csv_path.open(newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    meshes = [row for row in rows if row["mesh_ID"].startswith("tile_")]
+    assert [(row["mesh_ID"], row["chunk"]) for row in meshes] == [
+        ("tile_a", "city_r0c0"),
+        ("tile_b", "city_r0c0"),
+        ("tile_c", "city_r0c1"),
+    ]
+    global_bounds = next(row for row in rows if row["mesh_ID"] == "global_bounds:")
+    assert float(global_bounds["min_lon"]) == 2.331
+    assert float(global_bounds["max_lon"]) == 2.359
+
+    npz = np.load(tmp_path / "city_lod3_metadata.npz")
+    assert list(npz["mesh_ID"]) == ["tile_a", "tile_b", "tile_c"]
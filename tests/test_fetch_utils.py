@@ -0,0 +1,120 @@
+"""
+Runs the native fetcher against the local replay server of the benchmarks,
+serving a synthetic tileset, so no API key or network access is needed.
+"""
+
+from pathlib import Path
+import pytest
+from benchmarks.replay_server import generate_synthetic_tileset, start_replay_server
+from scripts.cache_utils import TileCache
+from scripts.fetch_utils import TilesFetcher, read_glb
+
+GRID = 3
+
+
+@pytest.fixture(scope="module")
+def tiles_server(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tileset")
+    bbox = generate_synthetic_tileset(directory, grid=GRID, vertices=100)
+    server = start_replay_server(directory)
+    yield f"http://127.0.0.1:{server.server_port}/root.json", bbox
+    server.shutdown()
+    server.server_close()
+
+
+def make_fetcher(url, bbox, download_dir, cache=None):
+    return TilesFetcher(
+        url,
+        bbox,
+        20.0,
+        download_dir,
+        fetch_settings={"rate_limit": 1000},
+        cache=cache,
+    )
+
+
+def test_fetches_every_tile_of_the_box(tiles_server, tmp_path):
+    url, bbox = tiles_server
+    fetcher = make_fetcher(url, bbox, tmp_path)
+    tiles = fetcher.fetch_all()
+
+    assert [tile["uri"] for tile in tiles] == sorted(
+        f"/tile_{row}_{col}.glb" for row in range(GRID) for col in range(GRID)
+    )
+    assert not any(tile["cached"] for tile in tiles)
+    for tile in tiles:
+        gltf, _ = read_glb(Path(tile["file"]).read_bytes())
+        assert gltf["asset"]["version"] == "2.0"
+        assert tile["transform"].shape == (4, 4)
+    # The root tileset and one request per tile
+    assert fetcher.stats["requests"] == GRID * GRID + 1
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_culls_tiles_outside_the_box(tiles_server, tmp_path):
+    url, (min_lat, min_lon, max_lat, max_lon) = tiles_server
+    # The south-west quarter only overlaps the corner tile
+    bbox = (
+        min_lat,
+        min_lon,
+        min_lat + (max_lat - min_lat) / (2 * GRID),
+        min_lon + (max_lon - min_lon) / (2 * GRID),
+    )
+    tiles = make_fetcher(url, bbox, tmp_path).fetch_all()
+
+    assert [tile["uri"] for tile in tiles] == ["/tile_0_0.glb"]
+
+
+def test_reuses_cached_tiles_and_tilesets(tiles_server, tmp_path):
+    url, bbox = tiles_server
+    download_dir = tmp_path / "native_tiles"
+    make_fetcher(url, bbox, download_dir, TileCache(tmp_path)).fetch_all()
+    fetcher = make_fetcher(url, bbox, download_dir, TileCache(tmp_path))
+    tiles = fetcher.fetch_all()
+
+    assert all(tile["cached"] for tile in tiles)
+    assert fetcher.stats["cached_tiles"] == GRID * GRID
+    assert fetcher.stats["cached_tilesets"] == 1
+    assert fetcher.stats["requests"] == 0
+
+
+def test_refetches_stale_tilesets_online(tiles_server, tmp_path):
+    url, bbox = tiles_server
+    download_dir = tmp_path / "native_tiles"
+    make_fetcher(url, bbox, download_dir, TileCache(tmp_path)).fetch_all()
+    cache = TileCache(tmp_path, tileset_max_age_h=0)
+    fetcher = make_fetcher(url, bbox, download_dir, cache)
+    fetcher.fetch_all()
+
+    assert fetcher.stats["cached_tilesets"] == 0
+    assert fetcher.stats["requests"] == 1
+
+
+def test_offline_run_is_served_from_the_cache(tiles_server, tmp_path):
+    url, bbox = tiles_server
+    download_dir = tmp_path / "native_tiles"
+    make_fetcher(url, bbox, download_dir, TileCache(tmp_path)).fetch_all()
+    cache = TileCache(tmp_path, offline=True, tileset_max_age_h=0)
+    fetcher = make_fetcher(url, bbox, download_dir, cache)
+    tiles = fetcher.fetch_all()
+
+    assert len(tiles) == GRID * GRID
+    assert fetcher.stats["requests"] == 0
+
+
+def test_offline_run_fails_without_sending(tiles_server, tmp_path):
+    url, bbox = tiles_server
+    cache = TileCache(tmp_path, offline=True)
+    fetcher = make_fetcher(url, bbox, tmp_path / "native_tiles", cache)
+
+    with pytest.raises(OSError, match="offline"):
+        fetcher.fetch_all()
+    assert fetcher.stats["requests"] == 0
+
+
+def test_fails_on_missing_tileset(tiles_server, tmp_path):
+    url, bbox = tiles_server
+    fetcher = make_fetcher(url.replace("root.json", "missing.json"), bbox, tmp_path)
+
+    with pytest.raises(OSError, match="404"):
+        fetcher.fetch_all()
@@ -0,0 +1,132 @@
+"""
+Packed STR R-tree of the metadata .npz, checked against brute-force scans of
+random mesh bounds.
+"""
+
+import numpy as np
+import pytest
+from scripts.index_utils import MeshIndex, build_str_index, save_metadata_npz
+
+
+def random_bounds(count, seed=0):
+    """
+    Bounds of count meshes around Paris, with the corners of some swapped like
+    the projected corners of rotated tiles.
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(48.80, 48.90, count)
+    lon = rng.uniform(2.25, 2.40, count)
+    size = rng.uniform(0.0005, 0.01, (count, 2))
+    bounds = np.column_stack([lat, lon, lat + size[:, 0], lon + size[:, 1]])
+    swapped = rng.random(count) < 0.2
+    bounds[swapped] = bounds[swapped][:, [2, 3, 0, 1]]
+    return bounds
+
+
+def normalized(bounds):
+    return np.hstack(
+        [
+            np.minimum(bounds[:, :2], bounds[:, 2:]),
+            np.maximum(bounds[:, :2], bounds[:, 2:]),
+        ]
+    )
+
+
+def brute_force(bounds, min_lat, min_lon, max_lat, max_lon):
+    bounds = normalized(bounds)
+    return np.flatnonzero(
+        (bounds[:, 0] <= max_lat)
+        & (bounds[:, 2] >= min_lat)
+        & (bounds[:, 1] <= max_lon)
+        & (bounds[:, 3] >= min_lon)
+    )
+
+
+def make_index(tmp_path, bounds, **columns):
+    npz_path = tmp_path / "city_lod4_metadata.npz"
+    mesh_ids = [f"mesh_{i}" for i in range(len(bounds))]
+    save_metadata_npz(npz_path, mesh_ids, bounds, 48.85, 2.35, 0.01, "lod4", **columns)
+    return MeshIndex.load(npz_path)
+
+
+@pytest.mark.parametrize("count", [1, 15, 16, 17, 300, 5000])
+@pytest.mark.parametrize("node_size", [2, 16])
+def test_str_tree_levels_cover_their_children(count, node_size):
+    bounds = random_bounds(count)
+    item_order, node_bounds, level_offsets = build_str_index(bounds, node_size)
+
+    assert sorted(item_order.tolist()) == list(range(count))
+    assert level_offsets[-1] == len(node_bounds)
+    assert level_offsets[-1] - level_offsets[-2] == 1
+    np.testing.assert_array_equal(
+        node_bounds[: level_offsets[1]], normalized(bounds)[item_order]
+    )
+
+    for level in range(len(level_offsets) - 2):
+        children = node_bounds[level_offsets[level] : level_offsets[level + 1]]
+        parents = node_bounds[level_offsets[level + 1] : level_offsets[level + 2]]
+        assert len(parents) == -(-len(children) // node_size)
+        for i, child in enumerate(children):
+            parent = parents[i // node_size]
+            assert (parent[:2] <= child[:2]).all() and (parent[2:] >= child[2:]).all()
+
+    root = node_bounds[-1]
+    np.testing.assert_array_equal(root[:2], normalized(bounds)[:, :2].min(axis=0))
+    np.testing.assert_array_equal(root[2:], normalized(bounds)[:, 2:].max(axis=0))
+
+
+@pytest.mark.parametrize("count", [1, 17, 5000])
+def test_query_matches_brute_force(tmp_path, count):
+    bounds = random_bounds(count, seed=count)
+    index = make_index(tmp_path, bounds)
+    rng = np.random.default_rng(1)
+
+    for _ in range(200):
+        lat, lon = rng.uniform(48.78, 48.92), rng.uniform(2.23, 2.42)
+        height, width = rng.uniform(0, 0.03, 2)
+        box = (lat, lon, lat + height, lon + width)
+        expected = brute_force(bounds, *box)
+        np.testing.assert_array_equal(index.query(*box), expected)
+        assert index.meshes_in_bbox(*box) == [f"mesh_{i}" for i in expected]
+
+
+def test_meshes_at_point_matches_brute_force(tmp_path):
+    bounds = random_bounds(2000)
+    index = make_index(tmp_path, bounds)
+    rng = np.random.default_rng(2)
+
+    points = np.column_stack(
+        [rng.uniform(48.80, 48.91, 300), rng.uniform(2.25, 2.41, 300)]
+    )
+    # Points right on mesh corners count as inside
+    points = np.vstack([points, normalized(bounds)[:50, :2]])
+    for lat, lon in points:
+        expected = brute_force(bounds, lat, lon, lat, lon)
+        assert index.meshes_at_point(lat, lon) == [f"mesh_{i}" for i in expected]
+
+
+def test_empty_index_finds_nothing(tmp_path):
+    index = make_index(tmp_path, np.empty((0, 4)))
+    assert index.meshes_in_bbox(48.0, 2.0, 49.0, 3.0) == []
+    assert index.meshes_at_point(48.85, 2.35) == []
+
+
+def test_footprints_and_source_meshes(tmp_path):
+    bounds = random_bounds(3)
+    hull = np.array(
+        [[48.81, 2.26], [48.82, 2.27], [48.81, 2.28], [48.83, 2.30], [48.84, 2.31]]
+    )
+    index = make_index(
+        tmp_path,
+        bounds,
+        footprint=hull,
+        footprint_offsets=np.array([0, 3, 3, 5]),
+    )
+
+    np.testing.assert_array_equal(index.footprint("mesh_0"), hull[:3])
+    assert len(index.footprint("mesh_1")) == 0
+    np.testing.assert_array_equal(index.footprint("mesh_2"), hull[3:])
+    assert index.source_meshes("mesh_1") == ["mesh_1"]
+
+    plain = make_index(tmp_path, bounds)
+    assert plain.footprint("mesh_0") is None
@@ -0,0 +1,150 @@
+"""
+Token bucket, adaptive concurrency limit and backoff, on a fake clock so no
+test actually waits.
+"""
+
+import asyncio
+import random
+import pytest
+from scripts import throttle_utils
+from scripts.throttle_utils import AdaptiveLimiter, TokenBucket, backoff_delay
+
+
+class FakeClock:
+    # Times and rates in the tests are powers of two, so the token arithmetic
+    # is exact and a refill never falls a rounding error short of a token
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces the module's clock, and makes asyncio.sleep advance it instead
+    of waiting.
+    """
+    clock = FakeClock()
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        clock.sleeps.append(delay)
+        clock.now += delay
+        await real_sleep(0)
+
+    monkeypatch.setattr(throttle_utils, "time", clock)
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_paces_requests(clock):
+    async def run():
+        bucket = TokenBucket(rate=8, burst=4)
+        for _ in range(4):
+            await bucket.acquire()
+        assert clock.sleeps == []
+
+        for _ in range(16):
+            await bucket.acquire()
+
+    asyncio.run(run())
+    # 16 requests past the burst at 8 per second
+    assert clock.sleeps == [0.125] * 16
+
+
+def test_bucket_refills_while_idle_up_to_its_capacity(clock):
+    async def run():
+        bucket = TokenBucket(rate=2)
+        assert bucket.capacity == 2
+        await bucket.acquire()
+        await bucket.acquire()
+        clock.now += 64
+        for _ in range(2):
+            await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+
+    asyncio.run(run())
+    assert clock.sleeps == [0.5]
+
+
+def test_slow_rates_keep_a_burst_of_one(clock):
+    bucket = TokenBucket(rate=0.5)
+    assert bucket.capacity == 1
+
+
+def test_limiter_clamps_its_initial_limit():
+    assert AdaptiveLimiter(100, minimum=2, maximum=8).limit == 8
+    assert AdaptiveLimiter(0, minimum=2, maximum=8).limit == 2
+    assert AdaptiveLimiter(4, minimum=0, maximum=0).minimum == 1
+
+
+def test_limiter_holds_requests_over_the_limit(clock):
+    async def run():
+        limiter = AdaptiveLimiter(2, maximum=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done() and limiter.in_flight == 2
+
+        await limiter.release(congested=False)
+        await waiting
+        assert limiter.in_flight == 2
+
+    asyncio.run(run())
+
+
+def test_limiter_grows_by_one_per_round_and_halves_once_per_cooldown(clock):
+    async def round_trip(limiter, congested):
+        await limiter.acquire()
+        await limiter.release(congested)
+
+    async def run():
+        clock.now = 64.0
+        limiter = AdaptiveLimiter(8, minimum=2, maximum=16, cooldown=1.0)
+        for _ in range(8):
+            await round_trip(limiter, False)
+        assert 8.9 < limiter.limit < 9.0
+
+        # A burst of errors inside one cooldown window halves the limit once
+        for _ in range(5):
+            await round_trip(limiter, True)
+        assert 4.4 < limiter.limit < 4.5
+
+        clock.now += 1.0
+        for _ in range(3):
+            await round_trip(limiter, True)
+            clock.now += 1.0
+        assert limiter.limit == 2
+
+        for _ in range(1000):
+            await round_trip(limiter, False)
+        assert limiter.limit == 16
+
+    asyncio.run(run())
+
+
+def test_backoff_grows_with_jitter_up_to_the_cap():
+    random.seed(0)
+    for attempt in range(10):
+        delays = [backoff_delay(attempt, base=0.5, cap=8.0) for _ in range(200)]
+        ceiling = min(8.0, 0.5 * 2**attempt)
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Full jitter spreads the delays over the whole window
+        assert max(delays) > 0.8 * ceiling and min(delays) < 0.2 * ceiling
+
+
+def test_backoff_waits_at_least_retry_after():
+    random.seed(0)
+    assert all(backoff_delay(0, retry_after="5") >= 5 for _ in range(50))
+    assert backoff_delay(10, cap=2.0, retry_after="1") <= 2.0
+    assert (
+        backoff_delay(0, base=0.5, retry_after="Wed, 21 Oct 2026 07:28:00 GMT") <= 0.5
+    )